@@ -1,196 +1,223 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import (Flask, render_template, request, jsonify, session, Response, g, stream_with_context,
+                   has_request_context)
 from werkzeug.utils import secure_filename
 import os
 from datetime import datetime
 import uuid
-import sqlite3
-import reportlab
-
-# OCR imports
-try:
-    from doctr.io import DocumentFile
-    from doctr.models import ocr_predictor
-    DOCTR_AVAILABLE = True
-except:
-    DOCTR_AVAILABLE = False
-
-# Transformers for AI
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
-import torch
-
-from models.cbc_parser import extract_cbc_clean, assess_cbc
+import json
+import hashlib
+import time
+import atexit
+import logging
+import multiprocessing
+
+from models.cbc_parser import (extract_cbc_clean, assess_cbc, load_range_profiles, collect_cbc_text, DEFAULT_PROFILE,
+                               PARAM_PATTERNS, REFERENCE_RANGES)
+from models.chat_intents import IntentMatcher, CONCERN_PHRASES, HEALTH_CHECK_PHRASES, RULE_INTENTS, PARAM_ALIASES
 from models.database import CBCDatabase
-
-def extract_text_with_pytesseract(file_path):
-    """Alternative OCR using pytesseract"""
-    if not PYTESSERACT_AVAILABLE:
-        return None, "pytesseract not available"
-    
-    try:
-        if file_path.lower().endswith('.pdf'):
-            if not PDF_SUPPORT:
-                return None, "PDF support not available. Install pdf2image"
-            # Convert PDF to images
-            images = convert_from_path(file_path)
-            text = ""
-            for image in images:
-                text += pytesseract.image_to_string(image) + "\n"
-            return text, None
-        else:
-            # Process image
-            image = Image.open(file_path)
-            text = pytesseract.image_to_string(image)
-            return text, None
-    except Exception as e:
-        return None, str(e)
-
-
-def extract_text_from_file(file_path):
-    """Extract text using available OCR method"""
-    
-    # Try doctr first (best quality)
-    if DOCTR_AVAILABLE:
-        try:
-            model = get_ocr_model()
-            if file_path.lower().endswith('.pdf'):
-                doc = DocumentFile.from_pdf(file_path)
-            else:
-                doc = DocumentFile.from_images(file_path)
-            
-            result = model(doc)
-            text = result.render()
-            return text, None
-        except Exception as e:
-            print(f"doctr failed: {e}, trying alternative...")
-    
-    # Fallback to pytesseract
-    if PYTESSERACT_AVAILABLE:
-        return extract_text_with_pytesseract(file_path)
-    
-    # No OCR available
-    return None, "No OCR engine available. Please install: pip install python-doctr[torch] OR pip install pytesseract"
+from models.ocr import (extract_text_from_file, iter_text_pages, OCRWorkerPool, OCRError,
+                        ocr_engine_version, PAGE_BREAK)
+from models.ocr_cache import OCRCache
+from models.session_store import ServerSideSessionInterface, SQLiteSessionStore, MemorySessionStore
+from models.jobs import JobManager
+from models.metrics import REGISTRY, REQUEST_SECONDS, stage_timer
+from models.logs import configure_logging, stop_logging, sample_debug
+from models.answer_cache import AnswerCache, assessment_fingerprint, normalize_question
+from models.llm import LLMClient, LLMUnavailable
+from models.preload import preload_models
+from models.report_pdf import ReportCache, render_report_pdf, report_cache_key, stream_history_pdf
+from models.trends import build_trends
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-in-production'
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['RANGE_PROFILES'] = os.environ.get('CBC_RANGE_PROFILES', 'range_profiles.json')
+app.config['OCR_WORKERS'] = int(os.environ.get('CBC_OCR_WORKERS', '0'))  # 0 = OCR in the request thread
+app.config['PRELOAD_MODELS'] = os.environ.get('CBC_PRELOAD_MODELS', '0') == '1'  # load OCR weights before forking workers
+app.config['OCR_TIMEOUT'] = float(os.environ.get('CBC_OCR_TIMEOUT', '300'))  # seconds a job waits on the OCR pool
+app.config['JOB_WORKERS'] = int(os.environ.get('CBC_JOB_WORKERS', '4'))  # background upload/analyze threads
+app.config['OCR_CACHE_PATH'] = os.environ.get('CBC_OCR_CACHE', 'ocr_cache.db')
+app.config['OCR_CACHE_MAX_MB'] = int(os.environ.get('CBC_OCR_CACHE_MAX_MB', '256'))
+app.config['OCR_STREAMING'] = os.environ.get('CBC_OCR_STREAMING', '1') == '1'  # page-by-page PDF OCR with early stop
+app.config['SESSION_BACKEND'] = os.environ.get('CBC_SESSION_BACKEND', 'sqlite')  # 'sqlite' (multi-process) or 'memory'
+app.config['SESSION_DB_PATH'] = os.environ.get('CBC_SESSION_DB', 'sessions.db')
+app.config['ANSWER_CACHE_SIZE'] = int(os.environ.get('CBC_ANSWER_CACHE_SIZE', '4096'))  # 0 disables /ask memoization
+app.config['ANSWER_CACHE_TTL'] = float(os.environ.get('CBC_ANSWER_CACHE_TTL', '3600'))
+app.config['LLM_ADDRESS'] = os.environ.get('CBC_LLM_ADDRESS', '')  # host:port of llm_server.py; empty = rule-based only
+app.config['LLM_TIMEOUT'] = float(os.environ.get('CBC_LLM_TIMEOUT', '5'))  # seconds before falling back to rules
+app.config['PDF_CACHE_DIR'] = os.environ.get('CBC_PDF_CACHE', 'pdf_cache')
+app.config['PDF_CACHE_MAX_MB'] = int(os.environ.get('CBC_PDF_CACHE_MAX_MB', '64'))
+app.config['PDF_PRERENDER'] = os.environ.get('CBC_PDF_PRERENDER', '0') == '1'  # render the PDF in the background after each analysis
+app.config['METRICS_ENABLED'] = os.environ.get('CBC_METRICS', '1') == '1'  # stage timers, counters and /metrics
+app.config['LOG_LEVEL'] = os.environ.get('CBC_LOG_LEVEL', 'INFO')
+app.config['LOG_FORMAT'] = os.environ.get('CBC_LOG_FORMAT', 'json')  # 'json' or 'text'
+app.config['DEBUG_SAMPLE_RATE'] = float(os.environ.get('CBC_DEBUG_SAMPLE_RATE', '0.01'))  # share of requests whose parse dumps are logged at DEBUG
+
+# Log records are written by a background thread; parse dumps are DEBUG and sampled
+configure_logging(app.config['LOG_LEVEL'], app.config['LOG_FORMAT'], app.config['DEBUG_SAMPLE_RATE'])
+atexit.register(stop_logging)
+logger = logging.getLogger(__name__)
+
+# Session payloads (raw_text, cbc_data, assessment) live server-side; the cookie holds an id
+if app.config['SESSION_BACKEND'] == 'memory':
+    app.session_interface = ServerSideSessionInterface(MemorySessionStore())
+else:
+    app.session_interface = ServerSideSessionInterface(SQLiteSessionStore(app.config['SESSION_DB_PATH']))
+
+# Per-route/per-stage timings and OCR/cache counters, served at /metrics
+REGISTRY.enabled = app.config['METRICS_ENABLED']
 
 # Create upload folder
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# Initialize database
+# Initialize database (pooled per-thread connections)
 db = CBCDatabase()
-
-# Initialize OCR model (lazy loading)
-ocr_model = None
-
-def get_ocr_model():
-    global ocr_model
-    if ocr_model is None and DOCTR_AVAILABLE:
-        ocr_model = ocr_predictor(pretrained=True)
-    return ocr_model
-
-# Initialize BioGPT model (lazy loading)
-bio_model = None
-bio_tokenizer = None
-
-def get_bio_model():
-    global bio_model, bio_tokenizer
-    if bio_model is None:
-        try:
-            # Using microsoft/biogpt for medical domain
-            bio_tokenizer = AutoTokenizer.from_pretrained("microsoft/biogpt")
-            bio_model = AutoModelForCausalLM.from_pretrained("microsoft/biogpt")
-            print("BioGPT model loaded successfully")
-        except Exception as e:
-            print(f"Error loading BioGPT: {e}")
-            # Fallback to a smaller model
-            try:
-                bio_tokenizer = AutoTokenizer.from_pretrained("distilgpt2")
-                bio_model = AutoModelForCausalLM.from_pretrained("distilgpt2")
-                print("Fallback to DistilGPT2")
-            except Exception as e2:
-                print(f"Error loading fallback model: {e2}")
-    return bio_model, bio_tokenizer
-
-
-def extract_text_from_file(file_path):
-    """Extract text using OCR"""
-    if not DOCTR_AVAILABLE:
-        return None, "OCR not available. Install python-doctr[torch]"
-    
+atexit.register(db.close)
+
+# Load partner lab reference-range profiles (precomputed once at startup)
+if os.path.exists(app.config['RANGE_PROFILES']):
+    logger.info("Loaded range profiles: %s", load_range_profiles(app.config['RANGE_PROFILES']))
+
+# Preload mode: build the OCR model here, in the parent, so processes forked from
+# it (gunicorn --preload workers, the OCR pool below) share its weights
+if app.config['PRELOAD_MODELS'] and multiprocessing.parent_process() is None:
+    preload_models()
+
+# Start OCR worker processes (each loads the OCR model once, or inherits the
+# preloaded one). Spawned workers re-import this module as __mp_main__, so only
+# the parent starts the pool.
+ocr_pool = None
+if app.config['OCR_WORKERS'] > 0 and multiprocessing.parent_process() is None:
+    ocr_pool = OCRWorkerPool(app.config['OCR_WORKERS'], 'fork' if app.config['PRELOAD_MODELS'] else 'spawn')
+    atexit.register(ocr_pool.shutdown)
+
+# OCR results keyed by file SHA-256, invalidated when the OCR engine changes
+ocr_cache = OCRCache(
+    app.config['OCR_CACHE_PATH'],
+    engine_version=ocr_engine_version(),
+    max_bytes=app.config['OCR_CACHE_MAX_MB'] * 1024 * 1024
+)
+
+# /ask answers keyed on (normalized question, assessment fingerprint)
+answer_cache = AnswerCache(app.config['ANSWER_CACHE_SIZE'], app.config['ANSWER_CACHE_TTL'])
+
+# Rendered report PDFs keyed on (report id, assessment fingerprint, template version)
+report_cache = ReportCache(app.config['PDF_CACHE_DIR'], max_bytes=app.config['PDF_CACHE_MAX_MB'] * 1024 * 1024)
+
+# Background upload -> OCR -> analyze jobs
+jobs = JobManager(workers=app.config['JOB_WORKERS'])
+
+# BioGPT runs in llm_server.py (loaded once, batched); this process only holds a client
+llm_client = None
+if app.config['LLM_ADDRESS']:
+    llm_client = LLMClient(app.config['LLM_ADDRESS'], timeout=app.config['LLM_TIMEOUT'])
+
+
+def get_llm_response(question, assessment, stream=False):
+    """Free-form answer from the local language model, or None if it is unavailable.
+
+    With ``stream`` the answer is an iterator of text pieces, returned once
+    the first piece has arrived. When the server is configured but fails,
+    ``g.llm_fallback`` is set so the rule-based stand-in is not cached.
+    """
+    if llm_client is None:
+        return None
+    findings = "; ".join(
+        f"{param} {data['value']:.2f} {data.get('unit', '')} ({data.get('status', 'Unknown')})"
+        for param, data in (assessment or {}).get('assessed', {}).items()
+        if data.get('value') is not None
+    )
+    prompt = (f"CBC results: {findings or 'not available'}.\n"
+              f"Question: {question.strip()}\n"
+              "Answer in plain language:")
     try:
-        model = get_ocr_model()
-        if file_path.lower().endswith('.pdf'):
-            doc = DocumentFile.from_pdf(file_path)
-        else:
-            doc = DocumentFile.from_images(file_path)
-        
-        result = model(doc)
-        text = result.render()
-        return text, None
-    except Exception as e:
-        return None, str(e)
+        with stage_timer('llm_first_token' if stream else 'llm'):
+            answer = llm_client.stream(prompt) if stream else llm_client.generate(prompt)
+    except LLMUnavailable as e:
+        logger.warning("Language model unavailable, using rule-based answer: %s", e)
+        if has_request_context():
+            g.llm_fallback = True
+        return None
+    return answer or None
+
+
+# Canned replies to greetings and small talk; the first phrase listed that occurs wins
+CASUAL_RESPONSES = {
+    # 👋 Greetings & Small Talk
+    "hi": "Hi there! 👋 How can I help you understand your CBC report today?",
+    "hello": "Hello! 😊 I’m your CBC Assistant bot. Ask me about any of your report values.",
+    "hey": "Hey! 👋 I can help explain what your blood test results mean.",
+    "how are you": "I’m doing great, thanks for asking! 🤖 How about you? Would you like to discuss your CBC results?",
+    "how are you doing": "I’m feeling fantastic! 😊 Ready to help you understand your CBC report.",
+    "good morning": "Good morning! ☀️ Hope you’re feeling healthy today.",
+    "good afternoon": "Good afternoon! 🌤 Let’s go through your CBC report together.",
+    "good evening": "Good evening! 🌙 How can I assist you with your blood report today?",
+    "good night": "Good night! 🌙 Remember to rest well — it helps your body recover.",
+    "yo": "Hey there! 👋 Need help with your CBC report?",
+    "what’s up": "Not much, just here to help you understand your blood report! 😄",
+    "sup": "Hey! 👋 What can I help you with today?",
+
+    # 🙏 Gratitude & Appreciation
+    "thank you": "You're welcome! 💙 I'm glad to help you understand your health better.",
+    "thanks": "No problem! 😊 Happy to help you with your report.",
+    "thank u": "You’re most welcome! 💙",
+    "thanks a lot": "You’re very welcome! Always happy to help. 😊",
+    "thank you so much": "It’s my pleasure! 💙 Glad I could help you out.",
+    "appreciate it": "Glad to hear that! 😊 Let me know if you’d like to understand more about your results.",
+
+    # 🌟 Compliments
+    "you are great": "Aww, thank you! 🤖 I'm here to make health information easier for you.",
+    "you’re awesome": "Thank you! 💙 I’m just doing my job — helping you stay informed!",
+    "good bot": "Thanks! 😄 I appreciate that.",
+    "nice work": "Thanks! 😊 Glad you liked it.",
+    "well done": "Thank you! 💪 Let’s keep understanding your health together.",
+
+    # 👋 Farewells
+    "bye": "Goodbye! 👋 Take care and stay healthy.",
+    "see you": "See you later! 👋 Stay safe and healthy!",
+    "talk to you later": "Sure thing! I’ll be here whenever you need help with your CBC report.",
+    "goodbye": "Goodbye! 💙 Take care of your health.",
+
+    # 👍 Affirmations & Acknowledgments
+    "ok": "Got it! 👍 Let’s continue.",
+    "okay": "Okay! 😊 What would you like to know next?",
+    "sure": "Sure thing! 🤖 I’m ready to help.",
+    "yes": "Yes! 😊 Please go ahead with your question.",
+    "yep": "Yep! 👍 I’m here and ready.",
+    "yeah": "Yeah! Let’s continue exploring your report.",
+    "alright": "Alright! 😊 Let’s get started.",
+    "fine": "Glad to hear that! 💙 How can I assist you?",
+    "cool": "Cool 😎 Let’s move ahead.",
+    "great": "Awesome! 💪 What’s your next question?",
+    "perfect": "Perfect! 🤖 Let’s continue.",
+    "no": "No worries! 😊 Let me know if you change your mind.",
+    "not really": "That’s okay! 💙 I can still help if you’d like to know something specific."
+}
 
+# Every intent phrase and parameter alias, compiled once into a single automaton
+chat_intents = IntentMatcher(
+    dict(concern=CONCERN_PHRASES, health_check=HEALTH_CHECK_PHRASES, casual=list(CASUAL_RESPONSES), **RULE_INTENTS),
+    PARAM_ALIASES,
+    names=[name.lower() for name in {**PARAM_PATTERNS, **REFERENCE_RANGES}]
+)
 
-def generate_ai_response(question, cbc_data, assessment):
-    """Generate response based on actual extracted CBC data."""
-        # 🩺 Check if the user is asking about overall report status
-    q_lower = question.lower().strip()
-    
-    # --- Add this block for worry/concern-related questions ---
-    concern_phrases = [
-        "should i worry", "is this serious", "is this dangerous",
-        "should i fear it", "am i at risk", "is it harmful",
-        "is it bad", "is it concerning", "should i be concerned",
-        "is this alarming", "is this critical", "is it dangerous",
-        "do i need to panic", "should i be worried", "is this a problem",
-        "does this indicate something serious", "is it risky",
-        "am i in danger", "is this harmful for my health",
-        "should i consult a doctor immediately", "is it urgent",
-        "do i need medical attention", "is it life threatening",
-        "am i okay", "am i healthy", "should i take action",
-        "should i be cautious", "is this cause for concern"
-    ]
-    
-    if any(phrase in q_lower for phrase in concern_phrases):
-        return get_reassurance_response(q_lower, assessment, param_variations)
-    # --- End of block ---
-    
-    # Existing parameter mapping and checks follow
-    param_variations = get_comprehensive_param_mapping()
-    
-    health_check_phrases = [
-        # Common report-related questions
-        "are my results good", "is my report good", "is everything normal",
-        "are my reports normal", "am i healthy", "is my health okay",
-        "how are my results", "how is my report", "is my cbc good",
-        "are the results fine", "is everything okay", "are my values okay",
-        "are my blood test results okay", "does it look fine",
-        "is my report okay", "are my results fine", "is my blood test normal",
-        "are my blood results good", "is my cbc normal", "is my report fine",
-        "are my readings normal", "are my numbers normal",
-        "are my counts good", "are my blood levels good",
-        "is my health report fine", "is my blood normal",
-        "does my report look normal", "am i fine", "am i doing okay",
-        "does my health look okay", "does everything look okay",
-        "are my readings good", "does it seem normal", "are things normal",
-        "does my cbc look good", "are my test results normal",
-        "is my blood report okay", "is my cbc fine", "are my cbc values okay",
-        "is my cbc report okay", "is my test result good", "am i all right",
-        "is my report positive", "is my report negative", "is my blood okay",
-        "are there any issues in my report", "is my report clear",
-        "is my report showing anything bad", "is my blood fine",
-        "am i perfectly healthy", "is everything fine with my report",
-        "is my cbc test okay", "is my cbc test normal", "is my health normal",
-        "is my blood test fine", "does my test look fine",
-        "am i doing well health wise", "are my medical results fine",
-        "are my test results fine", "are my results okay"
-    ]
 
+def generate_ai_response(question, cbc_data, assessment, stream=False):
+    """Generate response based on actual extracted CBC data.
 
+    With ``stream``, an answer from the language model comes back as an
+    iterator of text pieces instead of a string.
+    """
     q_lower = question.lower().strip()
-    if any(phrase in q_lower for phrase in health_check_phrases):
+    match = chat_intents.match(q_lower)
+    
+    # Worry/concern-related questions
+    if match.has('concern'):
+        return get_reassurance_response(match, assessment)
+    
+    # Overall report status questions
+    if match.has('health_check'):
         try:
             # If assessment data is available, respond based on it
             if assessment and isinstance(assessment, dict):
@@ -221,68 +248,15 @@ def generate_ai_response(question, cbc_data, assessment):
                 "Please upload your report or share your readings!"
             )
 
-        # --- Handle greetings and casual conversation ---
-    casual_phrases = {
-        # 👋 Greetings & Small Talk
-        "hi": "Hi there! 👋 How can I help you understand your CBC report today?",
-        "hello": "Hello! 😊 I’m your CBC Assistant bot. Ask me about any of your report values.",
-        "hey": "Hey! 👋 I can help explain what your blood test results mean.",
-        "how are you": "I’m doing great, thanks for asking! 🤖 How about you? Would you like to discuss your CBC results?",
-        "how are you doing": "I’m feeling fantastic! 😊 Ready to help you understand your CBC report.",
-        "good morning": "Good morning! ☀️ Hope you’re feeling healthy today.",
-        "good afternoon": "Good afternoon! 🌤 Let’s go through your CBC report together.",
-        "good evening": "Good evening! 🌙 How can I assist you with your blood report today?",
-        "good night": "Good night! 🌙 Remember to rest well — it helps your body recover.",
-        "yo": "Hey there! 👋 Need help with your CBC report?",
-        "what’s up": "Not much, just here to help you understand your blood report! 😄",
-        "sup": "Hey! 👋 What can I help you with today?",
-
-        # 🙏 Gratitude & Appreciation
-        "thank you": "You're welcome! 💙 I'm glad to help you understand your health better.",
-        "thanks": "No problem! 😊 Happy to help you with your report.",
-        "thank u": "You’re most welcome! 💙",
-        "thanks a lot": "You’re very welcome! Always happy to help. 😊",
-        "thank you so much": "It’s my pleasure! 💙 Glad I could help you out.",
-        "appreciate it": "Glad to hear that! 😊 Let me know if you’d like to understand more about your results.",
-
-        # 🌟 Compliments
-        "you are great": "Aww, thank you! 🤖 I'm here to make health information easier for you.",
-        "you’re awesome": "Thank you! 💙 I’m just doing my job — helping you stay informed!",
-        "good bot": "Thanks! 😄 I appreciate that.",
-        "nice work": "Thanks! 😊 Glad you liked it.",
-        "well done": "Thank you! 💪 Let’s keep understanding your health together.",
-
-        # 👋 Farewells
-        "bye": "Goodbye! 👋 Take care and stay healthy.",
-        "see you": "See you later! 👋 Stay safe and healthy!",
-        "talk to you later": "Sure thing! I’ll be here whenever you need help with your CBC report.",
-        "goodbye": "Goodbye! 💙 Take care of your health.",
-
-        # 👍 Affirmations & Acknowledgments
-        "ok": "Got it! 👍 Let’s continue.",
-        "okay": "Okay! 😊 What would you like to know next?",
-        "sure": "Sure thing! 🤖 I’m ready to help.",
-        "yes": "Yes! 😊 Please go ahead with your question.",
-        "yep": "Yep! 👍 I’m here and ready.",
-        "yeah": "Yeah! Let’s continue exploring your report.",
-        "alright": "Alright! 😊 Let’s get started.",
-        "fine": "Glad to hear that! 💙 How can I assist you?",
-        "cool": "Cool 😎 Let’s move ahead.",
-        "great": "Awesome! 💪 What’s your next question?",
-        "perfect": "Perfect! 🤖 Let’s continue.",
-        "no": "No worries! 😊 Let me know if you change your mind.",
-        "not really": "That’s okay! 💙 I can still help if you’d like to know something specific."
-    }
-
-    q_lower = question.lower().strip()
-    for phrase, response in casual_phrases.items():
-        if phrase in q_lower:
-            return response
+    # Greetings and casual conversation
+    casual = match.first('casual')
+    if casual is not None:
+        return CASUAL_RESPONSES[casual]
 
     try:
-        return generate_enhanced_rule_based_response(question, cbc_data, assessment)
-    except Exception as e:
-        print(f"Error in AI response: {e}")
+        return generate_enhanced_rule_based_response(question, cbc_data, assessment, match, stream)
+    except Exception:
+        logger.exception("Error in AI response")
         return "I'm here to help you understand your CBC report. Please ask me about your specific results!"
 
 
@@ -447,105 +421,82 @@ Shows variation in red blood cell size.
 # Complete, self-contained rule-based response engine for CBC chat UI
 # Includes generate_enhanced_rule_based_response and supporting helpers
 
-def generate_enhanced_rule_based_response(question, cbc_data, assessment):
-    """Main response generation with comprehensive question handling."""
-    question_lower = (question or "").lower().strip()
+def generate_enhanced_rule_based_response(question, cbc_data, assessment, match=None, stream=False):
+    """Main response generation with comprehensive question handling.
 
-    # Parameter mapping (all keys should be lowercase)
-    param_variations = get_comprehensive_param_mapping()
+    ``match`` is the question's ``chat_intents`` match, when the caller already has it.
+    """
+    if match is None:
+        match = chat_intents.match((question or "").lower().strip())
 
     # 1. "what to do" questions
-    if any(phrase in question_lower for phrase in ["what to do", "what should i do", "what can i do", "how to fix", "how to improve", "what to eat", "how to treat"]):
-        response = get_what_to_do_response(question_lower, assessment, param_variations)
+    if match.has('what_to_do'):
+        response = get_what_to_do_response(match, assessment)
         if response:
             return response
 
     # 2. high/low value questions
-    if any(pattern in question_lower for pattern in ["high", "low", "elevated", "decreased", "why is", "what if", "above", "below"]):
-        response = get_high_low_advice(question_lower, assessment, param_variations)
+    if match.has('high_low'):
+        response = get_high_low_advice(match, assessment)
         if response:
             return response
 
     # 3. parameter explanation requests
-    if any(word in question_lower for word in ["what is", "explain", "tell me about", "meaning of", "define"]):
-        response = get_parameter_explanation(question_lower, assessment, param_variations)
+    if match.has('explain'):
+        response = get_parameter_explanation(match, assessment)
         if response:
             return response
 
     # 4. "my value" or specific value queries
-    if any(word in question_lower for word in ["my", "level", "value", "result", "count", "reading", "score"]):
-        response = get_parameter_value_response(question_lower, assessment, param_variations)
+    if match.has('value'):
+        response = get_parameter_value_response(match, assessment)
         if response:
             return response
 
     # 5. normal range questions
-    if any(term in question_lower for term in ["normal", "range", "reference", "should be"]):
+    if match.has('normal_range'):
         # if specific param asked, return value; else list normal ranges
-        if any(param in question_lower for param in param_variations.keys()):
-            response = get_parameter_value_response(question_lower, assessment, param_variations)
+        if match.aliases:
+            response = get_parameter_value_response(match, assessment)
             if response:
                 return response
         return get_clean_normal_ranges()
 
     # 6. overall report questions
-    if any(term in question_lower for term in ["summary", "overview", "overall", "report", "everything", "all results", "full report"]):
+    if match.has('summary'):
         return get_clean_report_summary(assessment, cbc_data)
 
     # 7. concern/worry questions
-    if any(word in question_lower for word in ["worried", "concern", "dangerous", "serious", "risk", "problem", "should i be"]):
-        return get_reassurance_response(question_lower, assessment, param_variations)
+    if match.has('worry'):
+        return get_reassurance_response(match, assessment)
 
     # 8. comparison questions
-    if any(word in question_lower for word in ["compare", "difference", "versus", "vs", "better", "worse"]):
-        return get_comparison_response(question_lower, assessment, param_variations)
+    if match.has('compare'):
+        return get_comparison_response(match, assessment)
 
     # 9. general CBC questions
-    if "cbc" in question_lower or "complete blood count" in question_lower:
-        return get_cbc_general_info(question_lower, assessment)
-
-    # 10. default intelligent response
-    return get_smart_guidance_response(question_lower, assessment, cbc_data, param_variations)
+    if match.has('cbc'):
+        return get_cbc_general_info(match.text, assessment)
 
+    # 10. free-form question: local language model, when it is running
+    response = get_llm_response(question or "", assessment, stream)
+    if response:
+        return response
 
-def get_comprehensive_param_mapping():
-    """Return mapping from many keyword variations (lowercase) to canonical assessment keys."""
-    return {
-        # Hemoglobin
-        "hemoglobin": "HEMOGLOBIN", "hgb": "HEMOGLOBIN", "hb": "HEMOGLOBIN", "haemoglobin": "HEMOGLOBIN",
-        # WBC
-        "wbc": "TOTAL LEUKOCYTE COUNT", "white blood cell": "TOTAL LEUKOCYTE COUNT", "white blood cells": "TOTAL LEUKOCYTE COUNT",
-        "white blood": "TOTAL LEUKOCYTE COUNT", "leukocyte": "TOTAL LEUKOCYTE COUNT", "tlc": "TOTAL LEUKOCYTE COUNT",
-        # RBC
-        "rbc": "RBC COUNT", "red blood cell": "RBC COUNT", "red blood": "RBC COUNT", "red cell": "RBC COUNT", "erythrocyte": "RBC COUNT",
-        # Platelets
-        "platelet": "PLATELET COUNT", "plt": "PLATELET COUNT", "thrombocyte": "PLATELET COUNT", "platelets": "PLATELET COUNT",
-        # Hematocrit
-        "hematocrit": "HEMATOCRIT", "hct": "HEMATOCRIT", "haematocrit": "HEMATOCRIT", "pcv": "HEMATOCRIT",
-        # MCV / MCH / MCHC / RDW
-        "mcv": "MCV", "mean corpuscular volume": "MCV", "cell size": "MCV",
-        "mch": "MCH", "mean corpuscular hemoglobin": "MCH",
-        "mchc": "MCHC", "mean corpuscular hemoglobin concentration": "MCHC",
-        "rdw": "RDW", "red cell distribution width": "RDW",
-        # Differential
-        "neutrophil": "NEUTROPHILS", "neut": "NEUTROPHILS", "neutro": "NEUTROPHILS", "polymorph": "NEUTROPHILS", "pmn": "NEUTROPHILS",
-        "lymphocyte": "LYMPHOCYTES", "lymph": "LYMPHOCYTES", "lympho": "LYMPHOCYTES",
-        "monocyte": "MONOCYTES", "mono": "MONOCYTES",
-        "eosinophil": "EOSINOPHILS", "eos": "EOSINOPHILS", "eosino": "EOSINOPHILS",
-        "basophil": "BASOPHILS", "baso": "BASOPHILS",
-    }
+    # 11. default intelligent response
+    return get_smart_guidance_response(match, assessment, cbc_data)
 
 
-def find_parameter_in_assessment(question_lower, assessment, param_variations):
+def find_parameter_in_assessment(match, assessment):
     """Return (assessment_key, data) if the question mentions a parameter present in assessment."""
     assessed = assessment.get('assessed', {}) if assessment else {}
-    for keyword, assessment_key in param_variations.items():
-        if keyword in question_lower:
-            data = assessed.get(assessment_key)
-            if data and data.get('value') is not None:
-                return assessment_key, data
+    for keyword, assessment_key in match.aliases:
+        data = assessed.get(assessment_key)
+        if data and data.get('value') is not None:
+            return assessment_key, data
     # Try simple fallback: if question explicitly names a canonical key
     for key in assessed.keys():
-        if key.lower() in question_lower:
+        if match.mentions(key.lower()):
             data = assessed.get(key)
             if data and data.get('value') is not None:
                 return key, data
@@ -692,9 +643,9 @@ def get_low_recommendations(param_key, data):
 # -------------------------------
 # Existing helpers (explanations/value retrieval/etc.)
 # -------------------------------
-def get_parameter_explanation(question_lower, assessment, param_variations):
+def get_parameter_explanation(match, assessment):
     """Provide friendly explanations of parameters referenced in the question."""
-    param_key, data = find_parameter_in_assessment(question_lower, assessment, param_variations)
+    param_key, data = find_parameter_in_assessment(match, assessment)
     param_info = {
         "HEMOGLOBIN": {"name": "Hemoglobin", "simple": "the protein in red blood cells that carries oxygen"},
         "TOTAL LEUKOCYTE COUNT": {"name": "White Blood Cells (WBC)", "simple": "your immune system's defense team"},
@@ -721,9 +672,9 @@ def get_parameter_explanation(question_lower, assessment, param_variations):
     return None
 
 
-def get_parameter_value_response(question_lower, assessment, param_variations):
+def get_parameter_value_response(match, assessment):
     """Return value and short guidance for requested parameter."""
-    param_key, data = find_parameter_in_assessment(question_lower, assessment, param_variations)
+    param_key, data = find_parameter_in_assessment(match, assessment)
     if param_key and data:
         status = data.get('status', 'Unknown')
         response = f"**{param_key}:** {data['value']:.2f} {data.get('unit', '')}\n\n"
@@ -739,20 +690,20 @@ def get_parameter_value_response(question_lower, assessment, param_variations):
         return response
 
     # If not found, try to detect referenced param keywords and provide helpful message
-    for keyword, assessment_key in param_variations.items():
-        if keyword in question_lower:
-            return f"I couldn't find {assessment_key} in this report. It may not be measured or the report hasn't been analyzed yet."
+    if match.aliases:
+        assessment_key = match.aliases[0][1]
+        return f"I couldn't find {assessment_key} in this report. It may not be measured or the report hasn't been analyzed yet."
     return None
 
 
-def get_high_low_advice(question_lower, assessment, param_variations):
+def get_high_low_advice(match, assessment):
     """Route to high/low recommendation helpers based on question intent."""
-    param_key, data = find_parameter_in_assessment(question_lower, assessment, param_variations)
+    param_key, data = find_parameter_in_assessment(match, assessment)
     if not param_key or not data:
         return None
     status = data.get('status', '')
-    asking_high = any(word in question_lower for word in ["high", "elevated", "increase", "above"])
-    asking_low = any(word in question_lower for word in ["low", "decrease", "reduced", "below"])
+    asking_high = match.has('asking_high')
+    asking_low = match.has('asking_low')
     # If user asked specifically about high/low
     if asking_high and status == "High":
         return get_high_recommendations(param_key, data)
@@ -771,9 +722,9 @@ def get_high_low_advice(question_lower, assessment, param_variations):
     return None
 
 
-def get_what_to_do_response(question_lower, assessment, param_variations):
+def get_what_to_do_response(match, assessment):
     """Return practical advice when user asks what to do about a parameter."""
-    param_key, data = find_parameter_in_assessment(question_lower, assessment, param_variations)
+    param_key, data = find_parameter_in_assessment(match, assessment)
     if param_key and data:
         status = data.get('status', '')
         if status == "High":
@@ -786,9 +737,9 @@ def get_what_to_do_response(question_lower, assessment, param_variations):
     return get_general_action_plan(assessment)
 
 
-def get_reassurance_response(question_lower, assessment, param_variations):
+def get_reassurance_response(match, assessment):
     """Provide calming, reassuring response for worry-related queries."""
-    param_key, data = find_parameter_in_assessment(question_lower, assessment, param_variations)
+    param_key, data = find_parameter_in_assessment(match, assessment)
     if param_key and data:
         status = data.get('status', 'Unknown')
         if status == 'Normal':
@@ -802,11 +753,11 @@ def get_reassurance_response(question_lower, assessment, param_variations):
     return (f"I see {abnormal_count} parameter(s) outside reference ranges. Many causes are temporary; please follow up with your clinician for tailored guidance.")
 
 
-def get_comparison_response(question_lower, assessment, param_variations):
+def get_comparison_response(match, assessment):
     """Compare multiple parameters mentioned in the question."""
     mentioned = []
-    for keyword, assessment_key in param_variations.items():
-        if keyword in question_lower and assessment_key in assessment.get('assessed', {}):
+    for keyword, assessment_key in match.aliases:
+        if assessment_key in assessment.get('assessed', {}):
             mentioned.append(assessment_key)
     if len(mentioned) < 2:
         return None
@@ -837,11 +788,11 @@ def get_general_action_plan(assessment):
     return response
 
 
-def get_smart_guidance_response(question_lower, assessment, cbc_data, param_variations):
+def get_smart_guidance_response(match, assessment, cbc_data):
     """Fallback: attempt to infer user's intent and suggest next steps or values."""
     # Try to find a param match
-    for keyword, param_key in param_variations.items():
-        if keyword in question_lower and param_key in assessment.get('assessed', {}):
+    for keyword, param_key in match.aliases:
+        if param_key in assessment.get('assessed', {}):
             data = assessment['assessed'][param_key]
             return (f"**{param_key}:** {data.get('value','N/A')} {data.get('unit','')} — {data.get('status','Unknown')}\n"
                     f"Ask: 'What does this mean?', 'What should I do?', or 'What's the normal range?'")
@@ -898,6 +849,23 @@ def get_clean_normal_ranges():
     )
 
 
+@app.before_request
+def start_request_timer():
+    if REGISTRY.enabled:
+        g.request_start = time.perf_counter()
+
+
+@app.after_request
+def observe_request_time(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        # Label by URL rule, not path, so /jobs/<job_id> stays one series
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        REQUEST_SECONDS.observe(time.perf_counter() - start, route=route,
+                                method=request.method, status=str(response.status_code))
+    return response
+
+
 # Routes
 @app.route('/')
 def index():
@@ -917,7 +885,7 @@ def chat():
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    """Handle file upload and OCR"""
+    """Handle file upload; OCR and analysis run as a background job"""
     if 'file' not in request.files:
         return jsonify({'error': 'No file uploaded'}), 400
     
@@ -925,27 +893,225 @@ def upload_file():
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
-    # Save file
-    filename = secure_filename(file.filename)
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"{timestamp}_{filename}"
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
+    # Save file under its content hash so re-uploads reuse the same copy
+    with stage_timer('save_file'):
+        content = file.read()
+        digest = hashlib.sha256(content).hexdigest()
+        extension = os.path.splitext(secure_filename(file.filename))[1].lower()
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{digest}{extension}")
+        if not os.path.exists(filepath):
+            with open(filepath, 'wb') as f:
+                f.write(content)
     
-    # Extract text
-    extracted_text, error = extract_text_from_file(filepath)
+    session['filepath'] = filepath
     
-    if error:
-        return jsonify({'error': f'OCR failed: {error}'}), 500
+    job = jobs.submit(
+        upload_pipeline,
+        filepath,
+        digest,
+        session.get('username'),
+        request.form.get('age', type=int),
+        request.form.get('sex'),
+        request.form.get('lab_profile') or DEFAULT_PROFILE,
+        owner=session.sid
+    )
     
-    # Store in session
-    session['raw_text'] = extracted_text
-    session['filepath'] = filepath
+    return jsonify({'success': True, 'job_id': job.id}), 202
+
+
+def upload_pipeline(job, filepath, digest, username, age, sex, lab_profile):
+    """Background job: OCR -> extract_cbc_clean -> assess_cbc -> save_report"""
+    jobs.update(job, stage='ocr')
+    extracted_text = ocr_cache.get(digest)
+    if extracted_text is not None:
+        jobs.update(job, cached=True)
+    else:
+        with stage_timer('ocr'):
+            extracted_text = run_ocr(job, filepath, digest)
     
-    return jsonify({
+    return run_analysis(
+        extracted_text, username, age=age, sex=sex, lab_profile=lab_profile,
+        on_stage=lambda stage: jobs.update(job, stage=stage)
+    )
+
+
+def run_ocr(job, filepath, digest):
+    """OCR an uploaded file for a job, caching the text"""
+    def on_progress(pages_done, pages_total):
+        jobs.update(job, pages_done=pages_done, pages_total=pages_total)
+    
+    if ocr_pool is None and app.config['OCR_STREAMING'] and filepath.lower().endswith('.pdf'):
+        # OCR page by page; stop once the CBC table has been read in full
+        try:
+            extracted_text, stopped_early = collect_cbc_text(
+                iter_text_pages(filepath, on_progress=on_progress), page_break=PAGE_BREAK
+            )
+        except OCRError as e:
+            raise RuntimeError(f'OCR failed: {e}')
+        jobs.update(job, stopped_early=stopped_early)
+    else:
+        if ocr_pool is None:
+            extracted_text, error = extract_text_from_file(filepath, on_progress=on_progress)
+        else:
+            ocr_job_id = ocr_pool.submit(filepath)
+            extracted_text, error = ocr_pool.result(ocr_job_id, timeout=app.config['OCR_TIMEOUT'])
+        
+        if error:
+            raise RuntimeError(f'OCR failed: {error}')
+    
+    # Text collected up to an early stop extracts the same as the whole document
+    ocr_cache.put(digest, extracted_text)
+    return extracted_text
+
+
+def run_analysis(raw_text, username, age=None, sex=None, lab_profile=DEFAULT_PROFILE, on_stage=None):
+    """Extract, assess and persist a report. Returns the values kept in the session."""
+    on_stage = on_stage or (lambda stage: None)
+    
+    # Extract CBC data
+    on_stage('extract')
+    with stage_timer('extract'):
+        cbc_data = extract_cbc_clean(raw_text)
+    
+    # Age and sex from the caller or extracted data
+    age = age or cbc_data.get('Age')
+    sex = sex or cbc_data.get('Sex')
+    
+    # Assess CBC
+    on_stage('assess')
+    with stage_timer('assess'):
+        assessment = assess_cbc(cbc_data['Parameters'], age=age, sex=sex, profile=lab_profile)
+    
+    # Save to database
+    on_stage('save')
+    with stage_timer('create_user'):
+        user_id = db.create_user(username)
+    with stage_timer('save_report'):
+        report_id = db.save_report(
+            user_id,
+            age,
+            sex,
+            raw_text,
+            cbc_data['Parameters'],
+            assessment,
+            lab_profile=lab_profile
+        )
+    
+    analysis = {
+        'raw_text': raw_text,
+        'cbc_data': cbc_data,
+        'assessment': assessment,
+        'age': age,
+        'sex': sex,
+        'lab_profile': lab_profile,
+        'user_id': user_id,
+        'report_id': report_id,
+        'report_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'assessment_fingerprint': assessment_fingerprint(assessment, cbc_data)
+    }
+    
+    if app.config['PDF_PRERENDER']:
+        jobs.submit(prerender_report, analysis)
+    return analysis
+
+
+def report_pdf(report_id, fingerprint, assessment, age, sex, report_date):
+    """PDF of a report from the on-disk cache, rendered on a miss"""
+    def render():
+        with stage_timer('render_pdf'):
+            return render_report_pdf(assessment, age, sex, report_date)
+    
+    if report_id is None:
+        return render()
+    return report_cache.get_or_render(report_cache_key(report_id, fingerprint), render)
+
+
+def prerender_report(job, analysis):
+    """Background job: render an analysis's PDF ahead of /download_full_report"""
+    try:
+        report_pdf(analysis['report_id'], analysis['assessment_fingerprint'], analysis['assessment'],
+                   analysis['age'], analysis['sex'], analysis['report_date'])
+    except ImportError:
+        pass  # reportlab not installed; /download_full_report reports it
+
+
+def store_analysis(analysis):
+    """Make an analysis the session's current report"""
+    for key, value in analysis.items():
+        session[key] = value
+
+
+def analysis_response(analysis):
+    """JSON body describing an analysis, as returned by /analyze"""
+    results = []
+    for param, data in analysis['assessment']['assessed'].items():
+        if data['value'] is not None:
+            results.append({
+                'parameter': param,
+                'value': round(data['value'], 2),
+                'unit': data['unit'],
+                'status': data['status'],
+                'range': data.get('range', 'N/A')
+            })
+    
+    return {
         'success': True,
-        'text': extracted_text[:500] + '...' if len(extracted_text) > 500 else extracted_text
-    })
+        'age': analysis['age'],
+        'sex': analysis['sex'],
+        'results': results,
+        'report_id': analysis['report_id']
+    }
+
+
+def _get_own_job(job_id):
+    """A job submitted from this session, or None"""
+    # Owned by session id: anonymous sessions share no username to tell them apart
+    job = jobs.get(job_id)
+    if job is None or job.owner is None or job.owner != session.sid:
+        return None
+    return job
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Report a background job's stage; once done, load its result into the session"""
+    job = _get_own_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    
+    body = job.to_dict()
+    if job.status == 'done':
+        # Polls after the first would rewrite the same session payload
+        if session.get('report_id') != job.result['report_id']:
+            store_analysis(job.result)
+        body.update(analysis_response(job.result))
+    elif job.status == 'error':
+        body['success'] = False
+    
+    return jsonify(body)
+
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Server-Sent Events stream of a job's stage changes"""
+    job = _get_own_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    
+    def stream():
+        version = job.version
+        while True:
+            yield f"data: {json.dumps(job.to_dict())}\n\n"
+            if job.finished:
+                return
+            new_version = jobs.wait_for_change(job, version, timeout=15)
+            while new_version == version:
+                yield ": keepalive\n\n"
+                new_version = jobs.wait_for_change(job, version, timeout=15)
+            version = new_version
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @app.route('/upload_text', methods=['POST'])
@@ -970,75 +1136,37 @@ def analyze():
     
     raw_text = session['raw_text']
     
-    # DEBUG: Print raw text (first 500 characters)
-    print("=== RAW TEXT (first 500 chars) ===")
-    print(raw_text[:500])
-    print("==================================")
-    
-    # Extract CBC data
-    cbc_data = extract_cbc_clean(raw_text)
-    
-    # DEBUG: Print extracted CBC data
-    print("=== EXTRACTED CBC DATA ===")
-    print(f"Age: {cbc_data.get('Age')}")
-    print(f"Sex: {cbc_data.get('Sex')}")
-    print("Parameters:")
-    for param, value in cbc_data.get('Parameters', {}).items():
-        if value is not None:
-            print(f"  {param}: {value}")
-    print("Raw Parameters:")
-    for param, raw_data in cbc_data.get('Raw_Parameters', {}).items():
-        if raw_data.get('raw'):
-            print(f"  {param}: {raw_data.get('raw')} {raw_data.get('unit')}")
-    print("===========================")
-
-    # Get age and sex from request or extracted data
     data = request.json or {}
-    age = data.get('age') or cbc_data.get('Age')
-    sex = data.get('sex') or cbc_data.get('Sex')
+    try:
+        analysis = run_analysis(
+            raw_text,
+            session.get('username'),
+            age=data.get('age'),
+            sex=data.get('sex'),
+            lab_profile=data.get('lab_profile') or DEFAULT_PROFILE
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Assess CBC
-    assessment = assess_cbc(cbc_data['Parameters'], age=age, sex=sex)
+    # Parse dump (contains patient data): DEBUG level and sampled
+    if sample_debug(logger):
+        cbc_data = analysis['cbc_data']
+        logger.debug("extracted CBC data", extra={
+            'route': 'analyze',
+            'raw_text_head': raw_text[:500],
+            'age': cbc_data.get('Age'),
+            'sex': cbc_data.get('Sex'),
+            'parameters': {k: v for k, v in cbc_data.get('Parameters', {}).items() if v is not None},
+            'raw_parameters': {
+                k: f"{v.get('raw')} {v.get('unit')}"
+                for k, v in cbc_data.get('Raw_Parameters', {}).items() if v.get('raw')
+            }
+        })
     
     # Store in session
-    session['cbc_data'] = cbc_data
-    session['assessment'] = assessment
-    session['age'] = age
-    session['sex'] = sex
-    
-    # Save to database
-    user_id = db.create_user(session.get('username'))
-    session['user_id'] = user_id
-    
-    report_id = db.save_report(
-        user_id,
-        age,
-        sex,
-        raw_text,
-        cbc_data['Parameters'],
-        assessment
-    )
-    session['report_id'] = report_id
+    store_analysis(analysis)
     
-    # Prepare response
-    results = []
-    for param, data in assessment['assessed'].items():
-        if data['value'] is not None:
-            results.append({
-                'parameter': param,
-                'value': round(data['value'], 2),
-                'unit': data['unit'],
-                'status': data['status'],
-                'range': data.get('range', 'N/A')
-            })
-    
-    return jsonify({
-        'success': True,
-        'age': age,
-        'sex': sex,
-        'results': results,
-        'report_id': report_id
-    })
+    return jsonify(analysis_response(analysis))
 
 
 @app.route('/ask', methods=['POST'])
@@ -1058,17 +1186,28 @@ def ask_question():
     # Generate response
     cbc_data = session['cbc_data']
     assessment = session['assessment']
+    fingerprint = session.get('assessment_fingerprint')
+    if fingerprint is None:
+        fingerprint = session['assessment_fingerprint'] = assessment_fingerprint(assessment, cbc_data)
     
-    response = generate_ai_response(question, cbc_data, assessment)
+    with stage_timer('answer'):
+        key = (normalize_question(question), fingerprint)
+        response = answer_cache.get(key)
+        if response is None:
+            response = generate_ai_response(question, cbc_data, assessment)
+            # A stand-in for an unreachable model must not outlive the outage
+            if not g.get('llm_fallback'):
+                answer_cache.put(key, response)
     
     # Save to database
     if 'user_id' in session and 'report_id' in session:
-        db.save_chat(
-            session['user_id'],
-            session['report_id'],
-            question,
-            response
-        )
+        with stage_timer('save_chat'):
+            db.save_chat(
+                session['user_id'],
+                session['report_id'],
+                question,
+                response
+            )
     
     return jsonify({
         'success': True,
@@ -1076,6 +1215,81 @@ def ask_question():
     })
 
 
+def split_sections(text):
+    """Break a finished answer into paragraph-sized pieces for streaming."""
+    sections = text.split('\n\n')
+    return [section + '\n\n' for section in sections[:-1]] + [sections[-1]]
+
+
+def sse_event(payload):
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+@app.route('/ask/stream', methods=['POST'])
+def ask_question_stream():
+    """Handle chat questions, sending the answer as Server-Sent Events while it is produced"""
+    if 'cbc_data' not in session or 'assessment' not in session:
+        return jsonify({
+            'error': 'Please analyze a report first before asking questions.'
+        }), 400
+    
+    data = request.json
+    question = data.get('question', '')
+    
+    if not question:
+        return jsonify({'error': 'No question provided'}), 400
+    
+    cbc_data = session['cbc_data']
+    assessment = session['assessment']
+    fingerprint = session.get('assessment_fingerprint')
+    if fingerprint is None:
+        fingerprint = session['assessment_fingerprint'] = assessment_fingerprint(assessment, cbc_data)
+    user_id = session.get('user_id')
+    report_id = session.get('report_id')
+    
+    key = (normalize_question(question), fingerprint)
+    response = answer_cache.get(key)
+    cached = response is not None
+    if not cached:
+        with stage_timer('answer'):
+            response = generate_ai_response(question, cbc_data, assessment, stream=True)
+    fallback = g.get('llm_fallback', False)
+    
+    def events():
+        # Rule-based answers are ready at once and go out a section at a time;
+        # language-model answers are relayed token by token
+        pieces = split_sections(response) if isinstance(response, str) else response
+        parts = []
+        complete = True
+        try:
+            for piece in pieces:
+                parts.append(piece)
+                yield sse_event({'delta': piece})
+        except LLMUnavailable as e:
+            complete = False
+            logger.warning("Language model stream broke off: %s", e)
+        answer = ''.join(parts)
+        
+        if complete and not cached and not fallback:
+            answer_cache.put(key, answer)
+        # Save to database once the whole answer has been sent
+        if user_id and report_id and answer:
+            with stage_timer('save_chat'):
+                db.save_chat(user_id, report_id, question, answer)
+        yield sse_event({'done': True, 'complete': complete})
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/metrics')
+def metrics():
+    """Request/stage timings and OCR/cache counters in the Prometheus text format"""
+    if not REGISTRY.enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/history')
 def get_history():
     """Get user's report history"""
@@ -1110,29 +1324,40 @@ def get_trends():
     if 'user_id' not in session:
         return jsonify({'trends': {}})
     
-    reports = db.get_user_reports(session['user_id'], limit=10)
-    
-    if len(reports) < 2:
+    if db.count_user_reports(session['user_id']) < 2:
         return jsonify({'message': 'Need at least 2 reports to show trends'})
     
-    # Extract trends for key parameters
-    trends = {}
+    # Trends for key parameters, oldest first
     key_params = ['HEMOGLOBIN', 'TOTAL LEUKOCYTE COUNT', 'PLATELET COUNT']
-    
-    for param in key_params:
-        trends[param] = []
-        for report in reversed(reports):
-            param_data = report['assessment']['assessed'].get(param)
-            if param_data:
-                trends[param].append({
-                    'date': report['date'],
-                    'value': param_data['value'],
-                    'status': param_data['status']
-                })
+    series = db.get_parameter_series(session['user_id'], key_params, limit=10)
+    trends = {param: series.get(param, []) for param in key_params}
     
     return jsonify({'trends': trends})
 
 
+@app.route('/trends/series')
+def get_trend_series():
+    """Full-history trends: LTTB-downsampled points and windowed aggregates as columnar arrays"""
+    if 'user_id' not in session:
+        return jsonify({'trends': {}})
+    
+    points = min(max(request.args.get('points', 60, type=int), 3), 500)
+    windows = min(max(request.args.get('windows', 12, type=int), 1), 100)
+    parameters = request.args.get('parameters')
+    parameters = [p.strip() for p in parameters.split(',') if p.strip()] if parameters else None
+    
+    with stage_timer('trends'):
+        trends = build_trends(
+            db.get_parameter_columns(session['user_id'], parameters),
+            db.get_parameter_windows(session['user_id'], windows, parameters),
+            points
+        )
+    
+    if not trends:
+        return jsonify({'message': 'No trend data available from historical reports'})
+    return jsonify({'trends': trends, 'points': points, 'windows': windows})
+
+
 @app.route('/summary')
 def get_summary():
     """Get current report summary"""
@@ -1193,25 +1418,6 @@ def get_analyzer_data():
         cbc_data = session['cbc_data']
         assessment = session['assessment']
         
-        # DEBUG: Print what's actually in cbc_data
-        print("=== DEBUG: CBC DATA STRUCTURE ===")
-        print(f"Age: {cbc_data.get('Age')}")
-        print(f"Sex: {cbc_data.get('Sex')}")
-        print("Parameters found:")
-        if 'Parameters' in cbc_data and cbc_data['Parameters']:
-            for param, value in cbc_data['Parameters'].items():
-                print(f"  - {param}: {value}")
-        else:
-            print("  No parameters found or 'Parameters' key is empty!")
-        
-        print("Raw Parameters:")
-        if 'Raw_Parameters' in cbc_data and cbc_data['Raw_Parameters']:
-            for param, raw_data in cbc_data['Raw_Parameters'].items():
-                print(f"  - {param}: {raw_data}")
-        else:
-            print("  No raw parameters found!")
-        print("==================================")
-        
         # Unit scaling
         unit_scaling = {
             "10*3": 1e-3,
@@ -1255,15 +1461,16 @@ def get_analyzer_data():
                 "Status": None
             })
         
-        # DEBUG: Print what's being sent to frontend
-        print("=== DEBUG: Sending to Frontend ===")
-        print(f"Parameters count: {len(df_list)}")
-        for item in df_list:
-            print(f"  - {item['Parameter']}: {item['Value']} {item['Unit']} (Status: {item.get('Status', 'N/A')})")
-        print(f"Absolute counts: {len(absolute_counts)}")
-        for item in absolute_counts:
-            print(f"  - {item['Parameter']}: {item['Value']} {item['Unit']}")
-        print("==================================")
+        # Response dump (contains patient data): DEBUG level and sampled
+        if sample_debug(logger):
+            logger.debug("analyzer data", extra={
+                'route': 'get_analyzer_data',
+                'age': cbc_data.get('Age'),
+                'sex': cbc_data.get('Sex'),
+                'raw_parameters': cbc_data.get('Raw_Parameters'),
+                'parameters': df_list,
+                'absolute_counts': absolute_counts
+            })
         
         return jsonify({
             'success': True,
@@ -1272,7 +1479,7 @@ def get_analyzer_data():
         })
         
     except Exception as e:
-        print(f"Error in get_analyzer_data: {e}")
+        logger.exception("Error in get_analyzer_data")
         return jsonify({'error': f'Error processing analyzer data: {str(e)}'}), 500
     
 @app.route('/update_parameter', methods=['POST'])
@@ -1298,10 +1505,13 @@ def update_parameter():
         # Re-assess
         age = session.get('age')
         sex = session.get('sex')
-        assessment = assess_cbc(cbc_data['Parameters'], age=age, sex=sex)
+        lab_profile = session.get('lab_profile', DEFAULT_PROFILE)
+        assessment = assess_cbc(cbc_data['Parameters'], age=age, sex=sex, profile=lab_profile)
         
         session['cbc_data'] = cbc_data
         session['assessment'] = assessment
+        # New fingerprint: cached answers for the old values stop matching
+        session['assessment_fingerprint'] = assessment_fingerprint(assessment, cbc_data)
         
         return jsonify({'success': True})
     
@@ -1371,7 +1581,7 @@ def get_correlations():
         })
         
     except Exception as e:
-        print(f"Error in get_correlations: {e}")
+        logger.exception("Error in get_correlations")
         return jsonify({'error': f'Error processing correlations: {str(e)}'}), 500
 
 @app.route('/get_all_trends', methods=['GET'])
@@ -1381,38 +1591,11 @@ def get_all_trends():
         return jsonify({'message': 'Please log in to view trends'})
     
     try:
-        reports = db.get_user_reports(session['user_id'], limit=4)
-        
-        if len(reports) == 0:
+        if db.count_user_reports(session['user_id']) == 0:
             return jsonify({'message': 'No historical reports found. Analyze at least one report to see trends.'})
         
-        # Extract all parameters from all reports
-        all_params = set()
-        for report in reports:
-            if 'parameters' in report and report['parameters']:
-                for param in report['parameters'].keys():
-                    if report['parameters'][param] is not None:
-                        all_params.add(param)
-        
-        trends = {}
-        for param in all_params:
-            trends[param] = []
-            for report in reports:
-                if ('assessment' in report and 
-                    'assessed' in report['assessment'] and 
-                    param in report['assessment']['assessed']):
-                    
-                    param_data = report['assessment']['assessed'][param]
-                    if param_data and param_data.get('value') is not None:
-                        trends[param].append({
-                            'date': report['date'],
-                            'value': param_data['value'],
-                            'status': param_data.get('status', 'Unknown'),
-                            'unit': param_data.get('unit', 'N/A')
-                        })
-        
-        # Remove empty trends
-        trends = {k: v for k, v in trends.items() if v}
+        # Every parameter read from at least one of the reports, newest first
+        trends = db.get_parameter_series(session['user_id'], limit=4, newest_first=True, measured=True)
         
         if not trends:
             return jsonify({'message': 'No trend data available from historical reports'})
@@ -1420,7 +1603,7 @@ def get_all_trends():
         return jsonify({'trends': trends})
         
     except Exception as e:
-        print(f"Error in get_all_trends: {e}")
+        logger.exception("Error in get_all_trends")
         return jsonify({'error': f'Error processing trends: {str(e)}'}), 500
 
 
@@ -1431,20 +1614,8 @@ def clear_history():
         return jsonify({'error': 'No user found'}), 400
     
     try:
-        # Delete from database
-        conn = sqlite3.connect(db.db_path)
-        cursor = conn.cursor()
-        
-        user_id = session['user_id']
-        
-        # Delete chat history
-        cursor.execute('DELETE FROM chat_history WHERE user_id = ?', (user_id,))
-        
-        # Delete reports
-        cursor.execute('DELETE FROM reports WHERE user_id = ?', (user_id,))
-        
-        conn.commit()
-        conn.close()
+        # Delete chat history and reports from database
+        db.clear_user_history(session['user_id'])
         
         # Clear session
         session.clear()
@@ -1460,89 +1631,20 @@ def download_full_report():
     if 'assessment' not in session or 'cbc_data' not in session:
         return jsonify({'error': 'No report to download'}), 400
     
+    assessment = session['assessment']
+    fingerprint = session.get('assessment_fingerprint')
+    if fingerprint is None:
+        fingerprint = session['assessment_fingerprint'] = assessment_fingerprint(assessment, session['cbc_data'])
+    # Sessions from before reports were dated at analysis time get one on first download
+    report_date = session.get('report_date')
+    if report_date is None:
+        report_date = session['report_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
     try:
-        from reportlab.lib.pagesizes import letter, A4
-        from reportlab.lib import colors
-        from reportlab.lib.units import inch
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from io import BytesIO
-        from datetime import datetime
-        
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#0d47a1'),
-            spaceAfter=30,
-            alignment=1  # Center
-        )
-        elements.append(Paragraph("CBC Lab Report Analysis", title_style))
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Patient Info
-        patient_data = session.get('patient_data', {})
-        info_text = f"""
-        <b>Patient Information</b><br/>
-        Name: {patient_data.get('name', 'N/A')}<br/>
-        Age: {session.get('age', 'N/A')}<br/>
-        Sex: {session.get('sex', 'N/A')}<br/>
-        Report Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-        """
-        elements.append(Paragraph(info_text, styles['Normal']))
-        elements.append(Spacer(1, 0.5*inch))
-        
-        # Results Table
-        assessment = session['assessment']
-        table_data = [['Parameter', 'Value', 'Unit', 'Status', 'Reference Range']]
-        
-        for param, data in assessment['assessed'].items():
-            if data['value'] is not None:
-                table_data.append([
-                    param,
-                    f"{data['value']:.2f}",
-                    data['unit'],
-                    data['status'],
-                    data.get('range', 'N/A')
-                ])
-        
-        table = Table(table_data, colWidths=[2.5*inch, 1*inch, 0.8*inch, 1*inch, 1.5*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1976d2')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ]))
-        
-        elements.append(Paragraph("<b>CBC Parameters</b>", styles['Heading2']))
-        elements.append(Spacer(1, 0.2*inch))
-        elements.append(table)
+        pdf = report_pdf(session.get('report_id'), fingerprint, assessment,
+                         session.get('age'), session.get('sex'), report_date)
         
-        # Disclaimer
-        elements.append(Spacer(1, 0.5*inch))
-        disclaimer = """
-        <b>DISCLAIMER:</b> This report is for informational purposes only and should not be used 
-        as a substitute for professional medical advice, diagnosis, or treatment. Always consult 
-        your healthcare provider regarding any medical condition.
-        """
-        elements.append(Paragraph(disclaimer, styles['Normal']))
-        
-        doc.build(elements)
-        buffer.seek(0)
-        
-        return buffer.getvalue(), 200, {
+        return pdf, 200, {
             'Content-Type': 'application/pdf',
             'Content-Disposition': f'attachment; filename=CBC_Report_{datetime.now().strftime("%Y%m%d")}.pdf'
         }
@@ -1553,6 +1655,34 @@ def download_full_report():
         return jsonify({'error': f'Error generating PDF: {str(e)}'}), 500
 
 
+@app.route('/download_history_report', methods=['GET'])
+def download_history_report():
+    """Download every report of the user as one PDF, streamed page by page"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'No reports to download'}), 400
+    
+    user_id = session['user_id']
+    total = db.count_user_reports(user_id)
+    if total == 0:
+        return jsonify({'error': 'No reports to download'}), 400
+    
+    try:
+        # Fails here, before any bytes are sent, when reportlab is missing
+        chunks = stream_history_pdf(db.iter_user_reports(user_id), total=total)
+        first = next(chunks)
+    except ImportError:
+        return jsonify({'error': 'ReportLab not installed. Install with: pip install reportlab'}), 500
+    
+    def stream():
+        yield first
+        yield from chunks
+    
+    return Response(stream_with_context(stream()), mimetype='application/pdf', headers={
+        'Content-Disposition': f'attachment; filename=CBC_History_{datetime.now().strftime("%Y%m%d")}.pdf',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @app.route('/get_visualization_data', methods=['GET'])
 def get_visualization_data():
     """Get data for visualization charts"""
@@ -1583,7 +1713,7 @@ def get_visualization_data():
         })
         
     except Exception as e:
-        print(f"Error in get_visualization_data: {e}")
+        logger.exception("Error in get_visualization_data")
         return jsonify({'error': f'Error processing visualization data: {str(e)}'}), 500
 
 if __name__ == '__main__':
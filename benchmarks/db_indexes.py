@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Query latency of the per-user report/chat lookups before and after indexing.
+
+For each size a scratch database is filled with the base schema only (no
+migrations), get_user_reports/get_chat_history are timed, then the file is
+reopened with CBCDatabase -- which applies SCHEMA_MIGRATIONS -- and timed again.
+
+    python benchmarks/db_indexes.py --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import CBCDatabase, SCHEMA_VERSION
+
+
+class UnmigratedDatabase(CBCDatabase):
+    """CBCDatabase with the original tables and none of the migrations."""
+
+    def migrate(self):
+        pass
+
+
+def populate(db, rows, users, seed=0):
+    rng = random.Random(seed)
+    conn = db.connection()
+    with conn:
+        conn.executemany('INSERT INTO users (username) VALUES (?)',
+                         ((f'user_{u}',) for u in range(users)))
+        conn.executemany(
+            'INSERT INTO reports (user_id, report_date, age, sex, raw_text, parameters, assessment) '
+            "VALUES (?, datetime('2024-01-01', ? || ' minutes'), 40, 'Male', '', '{}', ?)",
+            ((rng.randint(1, users), i, '{"assessed": {}, "absolute_counts": {}}')
+             for i in range(rows)))
+        conn.executemany(
+            'INSERT INTO chat_history (user_id, report_id, message, response, timestamp) '
+            "VALUES (?, ?, 'q', 'a', datetime('2024-01-01', ? || ' minutes'))",
+            ((rng.randint(1, users), rng.randint(1, rows), i) for i in range(rows)))
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def time_queries(db, users, samples, seed=1):
+    rng = random.Random(seed)
+    conn = db.connection()
+    timings = {'get_user_reports': [], 'get_chat_history': [], 'get_chat_history(report)': []}
+    for _ in range(samples):
+        user_id = rng.randint(1, users)
+        report_id = conn.execute(
+            'SELECT report_id FROM chat_history WHERE chat_id = ?',
+            (rng.randint(1, samples),)
+        ).fetchone()[0]
+
+        start = time.perf_counter()
+        db.get_user_reports(user_id)
+        timings['get_user_reports'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        db.get_chat_history(user_id)
+        timings['get_chat_history'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        db.get_chat_history(user_id, report_id)
+        timings['get_chat_history(report)'].append(time.perf_counter() - start)
+
+    return {
+        name: {'p50_ms': statistics.median(values) * 1000, 'p95_ms': percentile(values, 0.95) * 1000}
+        for name, values in timings.items()
+    }
+
+
+def run(rows, samples):
+    users = max(1, rows // 20)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+
+        db = UnmigratedDatabase(path)
+        populate(db, rows, users)
+        before = time_queries(db, users, samples)
+        db.close()
+
+        start = time.perf_counter()
+        db = CBCDatabase(path)
+        migrate_s = time.perf_counter() - start
+        assert db.schema_version() == SCHEMA_VERSION
+        after = time_queries(db, users, samples)
+        db.close()
+
+    return {'rows': rows, 'users': users, 'migrate_s': migrate_s, 'before': before, 'after': after}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='rows per table to benchmark')
+    parser.add_argument('--samples', type=int, default=200, help='lookups timed per query')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = [run(rows, args.samples) for rows in args.sizes]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'rows':>9}  {'query':<26}{'before p50':>12}{'p95':>10}{'after p50':>12}{'p95':>10}")
+    for result in results:
+        for name, before in result['before'].items():
+            after = result['after'][name]
+            print(f"{result['rows']:>9}  {name:<26}"
+                  f"{before['p50_ms']:>10.3f}ms{before['p95_ms']:>8.3f}ms"
+                  f"{after['p50_ms']:>10.3f}ms{after['p95_ms']:>8.3f}ms")
+        print(f"{'':>9}  migration took {result['migrate_s']:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
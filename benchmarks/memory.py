@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Per-worker RSS/PSS of a running multi-process deployment.
+
+Point it at the master process (gunicorn's arbiter, or app.py when it runs
+an OCR pool) and it lists the master and every direct child with resident
+(RSS), proportional (PSS), shared and private memory. RSS counts shared
+pages in full for every process; PSS splits them, so with model preloading
+working the workers' RSS stays high while their PSS and private memory drop:
+
+    CBC_PRELOAD_MODELS=1 gunicorn --preload -w 4 app:app &
+    python benchmarks/memory.py --pid $(pgrep -o gunicorn)
+
+Linux only (reads /proc/<pid>/smaps_rollup). Results are written as JSON
+like benchmarks/pipeline.py.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.pipeline import git_revision
+from models.preload import worker_memory
+
+FIELDS = ['rss', 'pss', 'shared', 'private']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report RSS/PSS of a master process and its workers")
+    parser.add_argument('--pid', type=int, required=True, help="Master process id")
+    parser.add_argument('--output', default=None,
+                        help="Result JSON path (default: benchmarks/results/memory-<commit>.json)")
+    args = parser.parse_args()
+
+    processes = worker_memory(args.pid)
+    if not processes:
+        sys.exit(f"No memory information for pid {args.pid} (is it running, and is this Linux?)")
+    totals = {field: sum(p[field] for p in processes) for field in FIELDS}
+
+    rev, dirty = git_revision()
+    report = {
+        'benchmark': 'memory',
+        'meta': {
+            'commit': rev,
+            'dirty': dirty,
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'master_pid': args.pid,
+        },
+        'results': {'processes': processes, 'totals': totals},
+    }
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"memory-{rev}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'role':<8} {'pid':>8} " + " ".join(f"{field + ' MB':>11}" for field in FIELDS))
+    for p in processes:
+        print(f"{p['role']:<8} {p['pid']:>8} " + " ".join(f"{p[field] / 2 ** 20:>11.1f}" for field in FIELDS))
+    print(f"{'total':<8} {'':>8} " + " ".join(f"{totals[field] / 2 ** 20:>11.1f}" for field in FIELDS))
+    print("(total RSS double-counts shared pages; total PSS is the real footprint)")
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""Latency and throughput of the parse -> assess -> persist -> answer pipeline.
+
+Runs each stage over synthetic corpora of several sizes and records per-item
+latency percentiles and throughput. Results are written as JSON (one file per
+commit by default) so two runs can be compared:
+
+    python benchmarks/pipeline.py --sizes 100 1000 10000
+    python benchmarks/pipeline.py --compare benchmarks/results/pipeline-abc1234.json
+
+Everything runs offline: the answer stage imports app.py for the rule-based
+generate_ai_response, but never loads a model, and is skipped if app.py cannot
+be imported.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import generate_corpus, parse_accuracy
+from models.cbc_parser import extract_cbc_clean, assess_cbc
+from models.database import CBCDatabase
+
+QUESTIONS = [
+    "hi",
+    "is my report good",
+    "what is my hemoglobin",
+    "what does mcv mean",
+    "why is my platelet count low",
+    "what should i do about high wbc",
+    "give me a summary",
+    "what are the normal ranges",
+    "compare my neutrophils and lymphocytes",
+    "should i worry",
+]
+
+
+def summarize(samples_ns, wall_s=None):
+    """Percentiles (ms) and throughput (items/s) of per-item timings."""
+    ordered = sorted(samples_ns)
+    n = len(ordered)
+
+    def pct(q):
+        return ordered[min(n - 1, int(q * n))] / 1e6
+
+    total_s = wall_s if wall_s is not None else sum(ordered) / 1e9
+    return {
+        'n': n,
+        'mean_ms': statistics.fmean(ordered) / 1e6,
+        'p50_ms': pct(0.50),
+        'p90_ms': pct(0.90),
+        'p99_ms': pct(0.99),
+        'max_ms': ordered[-1] / 1e6,
+        'throughput_per_s': n / total_s if total_s > 0 else 0.0,
+    }
+
+
+def timed(fn, items):
+    """Call fn on each item; return (results, per-item ns, errors)."""
+    results, samples, errors = [], [], 0
+    clock = time.perf_counter_ns
+    for item in items:
+        start = clock()
+        try:
+            results.append(fn(item))
+        except Exception:
+            results.append(None)
+            errors += 1
+        samples.append(clock() - start)
+    return results, samples, errors
+
+
+def load_answer_fn(workdir):
+    """Import app.generate_ai_response with all side effects kept in ``workdir``."""
+    os.environ.setdefault('CBC_SESSION_BACKEND', 'memory')
+    os.environ.setdefault('CBC_OCR_CACHE', os.path.join(workdir, 'ocr_cache.db'))
+    os.environ.setdefault('CBC_JOB_WORKERS', '1')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import app
+    finally:
+        os.chdir(cwd)
+    return app.generate_ai_response
+
+
+def run_size(size, seed, workdir, answer_fn):
+    corpus = generate_corpus(size, seed=seed)
+    texts = [text for text, _ in corpus]
+    stages = {}
+
+    extracted, samples, errors = timed(extract_cbc_clean, texts)
+    stages['parse'] = dict(summarize(samples), errors=errors)
+    accuracy = statistics.fmean(parse_accuracy(d, expected) for d, (_, expected) in zip(extracted, corpus) if d)
+
+    def assess(cbc_data):
+        return assess_cbc(cbc_data['Parameters'], age=cbc_data.get('Age'), sex=cbc_data.get('Sex'))
+
+    assessments, samples, errors = timed(assess, extracted)
+    stages['assess'] = dict(summarize(samples), errors=errors)
+
+    reports = [
+        {
+            'username': f'user_{i % 50}',
+            'age': d.get('Age'),
+            'sex': d.get('Sex'),
+            'raw_text': text,
+            'parameters': d['Parameters'],
+            'assessment': a,
+        }
+        for i, (text, d, a) in enumerate(zip(texts, extracted, assessments))
+    ]
+
+    db = CBCDatabase(os.path.join(workdir, f'persist-{size}.db'))
+
+    def persist(r):
+        user_id = db.create_user(r['username'])
+        return db.save_report(user_id, r['age'], r['sex'], r['raw_text'], r['parameters'], r['assessment'])
+
+    _, samples, errors = timed(persist, reports)
+    stages['persist'] = dict(summarize(samples), errors=errors)
+    db.close()
+
+    db = CBCDatabase(os.path.join(workdir, f'bulk-{size}.db'))
+    start = time.perf_counter()
+    db.bulk_save_reports(reports)
+    wall = time.perf_counter() - start
+    db.close()
+    stages['persist_bulk'] = {'n': size, 'throughput_per_s': size / wall if wall > 0 else 0.0}
+
+    if answer_fn is not None:
+        pairs = [(QUESTIONS[i % len(QUESTIONS)], d, a) for i, (d, a) in enumerate(zip(extracted, assessments))]
+        _, samples, errors = timed(lambda p: answer_fn(*p), pairs)
+        stages['answer'] = dict(summarize(samples), errors=errors)
+
+    return {'size': size, 'parse_accuracy': accuracy, 'stages': stages}
+
+
+def git_revision():
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return rev, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+
+def print_table(results, baseline=None):
+    base = {}
+    for result in (baseline or {}).get('results', []):
+        for stage, stats in result['stages'].items():
+            base[(result['size'], stage)] = stats
+
+    print(f"{'size':>7}  {'stage':<13}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'items/s':>12}{'vs base':>10}")
+    for result in results:
+        for stage, stats in result['stages'].items():
+            old = base.get((result['size'], stage))
+            delta = ''
+            if old and old.get('throughput_per_s'):
+                delta = f"{(stats['throughput_per_s'] / old['throughput_per_s'] - 1) * 100:+.1f}%"
+            cols = ''.join(f"{stats[k]:>10.3f}" if k in stats else f"{'-':>10}"
+                           for k in ('p50_ms', 'p90_ms', 'p99_ms'))
+            errors = f"  ({stats['errors']} errors)" if stats.get('errors') else ''
+            print(f"{result['size']:>7}  {stage:<13}{cols}{stats['throughput_per_s']:>12.1f}{delta:>10}{errors}")
+        print(f"{'':>7}  parse accuracy {result['parse_accuracy'] * 100:.2f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CBC parse/assess/persist/answer pipeline")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                        help="Corpus sizes (reports) to run")
+    parser.add_argument('--seed', type=int, default=0, help="Synthetic corpus seed")
+    parser.add_argument('--output', default=None,
+                        help="Result JSON path (default: benchmarks/results/pipeline-<commit>.json)")
+    parser.add_argument('--compare', default=None, help="Earlier result JSON to compare throughput against")
+    parser.add_argument('--skip-answer', action='store_true', help="Do not import app.py for the answer stage")
+    args = parser.parse_args()
+
+    rev, dirty = git_revision()
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        answer_fn, answer_skipped = None, 'disabled' if args.skip_answer else None
+        if not args.skip_answer:
+            try:
+                answer_fn = load_answer_fn(workdir)
+            except ImportError as e:
+                answer_skipped = f"app.py not importable: {e}"
+        for size in args.sizes:
+            results.append(run_size(size, args.seed, workdir, answer_fn))
+
+    report = {
+        'benchmark': 'pipeline',
+        'meta': {
+            'commit': rev,
+            'dirty': dirty,
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': args.seed,
+            'answer_skipped': answer_skipped,
+        },
+        'results': results,
+    }
+
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"pipeline-{rev}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+    if answer_skipped:
+        print(f"answer stage skipped: {answer_skipped}")
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
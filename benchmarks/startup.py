@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Import-time profile of app.py: the startup budget every worker pays.
+
+Imports app.py in a fresh interpreter under ``python -X importtime``, with
+its side effects kept in a temp dir, and reports total import time, the
+slowest top-level imports, and any heavy ML/OCR/PDF libraries that were
+loaded eagerly (those should load on first use instead):
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --budget-ms 500 --top 15
+
+Exits non-zero when the budget is exceeded or a heavy library was imported,
+so it can gate CI. Results are written as JSON like benchmarks/pipeline.py.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.pipeline import git_revision
+
+# Libraries that cost seconds or hundreds of MB and are only needed by one subsystem
+HEAVY_MODULES = ['torch', 'transformers', 'doctr', 'reportlab', 'pandas', 'numpy', 'plotly',
+                 'pytesseract', 'pdf2image', 'pypdfium2', 'PIL']
+
+
+def profile_import(module='app', runs=1):
+    """Import ``module`` in ``runs`` fresh interpreters; return the fastest run's profile."""
+    code = f"import sys; sys.path.insert(0, {ROOT!r}); import {module}"
+    best = None
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            env = dict(os.environ)
+            env.setdefault('CBC_SESSION_BACKEND', 'memory')
+            env.setdefault('CBC_OCR_CACHE', os.path.join(workdir, 'ocr_cache.db'))
+            env.setdefault('CBC_JOB_WORKERS', '1')
+            start = time.perf_counter()
+            proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=workdir, env=env,
+                                  capture_output=True, text=True)
+            wall_ms = (time.perf_counter() - start) * 1000
+        if proc.returncode != 0:
+            raise RuntimeError(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+        imports = parse_importtime(proc.stderr)
+        if best is None or wall_ms < best['wall_ms']:
+            best = {'wall_ms': wall_ms, 'imports': imports}
+    return best
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] from ``-X importtime`` output."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+def summarize(profile, module='app', top=10):
+    imports = profile['imports']
+    loaded = {name for name, _, _, _ in imports}
+    target = next((cumulative for name, _, cumulative, _ in imports if name == module), 0)
+    # Depth 0 entries are what the interpreter and app.py import directly; their cumulative times sum up
+    top_level = sorted((i for i in imports if i[3] == 0), key=lambda i: i[2], reverse=True)
+    return {
+        'wall_ms': profile['wall_ms'],
+        'import_ms': target / 1000,
+        'modules_loaded': len(loaded),
+        'heavy_loaded': [m for m in HEAVY_MODULES if m in loaded],
+        'slowest': [{'module': name, 'cumulative_ms': cumulative / 1000, 'self_ms': self_us / 1000}
+                    for name, self_us, cumulative, _ in top_level[:top]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile app.py import time")
+    parser.add_argument('--module', default='app', help="Module to import")
+    parser.add_argument('--runs', type=int, default=3, help="Fresh interpreters to try; the fastest is reported")
+    parser.add_argument('--top', type=int, default=10, help="Slowest top-level imports to list")
+    parser.add_argument('--budget-ms', type=float, default=None, help="Fail if importing the module takes longer")
+    parser.add_argument('--allow-heavy', action='store_true', help="Do not fail when heavy libraries load eagerly")
+    parser.add_argument('--output', default=None,
+                        help="Result JSON path (default: benchmarks/results/startup-<commit>.json)")
+    args = parser.parse_args()
+
+    summary = summarize(profile_import(args.module, args.runs), args.module, args.top)
+    rev, dirty = git_revision()
+    report = {
+        'benchmark': 'startup',
+        'meta': {
+            'commit': rev,
+            'dirty': dirty,
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'module': args.module,
+            'budget_ms': args.budget_ms,
+        },
+        'results': summary,
+    }
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"startup-{rev}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"import {args.module}: {summary['import_ms']:.1f} ms "
+          f"(interpreter wall {summary['wall_ms']:.1f} ms, {summary['modules_loaded']} modules)")
+    print(f"{'module':<40} {'cumulative ms':>14} {'self ms':>10}")
+    for item in summary['slowest']:
+        print(f"{item['module']:<40} {item['cumulative_ms']:>14.1f} {item['self_ms']:>10.1f}")
+    print(f"Results written to {output}")
+
+    failed = False
+    if summary['heavy_loaded'] and not args.allow_heavy:
+        print(f"FAIL: heavy libraries imported at startup: {', '.join(summary['heavy_loaded'])}")
+        failed = True
+    if args.budget_ms is not None and summary['import_ms'] > args.budget_ms:
+        print(f"FAIL: import took {summary['import_ms']:.1f} ms, budget {args.budget_ms:.1f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Synthetic CBC report generator for benchmarks.
+
+Reports mimic OCR output from different labs: one-line table rows, tab
+separated columns, "name : value" pairs and multi-line cells where value,
+unit and range each sit on their own line. Count parameters are written in
+the unit styles seen in real reports (Lacs, 10^3/uL, million/cumm, g/L, ...).
+Every report comes with the values extract_cbc_clean should recover,
+normalized the same way the parser does.
+"""
+import random
+
+LAYOUTS = ("table", "tabbed", "colon", "multiline")
+
+FIRST_NAMES = ["Asha", "Ravi", "Priya", "Arjun", "Sara", "John", "Meera", "Karan", "Nisha", "Omar"]
+LAST_NAMES = ["Sharma", "Patel", "Khan", "Iyer", "Das", "Smith", "Reddy", "Gupta"]
+LABS = ["City Diagnostics", "Sunrise Pathology Lab", "Metro Health Labs", "Care Clinical Laboratory"]
+
+# parameter: (names as printed, generator of a canonical value, [(unit, scale from canonical)], range)
+PARAMETERS = {
+    "HEMOGLOBIN": (["Hemoglobin", "Haemoglobin", "HB"], lambda r: round(r.uniform(7, 18), 1),
+                   [("g/dL", 1), ("g/L", 10)], (13.0, 17.0)),
+    "TOTAL LEUKOCYTE COUNT": (["Total Leukocyte Count", "WBC", "TLC"], lambda r: r.randrange(2500, 18000, 50),
+                              [("10^3/uL", 0.001), ("/cumm", 1), ("thou/mm3", 0.001)], (4.0, 11.0)),
+    "TOTAL RBC COUNT": (["Total RBC Count", "RBC Count"], lambda r: round(r.uniform(3.2, 6.2), 2) * 1_000_000,
+                        [("million/cumm", 1e-6), ("10^6/uL", 1e-6)], (4.5, 5.5)),
+    "PLATELET COUNT": (["Platelet Count", "PLT"], lambda r: r.randrange(80_000, 480_000, 1000),
+                       [("Lacs", 1e-5), ("10^3/uL", 0.001), ("/cumm", 1)], (1.5, 4.5)),
+    "HEMATOCRIT": (["Hematocrit", "PCV", "HCT"], lambda r: round(r.uniform(30, 55), 1), [("%", 1)], (40.0, 50.0)),
+    "MCV": (["MCV", "Mean Corpuscular Volume"], lambda r: round(r.uniform(65, 110), 1), [("fL", 1)], (83.0, 101.0)),
+    "MCH": (["MCH"], lambda r: round(r.uniform(20, 36), 1), [("pg", 1)], (27.0, 32.0)),
+    "MCHC": (["MCHC"], lambda r: round(r.uniform(28, 37), 1), [("g/dL", 1)], (31.5, 34.5)),
+    "RDW-CV": (["RDW-CV", "RDW CV"], lambda r: round(r.uniform(11, 18), 1), [("%", 1)], (11.6, 14.0)),
+    "NEUTROPHILS": (["Neutrophils", "Segmented Neutrophils"], lambda r: r.randint(35, 85), [("%", 1)], (40, 80)),
+    "LYMPHOCYTES": (["Lymphocytes"], lambda r: r.randint(10, 50), [("%", 1)], (20, 40)),
+    "MONOCYTES": (["Monocytes"], lambda r: r.randint(1, 12), [("%", 1)], (2, 10)),
+    "EOSINOPHILS": (["Eosinophils"], lambda r: r.randint(0, 9), [("%", 1)], (1, 6)),
+    "BASOPHILS": (["Basophils"], lambda r: r.randint(0, 2), [("%", 1)], (0, 2)),
+    "ESR": (["ESR"], lambda r: r.randint(2, 60), [("mm/hr", 1)], (0, 20)),
+}
+
+
+def _format_value(value):
+    if value >= 1000:
+        return f"{value:,.0f}"
+    return f"{value:g}"
+
+
+def _row(layout, name, value, unit, low, high):
+    if layout == "table":
+        return [f"{name} {value} {unit} {low:g} - {high:g}"]
+    if layout == "tabbed":
+        return [f"{name}\t{value}\t{unit}\t{low:g}-{high:g}"]
+    if layout == "colon":
+        return [f"{name} : {value} {unit} (Ref: {low:g}-{high:g})"]
+    return [name, value, unit, f"{low:g} - {high:g}"]
+
+
+def generate_report(rng, layout=None, missing_rate=0.1):
+    """Return (text, expected) for one random report.
+
+    ``expected`` maps each parameter present in the text to the normalized
+    value extract_cbc_clean should return, plus "Age" and "Sex".
+    """
+    layout = layout or rng.choice(LAYOUTS)
+    age = rng.randint(1, 90)
+    sex = rng.choice(["Male", "Female"])
+
+    lines = [
+        rng.choice(LABS),
+        f"Patient Name: {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        rng.choice([f"Age/Gender: {age}/{sex[0]}", f"Age: {age} Years   Sex: {sex}"]),
+        f"Collected On: 2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "",
+        "COMPLETE BLOOD COUNT",
+        "Test Result Unit Reference Range" if layout != "multiline" else "Test",
+    ]
+    expected = {"Age": age, "Sex": sex}
+
+    for param, (names, make_value, units, (low, high)) in PARAMETERS.items():
+        if rng.random() < missing_rate:
+            continue
+        value = make_value(rng)
+        unit, scale = rng.choice(units)
+        shown = round(value * scale, 3)
+        lines.extend(_row(layout, rng.choice(names), _format_value(shown), unit, low, high))
+        expected[param] = float(value)
+
+    lines += ["", "*** End of Report ***"]
+    return "\n".join(lines), expected
+
+
+def generate_corpus(size, seed=0, layouts=LAYOUTS):
+    """Deterministic list of ``size`` (text, expected) pairs cycling through ``layouts``."""
+    rng = random.Random(seed)
+    return [generate_report(rng, layouts[i % len(layouts)]) for i in range(size)]
+
+
+def parse_accuracy(extracted, expected, rel_tol=0.01):
+    """Fraction of expected parameter values recovered within ``rel_tol``."""
+    total = hits = 0
+    for param, value in expected.items():
+        if param in ("Age", "Sex"):
+            continue
+        total += 1
+        got = extracted["Parameters"].get(param)
+        if got is not None and abs(got - value) <= rel_tol * max(abs(value), 1e-9):
+            hits += 1
+    return hits / total if total else 1.0
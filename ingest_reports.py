@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Bulk-load a lab feed of CBC reports into the database.
+
+Each record needs ``username`` and ``raw_text``; ``age``, ``sex`` and
+``report_date`` are optional. Dates are normalized to ``YYYY-MM-DD HH:MM:SS``
+(UTC when the feed gives an offset); a record without a username or with a
+date that cannot be parsed is reported and skipped. Records are read from JSON Lines or CSV one at a
+time, parsed with ``extract_cbc_many`` on a process pool, assessed, and saved
+through ``CBCDatabase.bulk_save_reports`` so memory stays bounded regardless
+of file size.
+
+    python ingest_reports.py feed.jsonl --db cbc_reports.db --workers 4
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from models.cbc_parser import (extract_cbc_many, assess_cbc, load_range_profiles,
+                               ENGINES, DEFAULT_ENGINE, DEFAULT_PROFILE)
+from models.database import CBCDatabase
+
+logger = logging.getLogger(__name__)
+
+# Non-ISO report_date layouts seen in lab feeds; slashed dates are month first
+REPORT_DATE_FORMATS = [
+    '%m/%d/%Y', '%m/%d/%Y %H:%M', '%m/%d/%Y %H:%M:%S',
+    '%Y/%m/%d', '%Y/%m/%d %H:%M', '%Y/%m/%d %H:%M:%S',
+    '%d.%m.%Y', '%d.%m.%Y %H:%M', '%d.%m.%Y %H:%M:%S',
+    '%d-%b-%Y', '%d %b %Y', '%b %d, %Y',
+]
+
+
+def read_records(path, fmt=None):
+    """Yield one dict per record from a .jsonl/.csv file ('-' reads JSONL from stdin)."""
+    if fmt is None:
+        fmt = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+    f = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+    try:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{line_no}: invalid JSON ({e})") from e
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _age(value):
+    """A feed's age as an int, or None when absent. Raises ValueError when not numeric."""
+    if value in (None, ''):
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"invalid age {value!r}") from None
+
+
+def normalize_report_date(value):
+    """A feed's report_date as 'YYYY-MM-DD HH:MM:SS', or None when absent.
+
+    The stored form sorts chronologically and is what SQLite's date
+    functions read. Offsets are converted to UTC, like CURRENT_TIMESTAMP.
+    Raises ValueError for a date in no known format.
+    """
+    if value in (None, ''):
+        return None
+    text = str(value).strip()
+    try:
+        parsed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        for fmt in REPORT_DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f"unrecognized report_date {value!r}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def ingest(db, records, workers=None, chunk_size=64, batch_size=1000, engine=None,
+           profile=DEFAULT_PROFILE):
+    """Parse, assess and store ``records``; returns (reports saved, records rejected)."""
+    meta = deque()
+    rejected = 0
+
+    def texts():
+        nonlocal rejected
+        for n, record in enumerate(records, 1):
+            try:
+                if not record.get('username'):
+                    raise ValueError("missing username")
+                report_date = normalize_report_date(record.get('report_date'))
+                age = _age(record.get('age'))
+            except ValueError as e:
+                logger.warning("record %d skipped: %s", n, e)
+                rejected += 1
+                continue
+            meta.append(dict(record, report_date=report_date, age=age))
+            yield record.get('raw_text') or ""
+
+    def reports():
+        for cbc_data in extract_cbc_many(texts(), workers=workers, chunk_size=chunk_size, engine=engine):
+            record = meta.popleft()
+            age = record['age'] if record['age'] is not None else cbc_data.get('Age')
+            sex = record.get('sex') or cbc_data.get('Sex')
+            yield {
+                'username': record['username'],
+                'report_date': record['report_date'],
+                'age': age,
+                'sex': sex,
+                'raw_text': record.get('raw_text') or "",
+                'parameters': cbc_data['Parameters'],
+                'assessment': assess_cbc(cbc_data['Parameters'], age=age, sex=sex, profile=profile),
+                'lab_profile': profile
+            }
+
+    saved = db.bulk_save_reports(reports(), batch_size=batch_size)
+    return saved, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load CBC reports from a JSONL or CSV feed")
+    parser.add_argument('path', help="Input file (.jsonl or .csv, '-' for JSONL on stdin)")
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default=None,
+                        help="Input format (default: from the file extension)")
+    parser.add_argument('--db', default='cbc_reports.db', help="SQLite database path")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes (default: CPU count, 0 = in-process)")
+    parser.add_argument('--chunk-size', type=int, default=64, help="Texts per worker task")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Reports per write transaction")
+    parser.add_argument('--engine', choices=sorted(ENGINES), default=DEFAULT_ENGINE,
+                        help="Extraction engine")
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, help="Reference range profile")
+    parser.add_argument('--range-profiles', default=os.environ.get('CBC_RANGE_PROFILES', 'range_profiles.json'),
+                        help="JSON file of lab range profiles")
+    args = parser.parse_args()
+
+    if os.path.exists(args.range_profiles):
+        load_range_profiles(args.range_profiles)
+
+    db = CBCDatabase(args.db)
+    start = time.perf_counter()
+    count, rejected = ingest(db, read_records(args.path, args.format), workers=args.workers,
+                   chunk_size=args.chunk_size, batch_size=args.batch_size,
+                   engine=args.engine, profile=args.profile)
+    elapsed = time.perf_counter() - start
+    db.close()
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"Ingested {count} reports in {elapsed:.2f}s ({rate:.1f} reports/sec)")
+    if rejected:
+        print(f"Skipped {rejected} invalid records (see warnings above)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Serve BioGPT (or DistilGPT2) to the web workers from one local process.
+
+The model is loaded once, optionally int8-quantized for CPU, and concurrent
+prompts are batched into shared ``generate`` calls. Point the app at it with
+``CBC_LLM_ADDRESS``; when it is not running, /ask answers from the
+rule-based engine alone.
+
+    python llm_server.py --port 8765 --threads 4
+    CBC_LLM_ADDRESS=127.0.0.1:8765 python app.py
+"""
+import argparse
+
+from models.llm import BatchedGenerator, LLMServer, DEFAULT_MODEL, FALLBACK_MODEL, DEFAULT_ADDRESS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local batched language-model server for the CBC chat")
+    parser.add_argument('--host', default=DEFAULT_ADDRESS[0], help="Interface to listen on (keep it local)")
+    parser.add_argument('--port', type=int, default=DEFAULT_ADDRESS[1])
+    parser.add_argument('--model', default=DEFAULT_MODEL, help="Hugging Face model id")
+    parser.add_argument('--fallback-model', default=FALLBACK_MODEL,
+                        help="Model loaded if --model fails ('' to fail instead)")
+    parser.add_argument('--no-quantize', action='store_true', help="Keep float32 weights (skip int8 dynamic quantization)")
+    parser.add_argument('--threads', type=int, default=None, help="torch intra-op threads (default: torch's choice)")
+    parser.add_argument('--max-batch', type=int, default=8, help="Prompts per generate call")
+    parser.add_argument('--window-ms', type=float, default=20, help="How long to wait for more prompts to batch")
+    parser.add_argument('--max-new-tokens', type=int, default=96, help="Upper bound on tokens generated per prompt")
+    args = parser.parse_args()
+
+    generator = BatchedGenerator(
+        args.model,
+        fallback=args.fallback_model or None,
+        quantize=not args.no_quantize,
+        threads=args.threads,
+        max_batch=args.max_batch,
+        window=args.window_ms / 1000,
+        max_new_tokens=args.max_new_tokens
+    )
+    server = LLMServer(generator, (args.host, args.port))
+    print(f"Serving {generator.model_name} on {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        generator.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from models.metrics import CACHE_REQUESTS, count
+
+
+def normalize_question(question):
+    """The form of a question the chat router actually reads."""
+    return (question or "").lower().strip()
+
+
+def assessment_fingerprint(assessment, cbc_data=None):
+    """Stable hash of everything a chat answer can depend on besides the question.
+
+    That is the assessment (statuses, values, units, ranges) plus the
+    patient's age and sex from ``cbc_data``, which report summaries quote.
+    """
+    cbc_data = cbc_data or {}
+    payload = json.dumps(
+        [assessment, cbc_data.get('Age'), cbc_data.get('Sex')],
+        sort_keys=True, separators=(',', ':'), default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class AnswerCache:
+    """In-process LRU of chat answers with a time-to-live.
+
+    Keys are ``(normalized question, assessment fingerprint)``, so
+    re-assessing a report changes the fingerprint and its old answers are
+    never served again; they age out of the LRU. ``max_entries=0`` disables
+    the cache.
+    """
+
+    def __init__(self, max_entries=4096, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires, answer)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        if not self.max_entries:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        count(CACHE_REQUESTS, cache="answer", result="hit" if entry else "miss")
+        return entry[1] if entry else None
+
+    def put(self, key, answer):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,105 +1,267 @@
+import json
+import os
 import re
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from types import MappingProxyType
+
+PARAM_PATTERNS = {
+    "HEMOGLOBIN": r"\b(?:HB|HEMOGLOBIN|HAEMOGLOBIN)\b",
+    "TOTAL LEUKOCYTE COUNT": r"\b(?:WBC|TOTAL\s+LEUKOCYTE\s+COUNT|TOTAL\s+LEUKOCYTE|TOTAL\s+W\.?\s*B\.?\s*C\.?\s*COUNT|TOTAL\s+LEUCOCYTE\s*COUNT|TLC)\b",
+    "TOTAL RBC COUNT": r"\b(?:RBC|TOTAL\s+RBC\s+COUNT|TOTAL\s+RED\s+BLOOD\s+CELLS?|RBC\s*COUNT)\b",
+    "PLATELET COUNT": r"\b(?:PLT|PLATELET\s+COUNT|PLATELETS|TOTAL\s+PLATELET\s+COUNT)\b",
+    "HEMATOCRIT": r"\b(?:HCT|HEMATOCRIT|PCV|HEMATOCRIT\s+VALUE)\b",
+    "MCV": r"\b(?:MCV|M\.?C\.?V\.?|MEAN\s+CORPUSCULAR\s+VOLUME)\b",
+    "MCH": r"\b(?:MCH|MEAN\s+CELL\s+HAEMOGLOBIN)(?!\s+CON)\b",
+    "MCHC": r"\b(?:MCHC|MEAN\s+CELL\s+HAEMOGLOBIN\s+CON)\b",
+    "RDW-CV": r"\bRDW[-\s]*CV\b",
+    "RDW-SD": r"\bRDW[-\s]*SD\b",
+    "RDW": r"\bRED\s*CELL\s*DISTRIBUTION\s*WIDTH\b|RDW\b",
+    "NEUTROPHILS": r"\b(?:NEU[%\s]*|NEUTROPHILS|SEGMENTED\s+NEUTROPHILS|NEUTROPHIL)\b",
+    "LYMPHOCYTES": r"\b(?:L?YMPHOCYTE|L?YMPHOCYTES|LYM[%\s]*)\b",
+    "MONOCYTES": r"\b(?:MON[%\s]*|MONOCYTE|MONOCYTES)\b",
+    "EOSINOPHILS": r"\b(?:EOS[%\s]*|EOSINOPHIL|EOSINOPHILS)\b",
+    "BASOPHILS": r"\b(?:BAS[%\s]*|BASOPHIL|BASOPHILS)\b",
+    "ESR": r"\bESR\b"
+}
+
+UNIT_PATTERN = r"\b(g/dl|g/dL|g/l|g/L|%|Lacs Per cmm|Lacs|lakhs|mil/cumm|million/cumm|million|10\^3|10\*3|10\^6|10\*6|cumm|/ul|/uL|/µl|Per cmm|cells/mm|pg|Pg|fl|fL|mm/hr|millmm3|thou/mm3)\b"
+RANGE_PATTERN = r"(\d+\.?\d*)\s*[-–]\s*(\d+\.?\d*)"
+NUMBER_PATTERN = r"([<>]?\d[\d,\.]*)"
+UPTO_PATTERN = r"(up to|below)\s*(\d+\.?\d*)"
+
+DEFAULT_UNITS = {
+    "HEMATOCRIT": "%", "PCV": "%", "MCV": "fL",
+    "RDW-CV": "%", "RDW": "%", "RDW-SD": "fL",
+    "MCH": "pg", "MCHC": "g/dL",
+    "NEUTROPHILS": "%", "LYMPHOCYTES": "%",
+    "MONOCYTES": "%", "EOSINOPHILS": "%", "BASOPHILS": "%",
+    "ESR": "mm/hr"
+}
+
+# Number of lines (the name line included) scanned for value, unit and range
+BLOCK_LINES = 7
+
+# Compiled once at import for the single-pass engine
+_PARAM_RES = [(param, re.compile(p, re.I)) for param, p in PARAM_PATTERNS.items()]
+_ANY_PARAM_RE = re.compile("|".join(f"(?:{p})" for p in PARAM_PATTERNS.values()), re.I)
+_UNIT_RE = re.compile(UNIT_PATTERN, re.I)
+_RANGE_RE = re.compile(RANGE_PATTERN)
+_NUMBER_RE = re.compile(NUMBER_PATTERN)
+_UPTO_RE = re.compile(UPTO_PATTERN, re.I)
+_NON_NUMERIC_RE = re.compile(r"[^\d.\-]")
+_WHITESPACE_RE = re.compile(r"[\u00A0\t]+")
+_AGE_SEX_RE = re.compile(
+    r"Age\s*[/\\]?Gender\s*[:\s]*([0-9]{1,3})\s*[/\\]?\s*(M|F|Male|Female)", re.I)
+_AGE_RE = re.compile(r"\bAge\s*[:/\\]?\s*(\d{1,3})", re.I)
+_SEX_RE = re.compile(r"\b(?:Sex|Gender)\s*[:/\\]?\s*(Male|Female|M|F|Other)", re.I)
+
+DEFAULT_ENGINE = "compiled"
+
+# Parameters many reports leave out; collect_cbc_text does not wait for them
+OPTIONAL_PARAMS = frozenset({"RDW-CV", "RDW-SD", "RDW", "ESR"})
+
+
+def _clean_token(s: str):
+    return s.replace(",", "").replace("\xa0", " ").strip() if s else s
+
+
+def _parse_number(s: str):
+    if not s:
+        return None
+    s = s.strip().replace(",", "")
+    s = _NON_NUMERIC_RE.sub("", s)
+    try:
+        return float(s)
+    except:
+        return None
+
+
+def _normalize_by_unit(param, value, unit):
+    if value is None:
+        return None
+    u = (unit or "").lower()
+
+    if param == "HEMOGLOBIN":
+        if "g/l" in u:
+            return value / 10.0
+        return value
 
-def extract_cbc_clean(text: str):
-    results = {}
+    if param == "TOTAL LEUKOCYTE COUNT":
+        if any(tok in u for tok in ["10^3", "10*3", "per cmm", "thou/mm3","10^3/ul", "10*3/ul", "10^3/uL", "10*3/uL"]) or not u:
+            return value * 1000.0
+        return value
 
-    def clean_token(s: str):
-        return s.replace(",", "").replace("\xa0", " ").strip() if s else s
-
-    def parse_number(s: str):
-        if not s:
-            return None
-        s = s.strip().replace(",", "")
-        s = re.sub(r"[^\d.\-]", "", s)
-        try:
-            return float(s)
-        except:
-            return None
-
-    def normalize_by_unit(param, value, unit):
-        if value is None:
-            return None
-        u = (unit or "").lower()
-
-        if param == "HEMOGLOBIN":
-            if "g/l" in u:
-                return value / 10.0
-            return value
-
-        if param == "TOTAL LEUKOCYTE COUNT":
-            if any(tok in u for tok in ["10^3", "10*3", "per cmm", "thou/mm3","10^3/ul", "10*3/ul", "10^3/uL", "10*3/uL"]) or not u:
-                return value * 1000.0
-            return value
-
-        if param == "TOTAL RBC COUNT":
-            if any(tok in u for tok in ["million", "10^6", "10*6", "mil/cumm","millmm3"]) or not u:
-                return value * 1_000_000.0
-            return value
-
-        if param == "PLATELET COUNT":
-            if "lakh" in u or "lacs" in u:
-                return value * 100_000.0
-            if any(tok in u for tok in ["10^3", "10*3", "per cmm", "10^3/µl", "10*3/µl", "10^3/uL"]):
-                return value * 1000.0
-            return value
+    if param == "TOTAL RBC COUNT":
+        if any(tok in u for tok in ["million", "10^6", "10*6", "mil/cumm","millmm3"]) or not u:
+            return value * 1_000_000.0
+        return value
 
+    if param == "PLATELET COUNT":
+        if "lakh" in u or "lacs" in u:
+            return value * 100_000.0
+        if any(tok in u for tok in ["10^3", "10*3", "per cmm", "10^3/µl", "10*3/µl", "10^3/uL"]):
+            return value * 1000.0
         return value
 
-    raw_text = text or ""
+    return value
+
+
+def _split_lines(raw_text):
     text_up = raw_text.replace("\r", "\n")
-    text_up = re.sub(r"[\u00A0\t]+", " ", text_up)
-    lines = [ln.strip() for ln in text_up.splitlines() if ln.strip()]
+    text_up = _WHITESPACE_RE.sub(" ", text_up)
+    return [ln.strip() for ln in text_up.splitlines() if ln.strip()]
 
+
+def _extract_age_sex(raw_text):
     age = None
     sex = None
-    age_sex_match = re.search(
-        r"Age\s*[/\\]?Gender\s*[:\s]*([0-9]{1,3})\s*[/\\]?\s*(M|F|Male|Female)",
-        raw_text, re.I)
+    age_sex_match = _AGE_SEX_RE.search(raw_text)
     if age_sex_match:
         age = int(age_sex_match.group(1))
         s = age_sex_match.group(2).strip().upper()
         sex = "Male" if s in ["M", "MALE"] else "Female"
 
     if age is None:
-        age_match = re.search(r"\bAge\s*[:/\\]?\s*(\d{1,3})", raw_text, re.I)
+        age_match = _AGE_RE.search(raw_text)
         if age_match:
             age = int(age_match.group(1))
 
     if sex is None:
-        sex_match = re.search(r"\b(?:Sex|Gender)\s*[:/\\]?\s*(Male|Female|M|F|Other)", raw_text, re.I)
+        sex_match = _SEX_RE.search(raw_text)
         if sex_match:
             s = sex_match.group(1).strip().upper()
             sex = "Male" if s in ["M", "MALE"] else ("Female" if s in ["F", "FEMALE"] else s.capitalize())
 
-    results["Age"] = age
-    results["Sex"] = sex
-
-    PARAM_PATTERNS = {
-        "HEMOGLOBIN": r"\b(?:HB|HEMOGLOBIN|HAEMOGLOBIN)\b",
-        "TOTAL LEUKOCYTE COUNT": r"\b(?:WBC|TOTAL\s+LEUKOCYTE\s+COUNT|TOTAL\s+LEUKOCYTE|TOTAL\s+W\.?\s*B\.?\s*C\.?\s*COUNT|TOTAL\s+LEUCOCYTE\s*COUNT|TLC)\b",
-        "TOTAL RBC COUNT": r"\b(?:RBC|TOTAL\s+RBC\s+COUNT|TOTAL\s+RED\s+BLOOD\s+CELLS?|RBC\s*COUNT)\b",
-        "PLATELET COUNT": r"\b(?:PLT|PLATELET\s+COUNT|PLATELETS|TOTAL\s+PLATELET\s+COUNT)\b",
-        "HEMATOCRIT": r"\b(?:HCT|HEMATOCRIT|PCV|HEMATOCRIT\s+VALUE)\b",
-        "MCV": r"\b(?:MCV|M\.?C\.?V\.?|MEAN\s+CORPUSCULAR\s+VOLUME)\b",
-        "MCH": r"\b(?:MCH|MEAN\s+CELL\s+HAEMOGLOBIN)(?!\s+CON)\b",
-        "MCHC": r"\b(?:MCHC|MEAN\s+CELL\s+HAEMOGLOBIN\s+CON)\b",
-        "RDW-CV": r"\bRDW[-\s]*CV\b",
-        "RDW-SD": r"\bRDW[-\s]*SD\b",
-        "RDW": r"\bRED\s*CELL\s*DISTRIBUTION\s*WIDTH\b|RDW\b",
-        "NEUTROPHILS": r"\b(?:NEU[%\s]*|NEUTROPHILS|SEGMENTED\s+NEUTROPHILS|NEUTROPHIL)\b",
-        "LYMPHOCYTES": r"\b(?:L?YMPHOCYTE|L?YMPHOCYTES|LYM[%\s]*)\b",
-        "MONOCYTES": r"\b(?:MON[%\s]*|MONOCYTE|MONOCYTES)\b",
-        "EOSINOPHILS": r"\b(?:EOS[%\s]*|EOSINOPHIL|EOSINOPHILS)\b",
-        "BASOPHILS": r"\b(?:BAS[%\s]*|BASOPHIL|BASOPHILS)\b",
-        "ESR": r"\bESR\b"
-    }
+    return age, sex
+
+
+def extract_cbc_clean(text: str, engine: str = None):
+    """Extract age, sex and CBC parameters from OCR text.
+
+    ``engine`` selects the extraction path: "compiled" (single pass over the
+    lines with patterns compiled at import) or "legacy" (the original
+    per-parameter rescan). Both return the same dict shape.
+    """
+    engine = engine or DEFAULT_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown extraction engine: {engine}")
+    return ENGINES[engine](text)
+
+
+def compare_engines(text: str):
+    """Run both engines on ``text`` and return {key: (legacy, compiled)} for every mismatch."""
+    legacy = extract_cbc_legacy(text)
+    compiled = extract_cbc_compiled(text)
+    diffs = {}
+    for key in ("Age", "Sex"):
+        if legacy[key] != compiled[key]:
+            diffs[key] = (legacy[key], compiled[key])
+    for section in ("Parameters", "Raw_Parameters", "Ranges"):
+        keys = set(legacy[section]) | set(compiled[section])
+        for k in keys:
+            a, b = legacy[section].get(k), compiled[section].get(k)
+            if a != b:
+                diffs[f"{section}.{k}"] = (a, b)
+    return diffs
+
+
+def extract_cbc_compiled(text: str):
+    raw_text = text or ""
+    lines = _split_lines(raw_text)
+
+    results = {}
+    results["Age"], results["Sex"] = _extract_age_sex(raw_text)
+
+    # Single pass: each line is tested only against parameters that have not
+    # been located yet, and lines matching no parameter at all are skipped
+    # with one combined search.
+    first_line = {}
+    pending = _PARAM_RES
+    for i, line in enumerate(lines):
+        current_line = line.upper()
+        if not _ANY_PARAM_RE.search(current_line):
+            continue
+        remaining = []
+        for param, name_re in pending:
+            if name_re.search(current_line):
+                first_line[param] = i
+            else:
+                remaining.append((param, name_re))
+        pending = remaining
+        if not pending:
+            break
+
+    # Value, unit and range depend only on the block start, so parameters
+    # sharing a line (e.g. "RDW-CV" and "RDW") share one scan.
+    blocks = {}
+
+    def scan_block(i):
+        if i not in blocks:
+            search_block = " ".join(lines[i:i + BLOCK_LINES])
+            number_match = _NUMBER_RE.search(search_block)
+            raw_val = _clean_token(number_match.group(1)) if number_match else None
+            unit_match = _UNIT_RE.search(search_block)
+            unit = unit_match.group(1) if unit_match else ""
+
+            range_match = _RANGE_RE.search(search_block)
+            if range_match:
+                rng = (_parse_number(range_match.group(1)), _parse_number(range_match.group(2)))
+            else:
+                upto_match = _UPTO_RE.search(search_block)
+                rng = (0, _parse_number(upto_match.group(2))) if upto_match else None
+            blocks[i] = (raw_val, unit, rng)
+        return blocks[i]
+
+    parameters = {}
+    raw_parameters = {}
+    ranges_extracted = {}
+
+    for param, _ in _PARAM_RES:
+        i = first_line.get(param)
+        if i is None:
+            parameters[param] = None
+            raw_parameters[param] = {"raw": None, "unit": None}
+            ranges_extracted[param] = None
+            continue
+
+        raw_val, unit, rng = scan_block(i)
+        if not unit:
+            unit = DEFAULT_UNITS.get(param, "")
+        ranges_extracted[param] = rng
+
+        num = _normalize_by_unit(param, _parse_number(raw_val), unit)
+
+        if param == "RDW":
+            if "RDW-CV" not in parameters or parameters["RDW-CV"] is None:
+                parameters["RDW-CV"] = num
+                raw_parameters["RDW-CV"] = {"raw": raw_val, "unit": unit}
+                ranges_extracted["RDW-CV"] = rng
+        else:
+            parameters[param] = num
+            raw_parameters[param] = {"raw": raw_val, "unit": unit}
+
+    results["Parameters"] = parameters
+    results["Raw_Parameters"] = raw_parameters
+    results["Ranges"] = ranges_extracted
+    return results
+
+
+def extract_cbc_legacy(text: str):
+    results = {}
+
+    raw_text = text or ""
+    lines = _split_lines(raw_text)
+
+    results["Age"], results["Sex"] = _extract_age_sex(raw_text)
 
     parameters = {}
     raw_parameters = {}
     ranges_extracted = {}
     n = len(lines)
-    unit_pattern = r"\b(g/dl|g/dL|g/l|g/L|%|Lacs Per cmm|Lacs|lakhs|mil/cumm|million/cumm|million|10\^3|10\*3|10\^6|10\*6|cumm|/ul|/uL|/µl|Per cmm|cells/mm|pg|Pg|fl|fL|mm/hr|millmm3|thou/mm3)\b"
-    range_pattern = r"(\d+\.?\d*)\s*[-–]\s*(\d+\.?\d*)"
+    unit_pattern = UNIT_PATTERN
+    range_pattern = RANGE_PATTERN
 
     for param, name_pattern in PARAM_PATTERNS.items():
         found = False
@@ -108,35 +270,28 @@ def extract_cbc_clean(text: str):
             if re.search(name_pattern, current_line, re.I):
                 search_block = " ".join(lines[i:i+7])
                 number_match = re.search(r"([<>]?\d[\d,\.]*)", search_block)
-                raw_val = clean_token(number_match.group(1)) if number_match else None
+                raw_val = _clean_token(number_match.group(1)) if number_match else None
                 unit_match = re.search(unit_pattern, search_block, re.I)
                 unit = unit_match.group(1) if unit_match else ""
 
                 if not unit:
-                    unit = {
-                        "HEMATOCRIT": "%", "PCV": "%", "MCV": "fL",
-                        "RDW-CV": "%", "RDW": "%", "RDW-SD": "fL",
-                        "MCH": "pg", "MCHC": "g/dL",
-                        "NEUTROPHILS": "%", "LYMPHOCYTES": "%",
-                        "MONOCYTES": "%", "EOSINOPHILS": "%", "BASOPHILS": "%",
-                        "ESR": "mm/hr"
-                    }.get(param, "")
+                    unit = DEFAULT_UNITS.get(param, "")
 
                 range_match = re.search(range_pattern, search_block)
                 if range_match:
-                    low = parse_number(range_match.group(1))
-                    high = parse_number(range_match.group(2))
+                    low = _parse_number(range_match.group(1))
+                    high = _parse_number(range_match.group(2))
                     ranges_extracted[param] = (low, high)
                 else:
                     upto_match = re.search(r"(up to|below)\s*(\d+\.?\d*)", search_block, re.I)
                     if upto_match:
-                        high = parse_number(upto_match.group(2))
+                        high = _parse_number(upto_match.group(2))
                         ranges_extracted[param] = (0, high)
                     else:
                         ranges_extracted[param] = None
 
-                num = parse_number(raw_val)
-                num = normalize_by_unit(param, num, unit)
+                num = _parse_number(raw_val)
+                num = _normalize_by_unit(param, num, unit)
 
                 if param.upper() == "RDW":
                     if "RDW-CV" not in parameters or parameters["RDW-CV"] is None:
@@ -161,97 +316,384 @@ def extract_cbc_clean(text: str):
     return results
 
 
-def assess_cbc(parameters: dict, age: int = None, sex: str = None, custom_ranges: dict = None):
-    ranges = {
-        "HEMOGLOBIN": {"Male": (13.0, 17.0), "Female": (12.0, 16.0)},
-        "TOTAL LEUKOCYTE COUNT": (4500.0, 11000.0),
-        "TOTAL RBC COUNT": (4_500_000.0, 5_500_000.0),
-        "PLATELET COUNT": (150000.0, 450000.0),
-        "HEMATOCRIT": (40.0, 50.0),
-        "MCV": (80.0, 100.0),
-        "MCH": (27.0, 32.0),
-        "MCHC": (31.5, 34.5),
-        "RDW-CV": (11.5, 14.5),
-        "RDW-SD": (35.0, 56.0),
-        "NEUTROPHILS": (40.0, 80.0),
-        "LYMPHOCYTES": (20.0, 40.0),
-        "MONOCYTES": (2.0, 10.0),
-        "EOSINOPHILS": (1.0, 6.0),
-        "BASOPHILS": (0.0, 2.0),
-        "ESR": (0.0, 20.0)
-    }
+ENGINES = {
+    "compiled": extract_cbc_compiled,
+    "legacy": extract_cbc_legacy,
+}
+
+
+def collect_cbc_text(pages, page_break="\n\n\n\n"):
+    """Join page texts, stopping once the rest cannot change the extraction.
+
+    Pages are pulled from ``pages`` until every parameter outside
+    ``OPTIONAL_PARAMS`` has been located, every parameter located so far has
+    a full value block after it, and an "Age/Gender" line has fixed age and
+    sex. Running ``extract_cbc_clean`` on the returned text then gives the
+    same result as on the whole document, as long as the pages left unread
+    do not mention a parameter the collected ones lack. Returns
+    ``(text, stopped_early)``.
+    """
+    pages = iter(pages)
+    texts = []
+    pending = _PARAM_RES
+    n_lines = 0
+    last_hit = -1
+    age_sex_found = False
+    stopped_early = False
+
+    for page_text in pages:
+        texts.append(page_text or "")
+        for line in _split_lines(page_text or ""):
+            current_line = line.upper()
+            if pending and _ANY_PARAM_RE.search(current_line):
+                remaining = [(param, name_re) for param, name_re in pending if not name_re.search(current_line)]
+                if len(remaining) != len(pending):
+                    last_hit = n_lines
+                pending = remaining
+            n_lines += 1
+
+        # The first "Age/Gender" match wins over separate Age and Sex lines
+        # anywhere in the document, so only it settles age and sex early
+        if not age_sex_found:
+            age_sex_found = _AGE_SEX_RE.search(page_break.join(texts)) is not None
+        if (age_sex_found and n_lines - last_hit >= BLOCK_LINES
+                and all(param in OPTIONAL_PARAMS for param, _ in pending)):
+            stopped_early = True
+            break
+
+    if stopped_early and hasattr(pages, "close"):
+        pages.close()
+    return page_break.join(texts), stopped_early
+
+
+def _extract_chunk(texts, engine):
+    return [extract_cbc_clean(t, engine=engine) for t in texts]
+
+
+def _iter_chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def extract_cbc_many(texts, workers=None, chunk_size=64, engine=None):
+    """Yield ``extract_cbc_clean`` results for ``texts`` in input order.
+
+    Texts are sent to a process pool ``chunk_size`` at a time, with at most
+    two chunks per worker in flight so arbitrarily long iterables are
+    consumed lazily. ``workers=0`` runs everything in the calling process.
+    """
+    if workers == 0:
+        for chunk in _iter_chunks(texts, chunk_size):
+            yield from _extract_chunk(chunk, engine)
+        return
+
+    max_in_flight = 2 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in _iter_chunks(texts, chunk_size):
+            pending.append(pool.submit(_extract_chunk, chunk, engine))
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+REFERENCE_RANGES = {
+    "HEMOGLOBIN": {"Male": (13.0, 17.0), "Female": (12.0, 16.0)},
+    "TOTAL LEUKOCYTE COUNT": (4500.0, 11000.0),
+    "TOTAL RBC COUNT": (4_500_000.0, 5_500_000.0),
+    "PLATELET COUNT": (150000.0, 450000.0),
+    "HEMATOCRIT": (40.0, 50.0),
+    "MCV": (80.0, 100.0),
+    "MCH": (27.0, 32.0),
+    "MCHC": (31.5, 34.5),
+    "RDW-CV": (11.5, 14.5),
+    "RDW-SD": (35.0, 56.0),
+    "NEUTROPHILS": (40.0, 80.0),
+    "LYMPHOCYTES": (20.0, 40.0),
+    "MONOCYTES": (2.0, 10.0),
+    "EOSINOPHILS": (1.0, 6.0),
+    "BASOPHILS": (0.0, 2.0),
+    "ESR": (0.0, 20.0)
+}
+
+# (max age inclusive, overrides), checked in order
+AGE_RANGE_OVERRIDES = [
+    (1, {
+        "HEMOGLOBIN": (10.0, 14.0),
+        "TOTAL LEUKOCYTE COUNT": (6000.0, 17000.0),
+        "TOTAL RBC COUNT": (3_900_000.0, 5_100_000.0),
+        "HEMATOCRIT": (30.0, 40.0),
+    }),
+    (5, {
+        "HEMOGLOBIN": (11.0, 14.0),
+        "TOTAL LEUKOCYTE COUNT": (5000.0, 15000.0),
+        "TOTAL RBC COUNT": (4_000_000.0, 5_200_000.0),
+        "HEMATOCRIT": (32.0, 40.0),
+    }),
+]
+
+UNITS = {
+    "HEMOGLOBIN": "g/dL", "TOTAL LEUKOCYTE COUNT": "/µL", "TOTAL RBC COUNT": "/µL",
+    "PLATELET COUNT": "/µL", "HEMATOCRIT": "%", "MCV": "fL", "MCH": "pg",
+    "MCHC": "g/dL", "RDW-CV": "%", "RDW-SD": "%", "NEUTROPHILS": "%", "LYMPHOCYTES": "%",
+    "MONOCYTES": "%", "EOSINOPHILS": "%", "BASOPHILS": "%", "ESR": "mm/hr"
+}
+
+DIFFERENTIAL_KEYS = ["NEUTROPHILS", "LYMPHOCYTES", "MONOCYTES", "EOSINOPHILS", "BASOPHILS"]
+
+TOLERANCE = 0.02
+
+DEFAULT_PROFILE = "default"
+
+# A resolved reference range with its tolerance band and display label
+RefRange = namedtuple("RefRange", ["low", "high", "tol_low", "tol_high", "label"])
+
+# Source ranges per lab profile, and the frozen lookup table built from them:
+# (age bracket, sex, profile) -> read-only {parameter: RefRange or None}.
+# The age bracket is the matching AGE_RANGE_OVERRIDES max age, or None.
+_PROFILE_RANGES = {}
+_RANGE_REGISTRY = {}
+RANGE_REGISTRY = MappingProxyType(_RANGE_REGISTRY)
+
+
+def _age_bracket(age):
+    if age is not None:
+        for max_age, _ in AGE_RANGE_OVERRIDES:
+            if age <= max_age:
+                return max_age
+    return None
 
-    if custom_ranges:
-        for k, v in custom_ranges.items():
-            ranges[k] = v
 
-    if age is not None:
-        if age <= 1:
-            ranges.update({
-                "HEMOGLOBIN": (10.0, 14.0),
-                "TOTAL LEUKOCYTE COUNT": (6000.0, 17000.0),
-                "TOTAL RBC COUNT": (3_900_000.0, 5_100_000.0),
-                "HEMATOCRIT": (30.0, 40.0),
-            })
-        elif age <= 5:
-            ranges.update({
-                "HEMOGLOBIN": (11.0, 14.0),
-                "TOTAL LEUKOCYTE COUNT": (5000.0, 15000.0),
-                "TOTAL RBC COUNT": (4_000_000.0, 5_200_000.0),
-                "HEMATOCRIT": (32.0, 40.0),
-            })
-
-    units = {
-        "HEMOGLOBIN": "g/dL", "TOTAL LEUKOCYTE COUNT": "/µL", "TOTAL RBC COUNT": "/µL",
-        "PLATELET COUNT": "/µL", "HEMATOCRIT": "%", "MCV": "fL", "MCH": "pg",
-        "MCHC": "g/dL", "RDW-CV": "%", "RDW-SD": "%", "NEUTROPHILS": "%", "LYMPHOCYTES": "%",
-        "MONOCYTES": "%", "EOSINOPHILS": "%", "BASOPHILS": "%", "ESR": "mm/hr"
-    }
-
-    TOLERANCE = 0.02
-
-    def get_range(key):
-        r = ranges.get(key)
+def _resolve_ranges(ranges, bracket, sex):
+    ranges = dict(ranges)
+    for max_age, overrides in AGE_RANGE_OVERRIDES:
+        if max_age == bracket:
+            ranges.update(overrides)
+
+    resolved = {}
+    for key, r in ranges.items():
+        if isinstance(r, dict):
+            if sex in r:
+                r = r[sex]
+            else:
+                r = (min(v[0] for v in r.values()), max(v[1] for v in r.values()))
         if r is None:
-            return None
+            resolved[key] = None
+            continue
+        low, high = r
+        resolved[key] = RefRange(low, high, low * (1 - TOLERANCE), high * (1 + TOLERANCE), f"{low}-{high}")
+    return MappingProxyType(resolved)
+
+
+def _profile_sexes(ranges):
+    sexes = set()
+    for r in ranges.values():
         if isinstance(r, dict):
-            if sex and sex.capitalize() in r:
-                return r[sex.capitalize()]
-            return (min(v[0] for v in r.values()), max(v[1] for v in r.values()))
-        return r
+            sexes.update(r)
+    return sexes
+
+
+def register_range_profile(name: str, custom_ranges: dict = None):
+    """Precompute every (age bracket, sex) range table for a lab profile.
+
+    ``custom_ranges`` overrides the default reference ranges the same way
+    ``assess_cbc(custom_ranges=...)`` does; age-bracket ranges still win.
+    """
+    ranges = dict(REFERENCE_RANGES)
+    if custom_ranges:
+        ranges.update(custom_ranges)
+    brackets = [None] + [max_age for max_age, _ in AGE_RANGE_OVERRIDES]
+    sexes = [None] + sorted(_profile_sexes(ranges))
+
+    for key in [k for k in _RANGE_REGISTRY if k[2] == name]:
+        del _RANGE_REGISTRY[key]
+    _PROFILE_RANGES[name] = MappingProxyType(ranges)
+    for bracket in brackets:
+        for sex in sexes:
+            _RANGE_REGISTRY[(bracket, sex, name)] = _resolve_ranges(ranges, bracket, sex)
+
+
+def load_range_profiles(path: str):
+    """Register lab profiles from a JSON file and return their names.
+
+    The file maps profile name -> {parameter: [low, high]} or
+    {parameter: {"Male": [low, high], "Female": [low, high]}}.
+    """
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+
+    for name, profile in config.items():
+        custom = {}
+        for key, r in profile.items():
+            if isinstance(r, dict):
+                custom[key] = {s: tuple(v) for s, v in r.items()}
+            else:
+                custom[key] = tuple(r) if r is not None else None
+        register_range_profile(name, custom)
+    return list(config)
+
+
+def get_reference_ranges(age: int = None, sex: str = None, profile: str = DEFAULT_PROFILE):
+    """Return the frozen {parameter: RefRange} table for a patient."""
+    if profile not in _PROFILE_RANGES:
+        raise ValueError(f"Unknown range profile: {profile}")
+    s = sex.capitalize() if sex else None
+    key = (_age_bracket(age), s, profile)
+    table = _RANGE_REGISTRY.get(key)
+    if table is None:
+        table = _RANGE_REGISTRY[(key[0], None, profile)]
+    return table
+
+
+register_range_profile(DEFAULT_PROFILE)
+
+
+def assess_cbc(parameters: dict, age: int = None, sex: str = None, custom_ranges: dict = None,
+               profile: str = DEFAULT_PROFILE):
+    if profile not in _PROFILE_RANGES:
+        raise ValueError(f"Unknown range profile: {profile}")
+    if custom_ranges:
+        ranges = dict(_PROFILE_RANGES[profile])
+        ranges.update(custom_ranges)
+        table = _resolve_ranges(ranges, _age_bracket(age), sex.capitalize() if sex else None)
+    else:
+        table = get_reference_ranges(age, sex, profile)
 
     assessed = {}
-    for key in ranges.keys():
-        unit = units.get(key, "")
+    for key, rng in table.items():
+        unit = UNITS.get(key, "")
         val = parameters.get(key)
-        rng = get_range(key)
         
         if rng is None:
             assessed[key] = {"value": val, "status": "NA", "unit": unit, "range": "N/A"}
             continue
 
-        low, high = rng
         if val is None:
-            val = (low + high) / 2
+            val = (rng.low + rng.high) / 2
 
-        tol_low = low * (1 - TOLERANCE)
-        tol_high = high * (1 + TOLERANCE)
-        
-        if val < tol_low:
+        if val < rng.tol_low:
             status = "Low"
-        elif val > tol_high:
+        elif val > rng.tol_high:
             status = "High"
         else:
             status = "Normal"
 
-        assessed[key] = {"value": val, "status": status, "unit": unit, "range": f"{low}-{high}"}
+        assessed[key] = {"value": val, "status": status, "unit": unit, "range": rng.label}
 
     abs_counts = {}
-    wbc = parameters.get("TOTAL LEUKOCYTE COUNT") or get_range("TOTAL LEUKOCYTE COUNT")[0]
-    for diff_key in ["NEUTROPHILS", "LYMPHOCYTES", "MONOCYTES", "EOSINOPHILS", "BASOPHILS"]:
+    wbc = parameters.get("TOTAL LEUKOCYTE COUNT") or table["TOTAL LEUKOCYTE COUNT"].low
+    for diff_key in DIFFERENTIAL_KEYS:
         pct = parameters.get(diff_key)
         if pct is None:
-            pct = get_range(diff_key)[0]
+            pct = table[diff_key].low
         abs_counts[diff_key + "_ABS"] = {"value": round(wbc * (pct / 100.0), 2), "unit": "/µL"}
 
-    return {"assessed": assessed, "absolute_counts": abs_counts}
\ No newline at end of file
+    return {"assessed": assessed, "absolute_counts": abs_counts}
+
+
+def assess_cbc_frame(df, custom_ranges: dict = None, age_col: str = "age", sex_col: str = "sex",
+                     profile: str = DEFAULT_PROFILE):
+    """Columnar ``assess_cbc`` for a whole cohort.
+
+    ``df`` has one row per report, one column per parameter (assessment
+    keys, missing values as NaN/None) plus ``age_col``/``sex_col``. Returns a
+    DataFrame on the same index with (parameter, field) columns: ``value``,
+    ``status``, ``unit`` and ``range`` for each assessed parameter, and
+    ``value``/``unit`` for each ``<DIFF>_ABS`` absolute count, matching
+    ``assess_cbc`` row for row.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if profile not in _PROFILE_RANGES:
+        raise ValueError(f"Unknown range profile: {profile}")
+    n = len(df)
+    ranges = dict(_PROFILE_RANGES[profile])
+    if custom_ranges:
+        ranges.update(custom_ranges)
+
+    if age_col in df:
+        age = pd.to_numeric(df[age_col], errors="coerce").to_numpy(dtype=float)
+    else:
+        age = np.full(n, np.nan)
+    if sex_col in df:
+        sex = df[sex_col].map(lambda s: s.capitalize() if isinstance(s, str) and s else None)
+    else:
+        sex = pd.Series([None] * n, index=df.index, dtype=object)
+
+    # Rows falling in each age bracket; first matching bracket wins.
+    bracket_masks = []
+    taken = np.zeros(n, dtype=bool)
+    for max_age, overrides in AGE_RANGE_OVERRIDES:
+        mask = ~taken & (age <= max_age)
+        bracket_masks.append((mask, overrides))
+        taken |= mask
+
+    def resolve(key):
+        """Return (candidates, ids): per-row index into a short list of range tuples."""
+        r = ranges.get(key)
+        if isinstance(r, dict):
+            candidates = [(min(v[0] for v in r.values()), max(v[1] for v in r.values()))]
+            lookup = {}
+            for s, v in r.items():
+                lookup[s] = len(candidates)
+                candidates.append(v)
+            ids = sex.map(lookup).fillna(0).to_numpy(dtype=int, copy=True)
+        else:
+            candidates = [r]
+            ids = np.zeros(n, dtype=int)
+        for mask, overrides in bracket_masks:
+            if key in overrides:
+                candidates.append(overrides[key])
+                ids[mask] = len(candidates) - 1
+        return candidates, ids
+
+    def column(key):
+        if key in df:
+            return pd.to_numeric(df[key], errors="coerce").to_numpy(dtype=float)
+        return np.full(n, np.nan)
+
+    out = {}
+    lows = {}
+    for key in ranges.keys():
+        unit = UNITS.get(key, "")
+        candidates, ids = resolve(key)
+        val = column(key)
+
+        valid = np.array([c is not None for c in candidates])
+        low = np.array([c[0] if c is not None else np.nan for c in candidates], dtype=float)[ids]
+        high = np.array([c[1] if c is not None else np.nan for c in candidates], dtype=float)[ids]
+        labels = np.array([f"{c[0]}-{c[1]}" if c is not None else "N/A" for c in candidates], dtype=object)[ids]
+        has_range = valid[ids]
+        lows[key] = low
+
+        val = np.where(np.isnan(val) & has_range, (low + high) / 2, val)
+        status = np.select(
+            [~has_range, val < low * (1 - TOLERANCE), val > high * (1 + TOLERANCE)],
+            ["NA", "Low", "High"],
+            default="Normal",
+        ).astype(object)
+
+        value = val.astype(object)
+        value[np.isnan(val)] = None
+        out[(key, "value")] = value
+        out[(key, "status")] = status
+        out[(key, "unit")] = np.full(n, unit, dtype=object)
+        out[(key, "range")] = labels
+
+    wbc = column("TOTAL LEUKOCYTE COUNT")
+    wbc = np.where(np.isnan(wbc) | (wbc == 0), lows["TOTAL LEUKOCYTE COUNT"], wbc)
+    for diff_key in DIFFERENTIAL_KEYS:
+        pct = column(diff_key)
+        pct = np.where(np.isnan(pct), lows[diff_key], pct)
+        out[(diff_key + "_ABS", "value")] = np.round(wbc * (pct / 100.0), 2)
+        out[(diff_key + "_ABS", "unit")] = np.full(n, "/µL", dtype=object)
+
+    result = pd.DataFrame(out, index=df.index)
+    result.columns = pd.MultiIndex.from_tuples(result.columns)
+    return result
@@ -0,0 +1,210 @@
+class PhraseAutomaton:
+    """Aho-Corasick automaton over a fixed set of lowercase phrases.
+
+    ``scan(text)`` returns every phrase that occurs as a substring of
+    ``text`` (the same test as ``phrase in text``) in one pass over it,
+    however many phrases were compiled.
+    """
+
+    def __init__(self, phrases):
+        self.phrases = list(dict.fromkeys(phrases))
+        goto = [{}]
+        out = [[]]
+        for index, phrase in enumerate(self.phrases):
+            state = 0
+            for ch in phrase:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = goto[state][ch] = len(goto)
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(index)
+
+        # Breadth-first failure links, folded into a full transition table
+        fail = [0] * len(goto)
+        delta = [dict(edges) for edges in goto]
+        queue = list(goto[0].values())
+        for state in queue:
+            # fail[state] is shallower, so its row of ``delta`` is already complete
+            f = fail[state]
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                fail[nxt] = delta[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+            for ch, nxt in delta[f].items():
+                delta[state].setdefault(ch, nxt)
+        self._delta = delta
+        self._out = [tuple(o) for o in out]
+
+    def scan(self, text):
+        """Indices into ``self.phrases`` of every phrase found in ``text``."""
+        delta, out = self._delta, self._out
+        found = set()
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class QuestionMatch:
+    """Intents and parameter aliases found in one question."""
+
+    __slots__ = ("text", "aliases", "_first", "_names")
+
+    def __init__(self, text, first, aliases, names):
+        self.text = text
+        self.aliases = aliases
+        self._first = first
+        self._names = names
+
+    def has(self, intent):
+        return intent in self._first
+
+    def first(self, intent):
+        """The earliest-listed phrase of ``intent`` in the question, or None."""
+        return self._first.get(intent)
+
+    def mentions(self, name):
+        """``name in text`` for a lowercase parameter name."""
+        found = self._names.get(name)
+        return found if found is not None else name in self.text
+
+
+class IntentMatcher:
+    """All chat intent phrases and parameter aliases compiled into one automaton.
+
+    ``intents`` maps intent name -> phrases (earlier phrases win for
+    ``QuestionMatch.first``), ``aliases`` maps lowercase keyword -> canonical
+    parameter key, and ``names`` are lowercase parameter names checked with
+    ``QuestionMatch.mentions``. ``match(text)`` scans ``text`` once.
+    """
+
+    def __init__(self, intents, aliases, names=()):
+        self.intents = {name: tuple(phrases) for name, phrases in intents.items()}
+        self.aliases = dict(aliases)
+        self.names = tuple(names)
+
+        # phrase -> what a hit means: ("intent", name, rank) / ("alias", rank) / ("name",)
+        roles = {}
+        for name, phrases in self.intents.items():
+            for rank, phrase in enumerate(phrases):
+                roles.setdefault(phrase, []).append(("intent", name, rank))
+        for rank, keyword in enumerate(self.aliases):
+            roles.setdefault(keyword, []).append(("alias", rank))
+        for name in self.names:
+            roles.setdefault(name, []).append(("name",))
+
+        self._automaton = PhraseAutomaton(roles)
+        self._roles = [tuple(roles[p]) for p in self._automaton.phrases]
+        self._alias_items = list(self.aliases.items())
+
+    def match(self, text):
+        first = {}
+        alias_ranks = []
+        names = dict.fromkeys(self.names, False)
+        for index in self._automaton.scan(text):
+            phrase = self._automaton.phrases[index]
+            for role in self._roles[index]:
+                if role[0] == "intent":
+                    _, name, rank = role
+                    if name not in first or rank < first[name][0]:
+                        first[name] = (rank, phrase)
+                elif role[0] == "alias":
+                    alias_ranks.append(role[1])
+                else:
+                    names[phrase] = True
+        return QuestionMatch(
+            text,
+            {name: phrase for name, (_, phrase) in first.items()},
+            [self._alias_items[rank] for rank in sorted(alias_ranks)],
+            names,
+        )
+
+
+# Reassurance questions, checked before anything else
+CONCERN_PHRASES = [
+    "should i worry", "is this serious", "is this dangerous",
+    "should i fear it", "am i at risk", "is it harmful",
+    "is it bad", "is it concerning", "should i be concerned",
+    "is this alarming", "is this critical", "is it dangerous",
+    "do i need to panic", "should i be worried", "is this a problem",
+    "does this indicate something serious", "is it risky",
+    "am i in danger", "is this harmful for my health",
+    "should i consult a doctor immediately", "is it urgent",
+    "do i need medical attention", "is it life threatening",
+    "am i okay", "am i healthy", "should i take action",
+    "should i be cautious", "is this cause for concern"
+]
+
+# Overall "is my report okay" questions
+HEALTH_CHECK_PHRASES = [
+    # Common report-related questions
+    "are my results good", "is my report good", "is everything normal",
+    "are my reports normal", "am i healthy", "is my health okay",
+    "how are my results", "how is my report", "is my cbc good",
+    "are the results fine", "is everything okay", "are my values okay",
+    "are my blood test results okay", "does it look fine",
+    "is my report okay", "are my results fine", "is my blood test normal",
+    "are my blood results good", "is my cbc normal", "is my report fine",
+    "are my readings normal", "are my numbers normal",
+    "are my counts good", "are my blood levels good",
+    "is my health report fine", "is my blood normal",
+    "does my report look normal", "am i fine", "am i doing okay",
+    "does my health look okay", "does everything look okay",
+    "are my readings good", "does it seem normal", "are things normal",
+    "does my cbc look good", "are my test results normal",
+    "is my blood report okay", "is my cbc fine", "are my cbc values okay",
+    "is my cbc report okay", "is my test result good", "am i all right",
+    "is my report positive", "is my report negative", "is my blood okay",
+    "are there any issues in my report", "is my report clear",
+    "is my report showing anything bad", "is my blood fine",
+    "am i perfectly healthy", "is everything fine with my report",
+    "is my cbc test okay", "is my cbc test normal", "is my health normal",
+    "is my blood test fine", "does my test look fine",
+    "am i doing well health wise", "are my medical results fine",
+    "are my test results fine", "are my results okay"
+]
+
+# Keyword intents of the rule-based responder, in routing order
+RULE_INTENTS = {
+    "what_to_do": ["what to do", "what should i do", "what can i do", "how to fix", "how to improve", "what to eat", "how to treat"],
+    "high_low": ["high", "low", "elevated", "decreased", "why is", "what if", "above", "below"],
+    "explain": ["what is", "explain", "tell me about", "meaning of", "define"],
+    "value": ["my", "level", "value", "result", "count", "reading", "score"],
+    "normal_range": ["normal", "range", "reference", "should be"],
+    "summary": ["summary", "overview", "overall", "report", "everything", "all results", "full report"],
+    "worry": ["worried", "concern", "dangerous", "serious", "risk", "problem", "should i be"],
+    "compare": ["compare", "difference", "versus", "vs", "better", "worse"],
+    "cbc": ["cbc", "complete blood count"],
+    "asking_high": ["high", "elevated", "increase", "above"],
+    "asking_low": ["low", "decrease", "reduced", "below"],
+}
+
+# Keyword variations (lowercase) -> canonical assessment keys
+PARAM_ALIASES = {
+    # Hemoglobin
+    "hemoglobin": "HEMOGLOBIN", "hgb": "HEMOGLOBIN", "hb": "HEMOGLOBIN", "haemoglobin": "HEMOGLOBIN",
+    # WBC
+    "wbc": "TOTAL LEUKOCYTE COUNT", "white blood cell": "TOTAL LEUKOCYTE COUNT", "white blood cells": "TOTAL LEUKOCYTE COUNT",
+    "white blood": "TOTAL LEUKOCYTE COUNT", "leukocyte": "TOTAL LEUKOCYTE COUNT", "tlc": "TOTAL LEUKOCYTE COUNT",
+    # RBC
+    "rbc": "RBC COUNT", "red blood cell": "RBC COUNT", "red blood": "RBC COUNT", "red cell": "RBC COUNT", "erythrocyte": "RBC COUNT",
+    # Platelets
+    "platelet": "PLATELET COUNT", "plt": "PLATELET COUNT", "thrombocyte": "PLATELET COUNT", "platelets": "PLATELET COUNT",
+    # Hematocrit
+    "hematocrit": "HEMATOCRIT", "hct": "HEMATOCRIT", "haematocrit": "HEMATOCRIT", "pcv": "HEMATOCRIT",
+    # MCV / MCH / MCHC / RDW
+    "mcv": "MCV", "mean corpuscular volume": "MCV", "cell size": "MCV",
+    "mch": "MCH", "mean corpuscular hemoglobin": "MCH",
+    "mchc": "MCHC", "mean corpuscular hemoglobin concentration": "MCHC",
+    "rdw": "RDW", "red cell distribution width": "RDW",
+    # Differential
+    "neutrophil": "NEUTROPHILS", "neut": "NEUTROPHILS", "neutro": "NEUTROPHILS", "polymorph": "NEUTROPHILS", "pmn": "NEUTROPHILS",
+    "lymphocyte": "LYMPHOCYTES", "lymph": "LYMPHOCYTES", "lympho": "LYMPHOCYTES",
+    "monocyte": "MONOCYTES", "mono": "MONOCYTES",
+    "eosinophil": "EOSINOPHILS", "eos": "EOSINOPHILS", "eosino": "EOSINOPHILS",
+    "basophil": "BASOPHILS", "baso": "BASOPHILS",
+}
@@ -1,14 +1,134 @@
 import sqlite3
-from datetime import datetime
 import json
+import os
+import threading
+from functools import lru_cache
+
+# Bound parameters per statement; older SQLite builds cap them at 999
+MAX_SQL_VARIABLES = 900
+
+# Schema migrations, applied in order by init_db. The number of applied
+# entries is recorded in PRAGMA user_version; append, never edit.
+SCHEMA_MIGRATIONS = [
+    # 1: composite indexes for per-user report and chat history lookups
+    [
+        'CREATE INDEX IF NOT EXISTS idx_reports_user_date ON reports (user_id, report_date)',
+        'CREATE INDEX IF NOT EXISTS idx_chat_user_report_time ON chat_history (user_id, report_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_chat_user_time ON chat_history (user_id, timestamp)',
+    ],
+    # 2: one row per assessed parameter so trends never decode the JSON blobs;
+    #    measured is 0 when the value was imputed rather than read from the report
+    [
+        '''CREATE TABLE IF NOT EXISTS report_values (
+            report_id INTEGER NOT NULL,
+            parameter TEXT NOT NULL,
+            value REAL,
+            status TEXT,
+            unit TEXT,
+            low REAL,
+            high REAL,
+            measured INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (report_id, parameter),
+            FOREIGN KEY (report_id) REFERENCES reports (report_id)
+        ) WITHOUT ROWID''',
+        '''INSERT OR REPLACE INTO report_values
+               (report_id, parameter, value, status, unit, low, high, measured)
+           SELECT report_id, parameter, value, status, unit,
+                  CASE WHEN dash > 1 THEN CAST(substr(label, 1, dash - 1) AS REAL) END,
+                  CASE WHEN dash > 1 THEN CAST(substr(label, dash + 1) AS REAL) END,
+                  measured
+           FROM (
+               SELECT r.report_id,
+                      a.key AS parameter,
+                      json_extract(a.value, '$.value') AS value,
+                      json_extract(a.value, '$.status') AS status,
+                      json_extract(a.value, '$.unit') AS unit,
+                      json_extract(a.value, '$.range') AS label,
+                      instr(json_extract(a.value, '$.range'), '-') AS dash,
+                      EXISTS (SELECT 1 FROM json_each(r.parameters) p
+                              WHERE p.key = a.key AND p.type != 'null') AS measured
+               FROM reports r, json_each(r.assessment, '$.assessed') a
+               WHERE json_valid(r.assessment) AND json_valid(r.parameters)
+           )''',
+    ],
+    # 3: the range profile a report was assessed with, so re-assessment uses
+    #    the same ranges; NULL for reports saved before it was recorded
+    [
+        'ALTER TABLE reports ADD COLUMN lab_profile TEXT',
+    ],
+]
+
+SCHEMA_VERSION = len(SCHEMA_MIGRATIONS)
+
+
+@lru_cache(maxsize=1024)
+def _split_range(label):
+    """'12.0-15.0' -> (12.0, 15.0); anything else -> (None, None)."""
+    low, sep, high = (label or '').partition('-')
+    try:
+        return (float(low), float(high)) if sep and low else (None, None)
+    except ValueError:
+        return None, None
+
+
+def _value_rows(report_id, parameters, assessment):
+    """report_values rows for one report's assessment."""
+    for param, data in (assessment or {}).get('assessed', {}).items():
+        low, high = _split_range(data.get('range'))
+        yield (report_id, param, data.get('value'), data.get('status'), data.get('unit'),
+               low, high, int((parameters or {}).get(param) is not None))
+
 
 class CBCDatabase:
-    def __init__(self, db_path='cbc_reports.db'):
+    """SQLite access with one reusable connection per thread.
+
+    Connections run in WAL mode so readers never block the writer, and each
+    keeps its own prepared-statement cache across calls.
+    """
+    
+    def __init__(self, db_path='cbc_reports.db', cache_size_kb=16384, cached_statements=256):
         self.db_path = db_path
+        self.cache_size_kb = cache_size_kb
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
         self.init_db()
     
+    def connection(self):
+        """Return this thread's connection, opening and tuning it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        # A connection inherited across fork() must not be reused
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=30,
+                check_same_thread=False,
+                cached_statements=self.cached_statements
+            )
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb)}')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+    
+    def close(self):
+        """Close every pooled connection (e.g. at shutdown)."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+        self._local = threading.local()
+    
     def init_db(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connection()
         cursor = conn.cursor()
         
         # Users table
@@ -50,35 +170,121 @@ class CBCDatabase:
         ''')
         
         conn.commit()
-        conn.close()
+        self.migrate()
+    
+    def schema_version(self):
+        return self.connection().execute('PRAGMA user_version').fetchone()[0]
+    
+    def migrate(self):
+        """Apply pending SCHEMA_MIGRATIONS, each in its own transaction."""
+        conn = self.connection()
+        version = self.schema_version()
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Another process may have migrated while we waited for the lock
+                if self.schema_version() >= target:
+                    conn.rollback()
+                    continue
+                for statement in SCHEMA_MIGRATIONS[target - 1]:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {target}')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
     
     def create_user(self, username):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connection()
         cursor = conn.cursor()
         try:
-            cursor.execute('INSERT INTO users (username) VALUES (?)', (username,))
-            conn.commit()
+            with conn:
+                cursor.execute('INSERT INTO users (username) VALUES (?)', (username,))
             user_id = cursor.lastrowid
         except sqlite3.IntegrityError:
             cursor.execute('SELECT user_id FROM users WHERE username = ?', (username,))
             user_id = cursor.fetchone()[0]
-        conn.close()
         return user_id
     
-    def save_report(self, user_id, age, sex, raw_text, parameters, assessment):
-        conn = sqlite3.connect(self.db_path)
+    def save_report(self, user_id, age, sex, raw_text, parameters, assessment, lab_profile=None):
+        conn = self.connection()
         cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO reports (user_id, age, sex, raw_text, parameters, assessment)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, age, sex, raw_text, json.dumps(parameters), json.dumps(assessment)))
-        conn.commit()
-        report_id = cursor.lastrowid
-        conn.close()
+        with conn:
+            cursor.execute('''
+                INSERT INTO reports (user_id, age, sex, raw_text, parameters, assessment, lab_profile)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, age, sex, raw_text, json.dumps(parameters), json.dumps(assessment),
+                  lab_profile))
+            report_id = cursor.lastrowid
+            self._write_values(cursor, [(report_id, parameters, assessment)], replace=False)
         return report_id
     
+    def _write_values(self, cursor, reports, replace=True):
+        """Write the report_values rows of (report_id, parameters, assessment) items."""
+        reports = list(reports)
+        if replace:
+            cursor.executemany('DELETE FROM report_values WHERE report_id = ?',
+                               ((report_id,) for report_id, _, _ in reports))
+        cursor.executemany('''
+            INSERT INTO report_values (report_id, parameter, value, status, unit, low, high, measured)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (row for report in reports for row in _value_rows(*report)))
+    
+    def bulk_save_reports(self, reports, batch_size=1000):
+        """Insert many reports, ``batch_size`` per transaction. Returns the count.
+
+        ``reports`` is an iterable of dicts with ``username``, ``age``, ``sex``,
+        ``raw_text``, ``parameters``, ``assessment`` and optionally
+        ``report_date`` and ``lab_profile``; it is consumed lazily, one batch at a time. Users
+        are created as needed. Raises ValueError for a report without a
+        username; batches already written stay committed.
+        """
+        total = 0
+        batch = []
+        for report in reports:
+            if not report.get('username'):
+                raise ValueError(f"report {total + len(batch) + 1}: missing username")
+            batch.append(report)
+            if len(batch) >= batch_size:
+                total += self._save_report_batch(batch)
+                batch = []
+        if batch:
+            total += self._save_report_batch(batch)
+        return total
+    
+    def _save_report_batch(self, batch):
+        conn = self.connection()
+        cursor = conn.cursor()
+        usernames = list({report['username'] for report in batch})
+        with conn:
+            cursor.executemany('INSERT OR IGNORE INTO users (username) VALUES (?)',
+                               ((username,) for username in usernames))
+            user_ids = {}
+            for i in range(0, len(usernames), MAX_SQL_VARIABLES):
+                chunk = usernames[i:i + MAX_SQL_VARIABLES]
+                cursor.execute(f'''
+                    SELECT username, user_id FROM users
+                    WHERE username IN ({', '.join('?' * len(chunk))})
+                ''', chunk)
+                user_ids.update(cursor.fetchall())
+            
+            cursor.executemany('''
+                INSERT INTO reports (user_id, report_date, age, sex, raw_text, parameters, assessment,
+                                     lab_profile)
+                VALUES (?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?, ?, ?, ?)
+            ''', ((user_ids[r['username']], r.get('report_date'), r.get('age'), r.get('sex'),
+                   r.get('raw_text'), json.dumps(r['parameters']), json.dumps(r['assessment']),
+                   r.get('lab_profile'))
+                  for r in batch))
+            # AUTOINCREMENT ids are consecutive while this transaction holds the write lock
+            last_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+            first_id = last_id - len(batch) + 1
+            self._write_values(cursor, ((first_id + i, r['parameters'], r['assessment'])
+                                        for i, r in enumerate(batch)), replace=False)
+        return len(batch)
+    
     def get_user_reports(self, user_id, limit=10):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connection()
         cursor = conn.cursor()
         cursor.execute('''
             SELECT report_id, report_date, age, sex, parameters, assessment
@@ -88,7 +294,6 @@ class CBCDatabase:
             LIMIT ?
         ''', (user_id, limit))
         reports = cursor.fetchall()
-        conn.close()
         
         result = []
         for report in reports:
@@ -102,18 +307,173 @@ class CBCDatabase:
             })
         return result
     
+    def iter_user_reports(self, user_id, batch_size=50):
+        """Yield every report of a user, oldest first, shaped like ``get_user_reports`` rows.
+
+        Undated reports come first, then the rest in keyset-paginated batches
+        on (report_date, report_id); both walk idx_reports_user_date without
+        sorting, and only ``batch_size`` reports are held in memory at a time.
+        """
+        columns = 'SELECT report_id, report_date, age, sex, parameters, assessment FROM reports'
+        pages = [
+            (f'''{columns}
+                WHERE user_id = ? AND report_date IS NULL AND report_id > ?
+                ORDER BY report_id LIMIT ?''', lambda row: (row[0],), (0,)),
+            (f'''{columns}
+                WHERE user_id = ? AND report_date IS NOT NULL AND (report_date, report_id) > (?, ?)
+                ORDER BY report_date, report_id LIMIT ?''', lambda row: (row[1], row[0]), ('', 0)),
+        ]
+        for sql, next_key, key in pages:
+            while True:
+                rows = self.connection().execute(sql, (user_id, *key, batch_size)).fetchall()
+                if not rows:
+                    break
+                for report in rows:
+                    yield {
+                        'report_id': report[0],
+                        'date': report[1],
+                        'age': report[2],
+                        'sex': report[3],
+                        'parameters': json.loads(report[4]),
+                        'assessment': json.loads(report[5])
+                    }
+                key = next_key(rows[-1])
+    
+    def count_user_reports(self, user_id):
+        return self.connection().execute(
+            'SELECT COUNT(*) FROM reports WHERE user_id = ?', (user_id,)
+        ).fetchone()[0]
+    
+    def get_parameter_series(self, user_id, parameters=None, limit=10, newest_first=False,
+                             measured=False):
+        """Return {parameter: [point, ...]} over the user's latest ``limit`` reports.
+
+        Each point has report_id, date, value, status, unit, low and high, read
+        from report_values only. ``parameters`` restricts the series returned;
+        with ``measured`` only parameters actually read from at least one of
+        those reports are kept, and points without a value are dropped.
+        """
+        sql = '''
+            SELECT v.parameter, r.report_id, r.report_date, v.value, v.status, v.unit,
+                   v.low, v.high, MAX(v.measured) OVER (PARTITION BY v.parameter) AS any_measured
+            FROM (
+                SELECT report_id, report_date FROM reports
+                WHERE user_id = ?
+                ORDER BY report_date DESC, report_id DESC
+                LIMIT ?
+            ) r
+            JOIN report_values v ON v.report_id = r.report_id
+        '''
+        args = [user_id, limit]
+        if parameters is not None:
+            parameters = list(parameters)
+            sql += f" WHERE v.parameter IN ({', '.join('?' * len(parameters))})"
+            args += parameters
+        sql = f'SELECT * FROM ({sql})'
+        if measured:
+            sql += ' WHERE any_measured AND value IS NOT NULL'
+        direction = 'DESC' if newest_first else 'ASC'
+        sql += f' ORDER BY report_date {direction}, report_id {direction}'
+        
+        series = {}
+        for param, report_id, date, value, status, unit, low, high, _ in self.connection().execute(sql, args):
+            series.setdefault(param, []).append({
+                'report_id': report_id,
+                'date': date,
+                'value': value,
+                'status': status,
+                'unit': unit,
+                'low': low,
+                'high': high
+            })
+        return series
+    
+    def _measured_points_sql(self, parameters):
+        """Measured, dated values of one user's reports; ``day`` is days since the Unix epoch."""
+        sql = '''
+            SELECT v.parameter AS parameter, r.report_id AS report_id,
+                   julianday(r.report_date) - 2440587.5 AS day,
+                   v.value AS value, v.status AS status, v.unit AS unit, v.low AS low, v.high AS high
+            FROM reports r
+            JOIN report_values v ON v.report_id = r.report_id
+            WHERE r.user_id = ? AND julianday(r.report_date) IS NOT NULL AND v.measured AND v.value IS NOT NULL
+        '''
+        if parameters is None:
+            return sql, []
+        parameters = list(parameters)
+        return sql + f" AND v.parameter IN ({', '.join('?' * len(parameters))})", parameters
+    
+    def get_parameter_columns(self, user_id, parameters=None):
+        """Every measured value of the user's reports as columns per parameter, oldest first.
+
+        Returns {parameter: {'report_id': [...], 'day': [...], 'value': [...],
+        'status': [...], 'unit', 'low', 'high'}}, with ``day`` in days since
+        the Unix epoch and unit/range taken from the latest report. Reports
+        without a date SQLite can parse are left out.
+        """
+        points, args = self._measured_points_sql(parameters)
+        columns = {}
+        for param, report_id, day, value, status, unit, low, high in self.connection().execute(
+            f'{points} ORDER BY parameter, day, report_id', [user_id] + args
+        ):
+            column = columns.get(param)
+            if column is None:
+                column = columns[param] = {'report_id': [], 'day': [], 'value': [], 'status': []}
+            column['report_id'].append(report_id)
+            column['day'].append(day)
+            column['value'].append(value)
+            column['status'].append(status)
+            column.update(unit=unit, low=low, high=high)
+        return columns
+    
+    def get_parameter_windows(self, user_id, windows, parameters=None):
+        """Aggregates of each parameter over ``windows`` consecutive, equal-count windows of its history.
+
+        Returns {parameter: [window, ...]} oldest first; each window has
+        start/end (days since the Unix epoch), count, mean, min, max, the
+        least-squares slope in units per day (None for a single point or a
+        single day) and the number of Low/High readings. Computed in SQL, so
+        only ``windows`` rows per parameter leave the database.
+        """
+        points, args = self._measured_points_sql(parameters)
+        sql = f'''
+            SELECT parameter, MIN(day), MAX(day), COUNT(*), AVG(value), MIN(value), MAX(value),
+                   (COUNT(*) * SUM(day * value) - SUM(day) * SUM(value))
+                       / NULLIF(COUNT(*) * SUM(day * day) - SUM(day) * SUM(day), 0),
+                   SUM(status IN ('Low', 'High'))
+            FROM (
+                SELECT *, NTILE(?) OVER (PARTITION BY parameter ORDER BY day, report_id) AS bucket
+                FROM ({points})
+            )
+            GROUP BY parameter, bucket
+            ORDER BY parameter, bucket
+        '''
+        result = {}
+        for param, start, end, n, mean, low, high, slope, abnormal in self.connection().execute(
+            sql, [windows, user_id] + args
+        ):
+            result.setdefault(param, []).append({
+                'start': start,
+                'end': end,
+                'count': n,
+                'mean': mean,
+                'min': low,
+                'max': high,
+                'slope': slope,
+                'abnormal': abnormal
+            })
+        return result
+    
     def save_chat(self, user_id, report_id, message, response):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO chat_history (user_id, report_id, message, response)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, report_id, message, response))
-        conn.commit()
-        conn.close()
+        conn = self.connection()
+        with conn:
+            conn.execute('''
+                INSERT INTO chat_history (user_id, report_id, message, response)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, report_id, message, response))
     
     def get_chat_history(self, user_id, report_id=None, limit=50):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connection()
         cursor = conn.cursor()
         
         if report_id:
@@ -134,6 +494,57 @@ class CBCDatabase:
             ''', (user_id, limit))
         
         history = cursor.fetchall()
-        conn.close()
         
-        return [{'message': h[0], 'response': h[1], 'timestamp': h[2]} for h in history]
\ No newline at end of file
+        return [{'message': h[0], 'response': h[1], 'timestamp': h[2]} for h in history]
+    
+    def iter_report_texts(self, batch_size=500):
+        """Yield (report_id, age, sex, raw_text, lab_profile) for every report, oldest first.
+
+        Rows are read in keyset-paginated batches, each fully fetched, so no
+        read transaction stays open while callers write results back.
+        """
+        last_id = 0
+        while True:
+            cursor = self.connection().cursor()
+            cursor.execute('''
+                SELECT report_id, age, sex, raw_text, lab_profile
+                FROM reports
+                WHERE report_id > ?
+                ORDER BY report_id
+                LIMIT ?
+            ''', (last_id, batch_size))
+            rows = cursor.fetchall()
+            
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1][0]
+    
+    def update_report_results(self, updates):
+        """Rewrite parameters/assessment for many reports in one transaction.
+
+        ``updates`` is an iterable of (report_id, parameters, assessment).
+        """
+        updates = list(updates)
+        conn = self.connection()
+        cursor = conn.cursor()
+        with conn:
+            cursor.executemany('''
+                UPDATE reports SET parameters = ?, assessment = ?
+                WHERE report_id = ?
+            ''', ((json.dumps(parameters), json.dumps(assessment), report_id)
+                  for report_id, parameters, assessment in updates))
+            updated = cursor.rowcount
+            self._write_values(cursor, updates)
+        return updated
+    
+    def clear_user_history(self, user_id):
+        """Delete a user's chat history and reports in one transaction."""
+        conn = self.connection()
+        with conn:
+            conn.execute('DELETE FROM chat_history WHERE user_id = ?', (user_id,))
+            conn.execute('''
+                DELETE FROM report_values
+                WHERE report_id IN (SELECT report_id FROM reports WHERE user_id = ?)
+            ''', (user_id,))
+            conn.execute('DELETE FROM reports WHERE user_id = ?', (user_id,))
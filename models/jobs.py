@@ -0,0 +1,102 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """State of one background pipeline run, reported through /jobs/<id>."""
+
+    def __init__(self, owner=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.status = 'pending'   # pending -> running -> done | error
+        self.stage = 'queued'
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.version = 0
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'error')
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': dict(self.progress),
+            'error': self.error,
+        }
+
+
+class JobManager:
+    """Runs pipeline functions on a thread pool and tracks their progress.
+
+    ``submit(fn, *args, owner=...)`` calls ``fn(job, *args)`` in the background; ``fn``
+    reports stages with ``update(job, stage=..., **progress)`` and its return
+    value becomes ``job.result``. Finished jobs are dropped after ``ttl``
+    seconds.
+    """
+
+    def __init__(self, workers=4, ttl=3600):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cbc-job')
+        self._jobs = {}
+        self._changed = threading.Condition()
+        self.ttl = ttl
+
+    def submit(self, fn, *args, owner=None):
+        job = Job(owner)
+        with self._changed:
+            self._sweep()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job, fn, args):
+        self.update(job, status='running')
+        try:
+            result = fn(job, *args)
+        except Exception as e:
+            logger.exception("Job %s failed", job.id)
+            self.update(job, status='error', error=str(e))
+        else:
+            job.result = result
+            self.update(job, status='done', stage='done')
+
+    def _sweep(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.updated_at < cutoff]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._changed:
+            return self._jobs.get(job_id)
+
+    def update(self, job, stage=None, status=None, error=None, **progress):
+        with self._changed:
+            if stage is not None:
+                job.stage = stage
+            if status is not None:
+                job.status = status
+            if error is not None:
+                job.error = error
+            job.progress.update(progress)
+            job.updated_at = time.time()
+            job.version += 1
+            self._changed.notify_all()
+
+    def wait_for_change(self, job, version, timeout=None):
+        """Block until ``job.version`` moves past ``version``; returns the new version."""
+        with self._changed:
+            self._changed.wait_for(lambda: job.version != version, timeout=timeout)
+            return job.version
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,319 @@
+import json
+import logging
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+
+from models.preload import freeze_weights
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "microsoft/biogpt"
+FALLBACK_MODEL = "distilgpt2"
+DEFAULT_ADDRESS = ("127.0.0.1", 8765)
+
+
+class LLMUnavailable(Exception):
+    pass
+
+
+def parse_address(address):
+    """'host:port' -> (host, port)."""
+    host, _, port = address.rpartition(":")
+    return host or DEFAULT_ADDRESS[0], int(port)
+
+
+class BatchedGenerator:
+    """One language model shared by every caller, run on batches of prompts.
+
+    ``submit`` queues a prompt and returns a ``Future`` for its completion.
+    A single worker thread takes the first waiting prompt, gathers whatever
+    else arrives within ``window`` seconds (up to ``max_batch``), and runs
+    them through one padded ``generate`` call under ``torch.inference_mode``
+    with greedy decoding. With ``quantize`` the model's Linear layers are
+    converted to int8 dynamic quantization for CPU. ``on_text(delta)``
+    receives a prompt's completion piece by piece as tokens are generated.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, fallback=FALLBACK_MODEL, quantize=True, threads=None,
+                 max_batch=8, window=0.02, max_new_tokens=96, max_input_tokens=512):
+        self.max_batch = max_batch
+        self.window = window
+        self.max_new_tokens = max_new_tokens
+        self.max_input_tokens = max_input_tokens
+        self.model_name, self.model, self.tokenizer = self._load(model_name, fallback, quantize, threads)
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._loop, name="llm-batcher", daemon=True)
+        self._worker.start()
+
+    @staticmethod
+    def _load(model_name, fallback, quantize, threads):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForCausalLM
+
+        if threads:
+            torch.set_num_threads(threads)
+        try:
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = AutoModelForCausalLM.from_pretrained(model_name)
+        except Exception as e:
+            if not fallback:
+                raise
+            logger.warning("Error loading %s: %s; falling back to %s", model_name, e, fallback)
+            model_name = fallback
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = AutoModelForCausalLM.from_pretrained(model_name)
+
+        freeze_weights(model)
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        # Decoder-only models continue from the right, so pad prompts on the left
+        tokenizer.padding_side = "left"
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        return model_name, model, tokenizer
+
+    def submit(self, prompt, max_new_tokens=None, on_text=None):
+        future = Future()
+        n = min(max_new_tokens or self.max_new_tokens, self.max_new_tokens)
+        self._queue.put((prompt, n, future, on_text))
+        return future
+
+    def generate(self, prompt, max_new_tokens=None, timeout=None):
+        return self.submit(prompt, max_new_tokens).result(timeout=timeout)
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join(timeout=5)
+
+    def _loop(self):
+        for first in iter(self._queue.get, None):
+            batch = [first]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self._run(batch)
+
+    def _run(self, batch):
+        import torch
+
+        live = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not live:
+            return
+        callbacks = [on_text for _, _, _, on_text in live]
+        try:
+            with torch.inference_mode():
+                encoded = self.tokenizer(
+                    [prompt for prompt, _, _, _ in live], return_tensors="pt", padding=True,
+                    truncation=True, max_length=self.max_input_tokens
+                )
+                output = self.model.generate(
+                    **encoded,
+                    max_new_tokens=max(n for _, n, _, _ in live),
+                    do_sample=False,
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    streamer=_BatchStreamer(self.tokenizer, callbacks) if any(callbacks) else None
+                )
+            texts = self.tokenizer.batch_decode(
+                output[:, encoded["input_ids"].shape[1]:], skip_special_tokens=True
+            )
+        except Exception as e:
+            for _, _, future, _ in live:
+                future.set_exception(e)
+            return
+        for (_, _, future, _), text in zip(live, texts):
+            future.set_result(text.strip())
+
+
+class _BatchStreamer:
+    """``generate`` streamer that splits each step's tokens out to per-prompt callbacks.
+
+    transformers' own streamers only handle a batch of one. Each row's tokens
+    are re-decoded as they arrive and only the new text is passed on; text
+    ending in a partial UTF-8 character waits for the next token.
+    """
+
+    def __init__(self, tokenizer, callbacks):
+        self.tokenizer = tokenizer
+        self.callbacks = callbacks
+        self.tokens = [[] for _ in callbacks]
+        self.sent = [0] * len(callbacks)
+        self.prompt_seen = False
+
+    def put(self, value):
+        # The first call carries the prompt ids
+        if not self.prompt_seen:
+            self.prompt_seen = True
+            return
+        for i, token in enumerate(value.reshape(len(self.callbacks), -1).tolist()):
+            callback = self.callbacks[i]
+            if callback is None:
+                continue
+            self.tokens[i].extend(token)
+            text = self.tokenizer.decode(self.tokens[i], skip_special_tokens=True).lstrip()
+            if text.endswith("\ufffd") or len(text) <= self.sent[i]:
+                continue
+            callback(text[self.sent[i]:])
+            self.sent[i] = len(text)
+
+    def end(self):
+        pass
+
+
+class _LLMRequestHandler(socketserver.StreamRequestHandler):
+    """Newline-delimited JSON: {"prompt", "max_new_tokens"} -> {"text"} or {"error"}.
+
+    With ``"stream": true`` the reply is any number of {"delta"} lines
+    followed by {"done": true, "text"} (or {"error"}). An optional
+    ``"timeout"`` (seconds, capped at the server's ``request_timeout``) is
+    how long the caller will wait; a prompt still queued by then is
+    cancelled rather than generated for nobody.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            future = None
+            try:
+                request = json.loads(line)
+                if request.get("stream"):
+                    self._stream(request)
+                    continue
+                future = self.server.generator.submit(request["prompt"], request.get("max_new_tokens"))
+                reply = {"text": future.result(timeout=self._timeout(request))}
+            except Exception as e:
+                if future is not None:
+                    future.cancel()
+                reply = {"error": f"{type(e).__name__}: {e}"}
+            self._send(reply)
+
+    def _timeout(self, request):
+        timeout = request.get("timeout")
+        if timeout is None:
+            return self.server.request_timeout
+        return min(float(timeout), self.server.request_timeout)
+
+    def _stream(self, request):
+        chunks = queue.Queue()
+        timeout = self._timeout(request)
+        future = self.server.generator.submit(request["prompt"], request.get("max_new_tokens"), on_text=chunks.put)
+        future.add_done_callback(lambda _: chunks.put(None))
+        try:
+            for delta in iter(lambda: chunks.get(timeout=timeout), None):
+                self._send({"delta": delta})
+            reply = {"done": True, "text": future.result(timeout=0)}
+        except queue.Empty:
+            future.cancel()
+            reply = {"error": "TimeoutError: generation timed out"}
+        except Exception as e:
+            # Includes the caller hanging up mid-stream
+            future.cancel()
+            reply = {"error": f"{type(e).__name__}: {e}"}
+        self._send(reply)
+
+    def _send(self, reply):
+        self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+class LLMServer(socketserver.ThreadingTCPServer):
+    """Local TCP front end for a ``BatchedGenerator``.
+
+    Each connection gets a thread that blocks on its own prompts, so
+    concurrent callers end up in the same generation batch.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, generator, address=DEFAULT_ADDRESS, request_timeout=60):
+        self.generator = generator
+        self.request_timeout = request_timeout
+        super().__init__(address, _LLMRequestHandler)
+
+
+class LLMClient:
+    """Talks to an ``LLMServer``; raises ``LLMUnavailable`` instead of waiting on a dead one.
+
+    After a refused or broken connection the server is skipped for
+    ``retry_after`` seconds, so a stopped service costs callers nothing
+    rather than a timeout each. A reply that takes longer than ``timeout``
+    only fails that request: the server is busy, not down, and is told the
+    same timeout so it drops the prompt if it has not started on it.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=5.0, retry_after=30.0):
+        self.address = parse_address(address) if isinstance(address, str) else tuple(address)
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._down_until = 0.0
+
+    def _open(self, request):
+        """Send one request; return (socket, reader) positioned at the reply."""
+        if time.monotonic() < self._down_until:
+            raise LLMUnavailable("language model server marked down")
+        try:
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+        except OSError as e:
+            self._down_until = time.monotonic() + self.retry_after
+            raise LLMUnavailable(str(e) or type(e).__name__)
+        try:
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            return sock, sock.makefile("rb")
+        except OSError as e:
+            sock.close()
+            self._down_until = time.monotonic() + self.retry_after
+            raise LLMUnavailable(str(e) or type(e).__name__)
+
+    def _read(self, reader):
+        try:
+            reply = json.loads(reader.readline())
+        except socket.timeout:
+            raise LLMUnavailable("language model server timed out")
+        except (OSError, ValueError) as e:
+            self._down_until = time.monotonic() + self.retry_after
+            raise LLMUnavailable(str(e) or type(e).__name__)
+        if "error" in reply:
+            raise LLMUnavailable(reply["error"])
+        return reply
+
+    def generate(self, prompt, max_new_tokens=None):
+        sock, reader = self._open({"prompt": prompt, "max_new_tokens": max_new_tokens, "timeout": self.timeout})
+        with sock, reader:
+            return self._read(reader)["text"]
+
+    def stream(self, prompt, max_new_tokens=None):
+        """Iterator of text pieces as the server generates them.
+
+        Waits for the first piece before returning, so an unavailable server
+        raises ``LLMUnavailable`` here; a failure mid-stream raises it from
+        the iterator.
+        """
+        sock, reader = self._open({"prompt": prompt, "max_new_tokens": max_new_tokens, "stream": True,
+                                   "timeout": self.timeout})
+        try:
+            first = self._read(reader)
+        except BaseException:
+            reader.close()
+            sock.close()
+            raise
+
+        def pieces(reply):
+            with sock, reader:
+                while "delta" in reply:
+                    yield reply["delta"]
+                    reply = self._read(reader)
+
+        return pieces(first)
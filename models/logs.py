@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Fields every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and ``extra`` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _SafeQueueHandler(QueueHandler):
+    """QueueHandler that never blocks the caller: records are dropped when the queue is full."""
+
+    def prepare(self, record):
+        # Same-process queue: leave message formatting to the listener thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+_debug_sample_rate = 0.0
+_listener = None
+
+
+def configure_logging(level="INFO", fmt="json", debug_sample_rate=0.0, stream=None, max_queue=10000):
+    """Route root logging through a background thread and return its ``QueueListener``.
+
+    Request threads only enqueue records; a listener thread formats and writes
+    them to ``stream`` (stderr by default) as JSON lines or plain text.
+    ``debug_sample_rate`` is the fraction of requests whose debug dumps are
+    kept (see ``sample_debug``). Call ``stop_logging()`` at exit to flush.
+
+    A process forked afterwards (``gunicorn --preload`` workers) gets its own
+    queue and listener thread, since the parent's thread does not survive
+    the fork.
+    """
+    global _debug_sample_rate, _listener
+    _debug_sample_rate = float(debug_sample_rate)
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if fmt == "json":
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    records = queue.Queue(maxsize=max_queue)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, QueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(_SafeQueueHandler(records))
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+
+    if _listener is None and hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_restart_in_child)
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def _restart_in_child():
+    global _listener
+    records = queue.Queue(maxsize=_listener.queue.maxsize)
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, _SafeQueueHandler):
+            handler.queue = records
+    # The stale listener is left as is: stopping it would wait on a thread that no longer exists
+    _listener = QueueListener(records, *_listener.handlers, respect_handler_level=_listener.respect_handler_level)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush queued records and stop this process's listener thread."""
+    if _listener is not None:
+        _listener.stop()
+
+
+def sample_debug(logger):
+    """True when ``logger`` has debug enabled and this call falls in the sample.
+
+    Guard expensive debug dumps with it so a disabled dump costs one level check.
+    """
+    return logger.isEnabledFor(logging.DEBUG) and random.random() < _debug_sample_rate
@@ -0,0 +1,199 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ContextDecorator
+
+# Latency buckets in seconds, from sub-millisecond parsing up to slow OCR runs
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _label_key(labelnames, labels):
+    if len(labels) != len(labelnames):
+        raise ValueError(f"expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    body = ",".join(
+        f'{name}="{value.replace(chr(92), chr(92) * 2).replace(chr(10), chr(92) + "n").replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in pairs
+    )
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        # Text format 0.0.4: HELP/TYPE must name the samples, which carry _total
+        self.exposed_name = name + "_total"
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.exposed_name, list(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """Cumulative-bucket distribution (e.g. seconds) per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.exposed_name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def time(self, **labels):
+        return timer(self, **labels)
+
+    def count(self, **labels):
+        series = self._series.get(_label_key(self.labelnames, labels))
+        return sum(series[:-1]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += n
+                yield self.name + "_bucket", labels + [("le", _format_value(float(bound)))], cumulative
+            yield self.name + "_sum", labels, series[-1]
+            yield self.name + "_count", labels, cumulative
+
+
+class Registry:
+    """Named metrics rendered together in the Prometheus text format.
+
+    Values live in this process only; run one registry per worker process.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.enabled = True
+
+    def _get(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"metric {name} already registered with a different type or labels")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.exposed_name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.exposed_name} {metric.kind}")
+            for sample, labels, value in metric.samples():
+                lines.append(f"{sample}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Metrics shared by app.py and the models package
+STAGE_SECONDS = REGISTRY.histogram(
+    "cbc_stage_duration_seconds", "Time spent in one pipeline stage", ["stage"])
+REQUEST_SECONDS = REGISTRY.histogram(
+    "cbc_http_request_duration_seconds", "Flask request handling time", ["route", "method", "status"])
+OCR_ENGINE = REGISTRY.counter(
+    "cbc_ocr_documents", "Documents OCR'd, by the engine that produced the text", ["engine"])
+CACHE_REQUESTS = REGISTRY.counter(
+    "cbc_cache_requests", "Cache lookups by cache and outcome", ["cache", "result"])
+
+
+class timer(ContextDecorator):
+    """Observe elapsed wall time into ``histogram`` as a context manager or decorator.
+
+        with timer(STAGE_SECONDS, stage="extract"):
+            ...
+
+        @timer(STAGE_SECONDS, stage="answer")
+        def generate(...): ...
+    """
+
+    __slots__ = ("histogram", "labels", "registry", "_start")
+
+    def __init__(self, histogram, registry=REGISTRY, **labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.registry = registry
+        self._start = None
+
+    def _recreate_cm(self):
+        # A fresh instance per decorated call keeps the decorator thread-safe
+        return timer(self.histogram, self.registry, **self.labels)
+
+    def __enter__(self):
+        if self.registry.enabled:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self._start is not None:
+            self.histogram.observe(time.perf_counter() - self._start, **self.labels)
+            self._start = None
+        return False
+
+
+def stage_timer(stage):
+    """Shorthand for ``timer(STAGE_SECONDS, stage=stage)``."""
+    return timer(STAGE_SECONDS, stage=stage)
+
+
+def count(counter, amount=1, **labels):
+    """Increment ``counter`` unless metrics are disabled."""
+    if REGISTRY.enabled:
+        counter.inc(amount, **labels)
@@ -0,0 +1,327 @@
+import logging
+import multiprocessing
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from importlib.util import find_spec
+from itertools import chain
+
+from models.metrics import OCR_ENGINE, count
+
+logger = logging.getLogger(__name__)
+
+
+def _installed(*modules):
+    return all(find_spec(m) is not None for m in modules)
+
+
+# OCR engines are detected without importing them (doctr pulls in torch);
+# each is imported the first time it is used
+DOCTR_AVAILABLE = _installed("doctr")
+PYTESSERACT_AVAILABLE = _installed("pytesseract", "PIL")
+PDF_SUPPORT = _installed("pdf2image")
+PDFIUM_AVAILABLE = _installed("pypdfium2")
+
+# Separator doctr puts between pages when rendering a whole document
+PAGE_BREAK = "\n\n\n\n"
+
+
+class OCRError(Exception):
+    pass
+
+# Bump when OCR preprocessing/rendering changes so cached OCR text is invalidated
+OCR_PIPELINE_VERSION = 1
+
+
+def ocr_engine_version():
+    """Identify the OCR engines in use, for stamping cached OCR output."""
+    parts = [f"pipeline-{OCR_PIPELINE_VERSION}"]
+    if DOCTR_AVAILABLE:
+        from importlib.metadata import version, PackageNotFoundError
+        try:
+            parts.append(f"doctr-{version('python-doctr')}")
+        except PackageNotFoundError:
+            parts.append("doctr")
+    if PYTESSERACT_AVAILABLE:
+        import pytesseract
+        try:
+            parts.append(f"tesseract-{pytesseract.get_tesseract_version()}")
+        except Exception:
+            parts.append("tesseract")
+    return ";".join(parts)
+
+
+# Initialize OCR model (lazy loading)
+ocr_model = None
+
+def get_ocr_model():
+    global ocr_model
+    if ocr_model is None and DOCTR_AVAILABLE:
+        from doctr.models import ocr_predictor
+        ocr_model = ocr_predictor(pretrained=True)
+    return ocr_model
+
+
+def extract_text_with_pytesseract(file_path, on_progress=None):
+    """Alternative OCR using pytesseract"""
+    if not PYTESSERACT_AVAILABLE:
+        return None, "pytesseract not available"
+    
+    try:
+        import pytesseract
+        from PIL import Image
+        if file_path.lower().endswith('.pdf'):
+            if not PDF_SUPPORT:
+                return None, "PDF support not available. Install pdf2image"
+            from pdf2image import convert_from_path
+            # Convert PDF to images
+            images = convert_from_path(file_path)
+            text = ""
+            for i, image in enumerate(images):
+                text += pytesseract.image_to_string(image) + "\n"
+                if on_progress:
+                    on_progress(i + 1, len(images))
+            return text, None
+        else:
+            # Process image
+            image = Image.open(file_path)
+            text = pytesseract.image_to_string(image)
+            return text, None
+    except Exception as e:
+        return None, str(e)
+
+
+def extract_text_from_file(file_path, on_progress=None):
+    """Extract text using available OCR method.
+
+    ``on_progress(pages_done, pages_total)`` is called as pages complete.
+    """
+    text, error, engine = _extract_text(file_path, on_progress)
+    if engine:
+        count(OCR_ENGINE, engine=engine)
+    return text, error
+
+
+def _extract_text(file_path, on_progress=None):
+    """``extract_text_from_file`` plus the name of the engine that produced the text."""
+    # Try doctr first (best quality)
+    if DOCTR_AVAILABLE:
+        try:
+            from doctr.io import DocumentFile
+            model = get_ocr_model()
+            if file_path.lower().endswith('.pdf'):
+                doc = DocumentFile.from_pdf(file_path)
+            else:
+                doc = DocumentFile.from_images(file_path)
+            
+            if on_progress:
+                on_progress(0, len(doc))
+            result = model(doc)
+            text = result.render()
+            if on_progress:
+                on_progress(len(doc), len(doc))
+            return text, None, "doctr"
+        except Exception as e:
+            logger.warning("doctr failed: %s, trying alternative...", e)
+    
+    # Fallback to pytesseract
+    if PYTESSERACT_AVAILABLE:
+        text, error = extract_text_with_pytesseract(file_path, on_progress)
+        return text, error, None if error else "pytesseract"
+    
+    # No OCR available
+    return None, "No OCR engine available. Please install: pip install python-doctr[torch] OR pip install pytesseract", None
+
+
+def _iter_pdf_pages_doctr(file_path, batch_size):
+    import pypdfium2 as pdfium
+    model = get_ocr_model()
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        total = len(pdf)
+        for start in range(0, total, batch_size):
+            # Rasterize only this batch (same settings as DocumentFile.from_pdf)
+            images = [
+                pdf[i].render(scale=2, rev_byteorder=True).to_numpy()
+                for i in range(start, min(start + batch_size, total))
+            ]
+            result = model(images)
+            for page in result.pages:
+                yield page.render(), total
+    finally:
+        pdf.close()
+
+
+def _ocr_pdf_page_tesseract(file_path, page_number):
+    import pytesseract
+    from pdf2image import convert_from_path
+    images = convert_from_path(file_path, first_page=page_number, last_page=page_number)
+    return "".join(pytesseract.image_to_string(image) + "\n" for image in images)
+
+
+def _iter_pdf_pages_tesseract(file_path, workers):
+    from pdf2image import pdfinfo_from_path
+    total = pdfinfo_from_path(file_path)["Pages"]
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [pool.submit(_ocr_pdf_page_tesseract, file_path, n) for n in range(1, total + 1)]
+        for future in futures:
+            yield future.result(), total
+    finally:
+        # Stopping early drops the pages nobody asked for yet
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_text_pages(file_path, on_progress=None, batch_size=4, workers=None):
+    """Yield OCR text one page at a time, in page order.
+
+    PDF pages are rasterized lazily and OCR'd in batches of ``batch_size``
+    with doctr, or across a ``workers``-process pool with pytesseract, so a
+    consumer that stops iterating early skips the remaining pages. Images
+    are a single page. As in ``extract_text_from_file``, a PDF that doctr
+    fails on before its first page is retried with pytesseract. Raises
+    ``OCRError`` when no engine can read the file.
+    """
+    if not file_path.lower().endswith('.pdf'):
+        text, error = extract_text_from_file(file_path, on_progress=on_progress)
+        if error:
+            raise OCRError(error)
+        yield text
+        return
+
+    engines = []
+    if DOCTR_AVAILABLE and PDFIUM_AVAILABLE:
+        engines.append(("doctr", lambda: _iter_pdf_pages_doctr(file_path, batch_size)))
+    if PYTESSERACT_AVAILABLE and PDF_SUPPORT:
+        engines.append(("pytesseract", lambda: _iter_pdf_pages_tesseract(file_path, workers)))
+    if not engines:
+        raise OCRError("No OCR engine available for PDFs. Please install: pip install python-doctr[torch] OR pip install pytesseract pdf2image")
+
+    # Pages already yielded can't be taken back, so only a failure before the
+    # first page moves on to the next engine
+    for i, (engine, open_pages) in enumerate(engines):
+        pages = open_pages()
+        try:
+            first = [next(pages)]
+        except StopIteration:
+            first = []
+        except Exception as e:
+            pages.close()
+            if i + 1 == len(engines):
+                raise OCRError(str(e))
+            logger.warning("%s failed: %s, trying alternative...", engine, e)
+            continue
+        break
+    count(OCR_ENGINE, engine=engine)
+
+    try:
+        for done, (text, total) in enumerate(chain(first, pages), start=1):
+            if on_progress:
+                on_progress(done, total)
+            yield text
+    except OCRError:
+        raise
+    except Exception as e:
+        raise OCRError(str(e))
+    finally:
+        pages.close()
+
+
+def _ocr_worker_main(jobs, results):
+    """Worker process loop: load the OCR model once, then serve jobs until sentinel."""
+    try:
+        get_ocr_model()
+    except Exception:
+        logger.exception("OCR worker failed to load model")
+    results.put((None, None, None, None))  # ready signal
+
+    for job_id, file_path in iter(jobs.get, None):
+        try:
+            text, error, engine = _extract_text(file_path)
+        except Exception as e:
+            text, error, engine = None, str(e), None
+        results.put((job_id, text, error, engine))
+
+
+class OCRWorkerPool:
+    """Long-lived OCR processes, each holding a warm model.
+
+    Jobs go through a shared queue; ``submit`` returns a job id whose
+    ``Future`` resolves to ``(text, error)`` like ``extract_text_from_file``.
+    Workers use the spawn start method by default, so each loads its own
+    model and torch state is never forked. After ``preload_models`` pass
+    ``start_method="fork"`` instead: workers then inherit the parent's model
+    and share its weights copy-on-write.
+    """
+
+    def __init__(self, workers=2, start_method="spawn"):
+        ctx = multiprocessing.get_context(start_method)
+        self._jobs = ctx.Queue()
+        self._results = ctx.Queue()
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Semaphore(0)
+        self._processes = [
+            ctx.Process(target=_ocr_worker_main, args=(self._jobs, self._results), daemon=True)
+            for _ in range(workers)
+        ]
+        for p in self._processes:
+            p.start()
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def _collect(self):
+        # Workers report the engine used; metrics are counted here, in the parent
+        for job_id, text, error, engine in iter(self._results.get, ("stop", None, None, None)):
+            if job_id is None:
+                self._ready.release()
+                continue
+            if engine:
+                count(OCR_ENGINE, engine=engine)
+            with self._lock:
+                future = self._futures.get(job_id)
+            # Jobs whose caller gave up waiting are no longer tracked; drop their results
+            if future is not None and not future.done():
+                future.set_result((text, error))
+
+    def wait_ready(self, timeout=None):
+        """Block until every worker has loaded its model."""
+        return all(self._ready.acquire(timeout=timeout) for _ in self._processes)
+
+    def submit(self, file_path):
+        job_id = uuid.uuid4().hex
+        future = Future()
+        with self._lock:
+            self._futures[job_id] = future
+        self._jobs.put((job_id, file_path))
+        return job_id
+
+    def status(self, job_id):
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is None:
+            return None
+        return 'done' if future.done() else 'pending'
+
+    def result(self, job_id, timeout=None):
+        """Wait for a job; returns (text, error). Raises TimeoutError if not done in time.
+
+        The job is forgotten either way, so it can only be waited on once.
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is None:
+            raise KeyError(job_id)
+        try:
+            return future.result(timeout=timeout)
+        finally:
+            with self._lock:
+                self._futures.pop(job_id, None)
+
+    def shutdown(self):
+        for _ in self._processes:
+            self._jobs.put(None)
+        for p in self._processes:
+            p.join(timeout=5)
+        self._results.put(("stop", None, None, None))
+        self._collector.join(timeout=5)
@@ -0,0 +1,85 @@
+import sqlite3
+import time
+
+from models.metrics import CACHE_REQUESTS, count
+
+
+class OCRCache:
+    """Content-addressed store of OCR output, keyed by file SHA-256.
+
+    Entries are stamped with the OCR engine version, so changing the engine
+    or model makes old text unreachable (and it is purged on startup). The
+    total stored text is bounded by ``max_bytes`` with least-recently-used
+    eviction.
+    """
+
+    def __init__(self, db_path='ocr_cache.db', engine_version='', max_bytes=256 * 1024 * 1024):
+        self.db_path = db_path
+        self.engine_version = engine_version
+        self.max_bytes = max_bytes
+        self.init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def init_db(self):
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ocr_cache (
+                digest TEXT NOT NULL,
+                engine_version TEXT NOT NULL,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (digest, engine_version)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_ocr_cache_last_used ON ocr_cache (last_used)')
+        # Entries from other engine versions can never be hit again
+        cursor.execute('DELETE FROM ocr_cache WHERE engine_version != ?', (self.engine_version,))
+        conn.commit()
+        conn.close()
+
+    def get(self, digest):
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT text FROM ocr_cache WHERE digest = ? AND engine_version = ?
+        ''', (digest, self.engine_version))
+        row = cursor.fetchone()
+        if row:
+            cursor.execute('''
+                UPDATE ocr_cache SET last_used = ? WHERE digest = ? AND engine_version = ?
+            ''', (time.time(), digest, self.engine_version))
+            conn.commit()
+        conn.close()
+        count(CACHE_REQUESTS, cache="ocr", result="hit" if row else "miss")
+        return row[0] if row else None
+
+    def put(self, digest, text):
+        size = len(text.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO ocr_cache (digest, engine_version, text, size, last_used)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (digest, self.engine_version, text, size, time.time()))
+
+        total = cursor.execute('SELECT COALESCE(SUM(size), 0) FROM ocr_cache').fetchone()[0]
+        if total > self.max_bytes:
+            # Walk from least recently used, dropping entries until under budget
+            excess = total - self.max_bytes
+            doomed = []
+            for old_digest, old_version, old_size in cursor.execute('''
+                SELECT digest, engine_version, size FROM ocr_cache ORDER BY last_used ASC
+            '''):
+                if excess <= 0:
+                    break
+                doomed.append((old_digest, old_version))
+                excess -= old_size
+            cursor.executemany('DELETE FROM ocr_cache WHERE digest = ? AND engine_version = ?', doomed)
+        conn.commit()
+        conn.close()
@@ -0,0 +1,116 @@
+import gc
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+_SMAPS_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared_clean",
+    "Shared_Dirty": "shared_dirty",
+    "Private_Clean": "private_clean",
+    "Private_Dirty": "private_dirty",
+}
+
+
+def freeze_weights(model):
+    """Put a torch module in eval mode with gradients off; other objects are left alone.
+
+    Frozen parameters are only ever read, so pages holding them stay shared
+    between processes forked after loading.
+    """
+    if hasattr(model, "parameters") and hasattr(model, "eval"):
+        model.eval()
+        for param in model.parameters():
+            param.requires_grad_(False)
+    return model
+
+
+def preload_models():
+    """Build the OCR model in this process so forked workers share it copy-on-write.
+
+    Call it in the parent before forking (``gunicorn --preload``, or before
+    ``OCRWorkerPool(start_method="fork")``). The model is built under
+    ``torch.inference_mode`` with frozen weights and no inference is run, so
+    torch has started no threads to lose across the fork. Afterwards every
+    live object is moved out of the garbage collector's reach (``gc.freeze``)
+    so collections in the workers never write to the shared pages.
+
+    BioGPT is not loaded here: it already runs once, in ``llm_server.py``.
+    Returns the names of the models that were loaded.
+    """
+    from models import ocr
+
+    loaded = []
+    if ocr.DOCTR_AVAILABLE:
+        import torch
+
+        with torch.inference_mode():
+            freeze_weights(ocr.get_ocr_model())
+        loaded.append("doctr")
+    gc.collect()
+    gc.freeze()
+    usage = memory_usage()
+    logger.info("Preloaded models: %s", ", ".join(loaded) or "none",
+                extra={"rss_mb": _mb(usage, "rss"), "pss_mb": _mb(usage, "pss")})
+    return loaded
+
+
+def memory_usage(pid="self"):
+    """RSS, PSS, shared and private bytes of a process, from /proc/<pid>/smaps_rollup.
+
+    PSS divides every shared page among the processes mapping it, so summing
+    PSS across the master and its workers gives their real footprint. Returns
+    None where /proc is unavailable (non-Linux, or the process has exited).
+    """
+    usage = dict.fromkeys(_SMAPS_FIELDS.values(), 0)
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        try:
+            # Kernels before 4.14: add up the per-mapping entries
+            with open(f"/proc/{pid}/smaps") as f:
+                lines = f.readlines()
+        except OSError:
+            return None
+    for line in lines:
+        field, _, rest = line.partition(":")
+        key = _SMAPS_FIELDS.get(field)
+        if key and rest.strip().endswith("kB"):
+            usage[key] += int(rest.split()[0]) * 1024
+    usage["shared"] = usage.pop("shared_clean") + usage.pop("shared_dirty")
+    usage["private"] = usage.pop("private_clean") + usage.pop("private_dirty")
+    return usage
+
+
+def child_pids(pid):
+    """Direct children of ``pid``, found by scanning /proc."""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name is parenthesised and may contain spaces; ppid follows it
+        if int(stat.rpartition(")")[2].split()[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def worker_memory(master_pid):
+    """``memory_usage`` for a master process and each of its direct children."""
+    report = []
+    for role, pid in [("master", master_pid)] + [("worker", p) for p in child_pids(master_pid)]:
+        usage = memory_usage(pid)
+        if usage is not None:
+            report.append(dict(usage, pid=pid, role=role))
+    return report
+
+
+def _mb(usage, key):
+    return round(usage[key] / 2 ** 20, 1) if usage else None
@@ -0,0 +1,386 @@
+import hashlib
+import os
+import threading
+import zlib
+from io import BytesIO
+
+from models.metrics import CACHE_REQUESTS, count
+
+# Bump when the PDF layout changes so cached reports are re-rendered
+TEMPLATE_VERSION = 1
+
+DISCLAIMER = (
+    "<b>DISCLAIMER:</b> This report is for informational purposes only and should not be used "
+    "as a substitute for professional medical advice, diagnosis, or treatment. Always consult "
+    "your healthcare provider regarding any medical condition."
+)
+
+# Paragraph and table styles, built once on first render (reportlab is imported lazily)
+_template = None
+_template_lock = threading.Lock()
+
+
+def _get_template():
+    global _template
+    if _template is None:
+        with _template_lock:
+            if _template is None:
+                from reportlab.lib import colors
+                from reportlab.lib.units import inch
+                from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+                from reportlab.platypus import TableStyle
+
+                styles = getSampleStyleSheet()
+                _template = {
+                    'title': ParagraphStyle(
+                        'CustomTitle',
+                        parent=styles['Heading1'],
+                        fontSize=24,
+                        textColor=colors.HexColor('#0d47a1'),
+                        spaceAfter=30,
+                        alignment=1  # Center
+                    ),
+                    'heading': styles['Heading2'],
+                    'normal': styles['Normal'],
+                    'table': TableStyle([
+                        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1976d2')),
+                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                        ('FONTSIZE', (0, 0), (-1, 0), 12),
+                        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+                        ('FONTSIZE', (0, 1), (-1, -1), 10),
+                    ]),
+                    'col_widths': [2.5 * inch, 1 * inch, 0.8 * inch, 1 * inch, 1.5 * inch],
+                    'inch': inch,
+                }
+    return _template
+
+
+def report_flowables(assessment, age=None, sex=None, report_date=None, name=None):
+    """Title, patient block, results table and disclaimer of one report, as platypus flowables."""
+    from reportlab.platypus import Table, Paragraph, Spacer
+
+    template = _get_template()
+    inch = template['inch']
+    elements = [Paragraph("CBC Lab Report Analysis", template['title']), Spacer(1, 0.3 * inch)]
+
+    info_text = f"""
+    <b>Patient Information</b><br/>
+    Name: {name or 'N/A'}<br/>
+    Age: {age if age is not None else 'N/A'}<br/>
+    Sex: {sex or 'N/A'}<br/>
+    Report Date: {report_date or 'N/A'}
+    """
+    elements.append(Paragraph(info_text, template['normal']))
+    elements.append(Spacer(1, 0.5 * inch))
+
+    table_data = [['Parameter', 'Value', 'Unit', 'Status', 'Reference Range']]
+    for param, data in assessment['assessed'].items():
+        if data['value'] is not None:
+            table_data.append([
+                param,
+                f"{data['value']:.2f}",
+                data['unit'],
+                data['status'],
+                data.get('range', 'N/A')
+            ])
+    table = Table(table_data, colWidths=template['col_widths'])
+    table.setStyle(template['table'])
+
+    elements.append(Paragraph("<b>CBC Parameters</b>", template['heading']))
+    elements.append(Spacer(1, 0.2 * inch))
+    elements.append(table)
+
+    elements.append(Spacer(1, 0.5 * inch))
+    elements.append(Paragraph(DISCLAIMER, template['normal']))
+    return elements
+
+
+def render_report_pdf(assessment, age=None, sex=None, report_date=None, name=None):
+    """PDF bytes of one report. Raises ImportError when reportlab is not installed."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    doc.build(report_flowables(assessment, age, sex, report_date, name))
+    return buffer.getvalue()
+
+
+def report_cache_key(report_id, fingerprint):
+    """Cache key of a rendered report: report id, assessment fingerprint and template version."""
+    raw = f"{report_id}:{fingerprint}:{TEMPLATE_VERSION}"
+    return f"v{TEMPLATE_VERSION}-{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+class ReportCache:
+    """Rendered PDFs on disk, one file per key, bounded by ``max_bytes``.
+
+    A hit refreshes the file's modification time; when a write pushes the
+    directory over budget the least recently used files are deleted. Files
+    from other template versions can never be hit again and are purged on
+    startup. Writes go through a temp file and ``os.replace``, so processes
+    sharing the directory never read a partial PDF.
+    """
+
+    def __init__(self, directory='pdf_cache', max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        for entry in os.scandir(directory):
+            if entry.is_file() and not entry.name.startswith(f"v{TEMPLATE_VERSION}-"):
+                self._remove(entry.path)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                pdf = f.read()
+            os.utime(path)
+        except OSError:
+            pdf = None
+        count(CACHE_REQUESTS, cache="pdf", result="hit" if pdf is not None else "miss")
+        return pdf
+
+    def put(self, key, pdf):
+        if len(pdf) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(pdf)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pdf'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        excess = sum(size for _, size, _ in files) - self.max_bytes
+        # Walk from least recently used, dropping files until under budget
+        for _, size, path in sorted(files):
+            if excess <= 0:
+                break
+            self._remove(path)
+            excess -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get_or_render(self, key, render):
+        """Cached PDF for ``key``, calling ``render()`` and storing its bytes on a miss."""
+        pdf = self.get(key)
+        if pdf is None:
+            pdf = render()
+            self.put(key, pdf)
+        return pdf
+
+
+
+# History export: written object by object so a patient's whole history streams
+# out with flat memory. platypus keeps every page until the document is saved,
+# so pages are drawn directly and only reportlab's font metrics are used.
+PAGE_WIDTH, PAGE_HEIGHT = 595.27, 841.89  # A4, points
+MARGIN = 56
+HISTORY_COLUMNS = ['Parameter', 'Value', 'Unit', 'Status', 'Reference Range']
+HISTORY_COL_WIDTHS = [180, 72, 57.6, 72, 108]  # the single-report table's widths
+ROW_HEIGHT = 18
+HEADER_HEIGHT = 24
+_TITLE_BLUE = (0.051, 0.278, 0.631)     # #0d47a1
+_HEADER_BLUE = (0.098, 0.463, 0.824)    # #1976d2
+_WHITESMOKE = (0.961, 0.961, 0.961)
+_BEIGE = (0.961, 0.961, 0.863)
+_ABNORMAL_RED = (0.776, 0.157, 0.157)   # #c62828
+
+
+def _pdf_string(text):
+    text = str(text).encode('cp1252', 'replace')
+    return b'(' + text.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+class _Page:
+    """Content-stream operators for one page, in Helvetica (no fonts embedded)."""
+
+    def __init__(self, string_width):
+        self.string_width = string_width
+        self.ops = []
+
+    def text(self, x, y, text, size=10, bold=False, color=(0, 0, 0), align='left'):
+        text = str(text)
+        font = 'Helvetica-Bold' if bold else 'Helvetica'
+        if align != 'left':
+            width = self.string_width(text, font, size)
+            x -= width / 2 if align == 'center' else width
+        self.ops.append(b'BT /%s %g Tf %g %g %g rg %.2f %.2f Td %s Tj ET' % (
+            b'F2' if bold else b'F1', size, *color, x, y, _pdf_string(text)))
+
+    def rect(self, x, y, width, height, fill=None):
+        if fill:
+            self.ops.append(b'%g %g %g rg %.2f %.2f %.2f %.2f re f' % (*fill, x, y, width, height))
+        self.ops.append(b'0 0 0 RG 0.5 w %.2f %.2f %.2f %.2f re S' % (x, y, width, height))
+
+    def fit(self, text, width, size=10, bold=False):
+        """``text`` cut down (with an ellipsis) to fit ``width`` points."""
+        text = str(text)
+        font = 'Helvetica-Bold' if bold else 'Helvetica'
+        if self.string_width(text, font, size) <= width:
+            return text
+        while text and self.string_width(text + '...', font, size) > width:
+            text = text[:-1]
+        return text + '...'
+
+    def wrap(self, text, width, size=10):
+        """Greedy word wrap of ``text`` into lines at most ``width`` points wide."""
+        lines, line = [], ''
+        for word in text.split():
+            candidate = f"{line} {word}".strip()
+            if line and self.string_width(candidate, 'Helvetica', size) > width:
+                lines.append(line)
+                candidate = word
+            line = candidate
+        return lines + [line] if line else lines
+
+    def content(self):
+        return zlib.compress(b'\n'.join(self.ops))
+
+
+def _history_pages(reports, total, title, string_width):
+    """Yield the compressed content stream of each page of a history export."""
+    table_width = sum(HISTORY_COL_WIDTHS)
+    left = (PAGE_WIDTH - table_width) / 2
+    bottom = MARGIN + 20  # room for the page number
+    number = 0
+    page = y = None
+
+    def new_page():
+        nonlocal number, page, y
+        number += 1
+        page = _Page(string_width)
+        page.text(PAGE_WIDTH / 2, MARGIN / 2, f"Page {number}", size=8, align='center')
+        y = PAGE_HEIGHT - MARGIN
+
+    def table_header():
+        nonlocal y
+        y -= HEADER_HEIGHT
+        x = left
+        for column, width in zip(HISTORY_COLUMNS, HISTORY_COL_WIDTHS):
+            page.rect(x, y, width, HEADER_HEIGHT, fill=_HEADER_BLUE)
+            page.text(x + width / 2, y + 8, column, size=11, bold=True, color=_WHITESMOKE, align='center')
+            x += width
+
+    for index, report in enumerate(reports, 1):
+        # Every report starts on a fresh page
+        if page is not None:
+            yield page.content()
+        new_page()
+        if index == 1:
+            page.text(PAGE_WIDTH / 2, y - 24, title, size=22, bold=True, color=_TITLE_BLUE, align='center')
+            y -= 54
+        heading = f"Report {index} of {total}" if total else f"Report {index}"
+        page.text(left, y - 16, heading, size=14, bold=True)
+        age = report.get('age')
+        page.text(left, y - 34, f"Date: {report.get('date') or 'N/A'}    "
+                                f"Age: {age if age is not None else 'N/A'}    Sex: {report.get('sex') or 'N/A'}")
+        y -= 46
+        table_header()
+
+        for param, data in report['assessment'].get('assessed', {}).items():
+            if data.get('value') is None:
+                continue
+            if y - ROW_HEIGHT < bottom:
+                yield page.content()
+                new_page()
+                page.text(left, y - 16, f"{heading} (continued)", size=12, bold=True)
+                y -= 24
+                table_header()
+            y -= ROW_HEIGHT
+            status = data.get('status', '')
+            cells = [param, f"{data['value']:.2f}", data.get('unit', ''), status, data.get('range', 'N/A')]
+            colors = [(0, 0, 0)] * len(cells)
+            if status in ('Low', 'High'):
+                colors[3] = _ABNORMAL_RED
+            x = left
+            for cell, width, color in zip(cells, HISTORY_COL_WIDTHS, colors):
+                page.rect(x, y, width, ROW_HEIGHT, fill=_BEIGE)
+                page.text(x + width / 2, y + 5, page.fit(cell, width - 6), color=color, align='center')
+                x += width
+
+    if page is None:
+        new_page()
+    lines = page.wrap(DISCLAIMER.replace('<b>', '').replace('</b>', ''), table_width, size=9)
+    if y - 30 - 12 * len(lines) < bottom:
+        yield page.content()
+        new_page()
+    y -= 30
+    for line in lines:
+        page.text(left, y, line, size=9)
+        y -= 12
+    yield page.content()
+
+
+def stream_history_pdf(reports, total=None, title="CBC Report History"):
+    """Yield a PDF of every report in ``reports`` as byte chunks, one page at a time.
+
+    ``reports`` is any iterable of dicts shaped like ``get_user_reports``
+    rows (``date``, ``age``, ``sex``, ``assessment``), e.g. a database
+    cursor; each report starts a new page and long tables continue on the
+    next. Objects are written as soon as their page is drawn and the page
+    tree and cross-reference table come last, so memory stays flat however
+    many reports there are. Raises ImportError (before the first chunk)
+    when reportlab is not installed.
+    """
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    offsets = {}
+    position = 0
+    page_ids = []
+    next_id = 5  # 1 catalog, 2 page tree (written last), 3-4 fonts
+
+    def obj(obj_id, body):
+        nonlocal position
+        offsets[obj_id] = position
+        chunk = b'%d 0 obj\n' % obj_id + body + b'\nendobj\n'
+        position += len(chunk)
+        return chunk
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position = len(header)
+    yield header + b''.join([
+        obj(1, b'<< /Type /Catalog /Pages 2 0 R >>'),
+        obj(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>'),
+        obj(4, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>'),
+    ])
+
+    for content in _history_pages(reports, total, title, stringWidth):
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        page_ids.append(page_id)
+        yield obj(content_id, b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(content)
+                  + content + b'\nendstream') + obj(page_id, (
+                      b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %g %g] '
+                      b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+                  ) % (PAGE_WIDTH, PAGE_HEIGHT, content_id))
+
+    kids = b' '.join(b'%d 0 R' % page_id for page_id in page_ids)
+    tail = obj(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(page_ids)))
+    xref = [b'xref\n0 %d\n' % next_id, b'0000000000 65535 f \n']
+    xref.extend(b'%010d 00000 n \n' % offsets[obj_id] for obj_id in range(1, next_id))
+    yield tail + b''.join(xref) + (
+        b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (next_id, position)
+    )
@@ -0,0 +1,164 @@
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+class SQLiteSessionStore:
+    """Session payloads in a SQLite table, shared by every worker process."""
+
+    def __init__(self, db_path='sessions.db', sweep_interval=300):
+        self.db_path = db_path
+        self.sweep_interval = sweep_interval
+        self.serializer = TaggedJSONSerializer()
+        self._next_sweep = 0
+        self.init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def init_db(self):
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS sessions (
+                sid TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                expires REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires)')
+        conn.commit()
+        conn.close()
+
+    def load(self, sid):
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT data FROM sessions WHERE sid = ? AND expires > ?', (sid, time.time())
+        ).fetchone()
+        conn.close()
+        return self.serializer.loads(row[0]) if row else None
+
+    def save(self, sid, data, lifetime):
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO sessions (sid, data, expires) VALUES (?, ?, ?)',
+            (sid, self.serializer.dumps(data), now + lifetime)
+        )
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            conn.execute('DELETE FROM sessions WHERE expires <= ?', (now,))
+        conn.commit()
+        conn.close()
+
+    def delete(self, sid):
+        conn = self._connect()
+        conn.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+        conn.commit()
+        conn.close()
+
+
+class MemorySessionStore:
+    """In-process LRU of session payloads (single-process deployments).
+
+    Payloads are kept as live objects, so there is no serialization cost;
+    the least recently used sessions are dropped beyond ``max_entries``.
+    """
+
+    def __init__(self, max_entries=10000, sweep_interval=300):
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._entries = OrderedDict()  # sid -> (expires, data)
+        self._lock = threading.Lock()
+        self._next_sweep = 0
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            expires, data = entry
+            if expires <= time.time():
+                del self._entries[sid]
+                return None
+            self._entries.move_to_end(sid)
+            return dict(data)
+
+    def save(self, sid, data, lifetime):
+        now = time.time()
+        with self._lock:
+            self._entries[sid] = (now + lifetime, dict(data))
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if now >= self._next_sweep:
+                self._next_sweep = now + self.sweep_interval
+                for expired in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+                    del self._entries[expired]
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keep session data in a store; the cookie only carries a random session id.
+
+    The store is written only when the session changes, so read-only
+    requests such as /ask cost one lookup and no write.
+    """
+
+    session_class = ServerSideSession
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.load(sid)
+            if data is not None:
+                return self.session_class(data, sid=sid)
+        return self.session_class(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.modified:
+            self.store.save(session.sid, dict(session), app.permanent_session_lifetime.total_seconds())
+
+        if session.new or (session.modified and session.permanent):
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
@@ -0,0 +1,84 @@
+SECONDS_PER_DAY = 86400
+
+
+def lttb(xs, ys, threshold):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps to draw ``(xs, ys)`` with ``threshold`` points.
+
+    The first and last points are always kept; in between, each bucket of
+    the series contributes the point forming the largest triangle with the
+    previous kept point and the next bucket's average, which preserves peaks
+    and troughs that plain striding would drop. ``xs`` must be ascending;
+    ``threshold`` is at least 3.
+    """
+    n = len(xs)
+    threshold = max(threshold, 3)
+    if threshold >= n:
+        return list(range(n))
+
+    every = (n - 2) / (threshold - 2)
+    kept = [0]
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the triangle's third corner
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+    kept.append(n - 1)
+    return kept
+
+
+def _compact(value):
+    """A float cut to 6 significant digits, so JSON payloads stay small."""
+    return None if value is None else float(f"{value:.6g}")
+
+
+def build_trends(columns, windows, points=60):
+    """Columnar, chart-ready trends from ``get_parameter_columns`` and ``get_parameter_windows``.
+
+    Per parameter: unit, reference ``low``/``high``, the number of readings,
+    ``points`` -- the history downsampled to at most ``points`` readings with
+    LTTB, as parallel ``t`` (Unix seconds), ``value``, ``status`` and
+    ``report_id`` arrays -- and ``windows``, the windowed aggregates as
+    parallel arrays (``slope`` in units per day).
+    """
+    trends = {}
+    for param, column in columns.items():
+        days = column['day']
+        kept = lttb(days, column['value'], points)
+        aggregates = windows.get(param, [])
+        trends[param] = {
+            'unit': column['unit'],
+            'low': column['low'],
+            'high': column['high'],
+            'count': len(days),
+            'points': {
+                't': [round(days[i] * SECONDS_PER_DAY) for i in kept],
+                'value': [_compact(column['value'][i]) for i in kept],
+                'status': [column['status'][i] for i in kept],
+                'report_id': [column['report_id'][i] for i in kept],
+            },
+            'windows': {
+                'start': [round(w['start'] * SECONDS_PER_DAY) for w in aggregates],
+                'end': [round(w['end'] * SECONDS_PER_DAY) for w in aggregates],
+                'count': [w['count'] for w in aggregates],
+                'mean': [_compact(w['mean']) for w in aggregates],
+                'min': [_compact(w['min']) for w in aggregates],
+                'max': [_compact(w['max']) for w in aggregates],
+                'slope': [_compact(w['slope']) for w in aggregates],
+                'abnormal': [w['abnormal'] for w in aggregates],
+            },
+        }
+    return trends
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Re-parse every stored report with the current CBC parser.
+
+Reads ``reports.raw_text`` from the database, runs it through
+``extract_cbc_many`` on a process pool, re-assesses the result with the
+report's stored range profile and writes the new ``parameters``/``assessment``
+JSON back in bulk transactions. Reports whose profile is not registered are
+left unchanged.
+
+    python reparse_reports.py --db cbc_reports.db --workers 4
+"""
+import argparse
+import logging
+import os
+import time
+from collections import deque
+
+from models.cbc_parser import (extract_cbc_many, assess_cbc, load_range_profiles,
+                               ENGINES, DEFAULT_ENGINE, DEFAULT_PROFILE)
+from models.database import CBCDatabase
+
+logger = logging.getLogger(__name__)
+
+
+def reparse(db, workers=None, chunk_size=64, batch_size=500, engine=None):
+    """Re-parse every stored report; returns (reports updated, reports skipped)."""
+    meta = deque()
+
+    def texts():
+        for report_id, age, sex, raw_text, lab_profile in db.iter_report_texts(batch_size):
+            meta.append((report_id, age, sex, lab_profile))
+            yield raw_text or ""
+
+    total = 0
+    skipped = 0
+    updates = []
+    for cbc_data in extract_cbc_many(texts(), workers=workers, chunk_size=chunk_size, engine=engine):
+        report_id, age, sex, lab_profile = meta.popleft()
+        age = age if age is not None else cbc_data.get('Age')
+        sex = sex or cbc_data.get('Sex')
+        try:
+            assessment = assess_cbc(cbc_data['Parameters'], age=age, sex=sex,
+                                    profile=lab_profile or DEFAULT_PROFILE)
+        except ValueError as e:
+            logger.warning("report %d skipped: %s", report_id, e)
+            skipped += 1
+            continue
+        updates.append((report_id, cbc_data['Parameters'], assessment))
+
+        if len(updates) >= batch_size:
+            total += db.update_report_results(updates)
+            updates = []
+
+    if updates:
+        total += db.update_report_results(updates)
+    return total, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-parse all stored CBC reports")
+    parser.add_argument('--db', default='cbc_reports.db', help="SQLite database path")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes (default: CPU count, 0 = in-process)")
+    parser.add_argument('--chunk-size', type=int, default=64, help="Texts per worker task")
+    parser.add_argument('--batch-size', type=int, default=500, help="Rows per read/write transaction")
+    parser.add_argument('--engine', choices=sorted(ENGINES), default=DEFAULT_ENGINE,
+                        help="Extraction engine")
+    parser.add_argument('--range-profiles', default=os.environ.get('CBC_RANGE_PROFILES', 'range_profiles.json'),
+                        help="JSON file of lab range profiles")
+    args = parser.parse_args()
+
+    if os.path.exists(args.range_profiles):
+        load_range_profiles(args.range_profiles)
+
+    db = CBCDatabase(args.db)
+    start = time.perf_counter()
+    count, skipped = reparse(db, workers=args.workers, chunk_size=args.chunk_size,
+                    batch_size=args.batch_size, engine=args.engine)
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"Re-parsed {count} reports in {elapsed:.2f}s ({rate:.1f} reports/sec)")
+    if skipped:
+        print(f"Skipped {skipped} reports with an unknown range profile (see warnings above)")
+
+
+if __name__ == '__main__':
+    main()
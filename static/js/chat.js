@@ -104,7 +104,7 @@ async function handleFileUpload(event) {
 
         if (data.success) {
             hideLoading();
-            showAnalysis();
+            trackAnalysisJob(data.job_id);
         } else {
             hideLoading();
             alert('Error: ' + (data.error || 'Upload failed'));
@@ -115,6 +115,81 @@ async function handleFileUpload(event) {
     }
 }
 
+// Stage of a background upload job -> [step index, status text]
+const JOB_STAGES = {
+    queued: [0, 'Waiting for a free worker...'],
+    ocr: [0, 'Extracting text from report...'],
+    extract: [1, 'Detecting parameters...'],
+    assess: [2, 'Analyzing results...'],
+    save: [2, 'Saving report...'],
+    done: [2, 'Analysis complete']
+};
+
+// Show live progress of a background upload job, then load its result
+function trackAnalysisJob(jobId) {
+    document.getElementById('uploadSection').style.display = 'none';
+    document.getElementById('analysisSection').style.display = 'flex';
+
+    const finish = async () => {
+        try {
+            const response = await fetch(`/jobs/${jobId}`);
+            handleAnalysisResult(await response.json());
+        } catch (error) {
+            alert('Error: ' + error.message);
+            newChat();
+        }
+    };
+
+    if (window.EventSource) {
+        const source = new EventSource(`/jobs/${jobId}/events`);
+        source.onmessage = (event) => {
+            const job = JSON.parse(event.data);
+            showJobProgress(job);
+            if (job.status === 'done' || job.status === 'error') {
+                source.close();
+                finish();
+            }
+        };
+        source.onerror = () => {
+            source.close();
+            pollAnalysisJob(jobId, finish);
+        };
+    } else {
+        pollAnalysisJob(jobId, finish);
+    }
+}
+
+// Fallback when Server-Sent Events are unavailable
+async function pollAnalysisJob(jobId, finish) {
+    while (true) {
+        const response = await fetch(`/jobs/${jobId}`);
+        const job = await response.json();
+        if (!response.ok || job.status === 'done' || job.status === 'error') {
+            finish();
+            return;
+        }
+        showJobProgress(job);
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
+function showJobProgress(job) {
+    const steps = ['step1', 'step2', 'step3'];
+    const [stepIndex, statusMessage] = JOB_STAGES[job.stage] || JOB_STAGES.queued;
+    let message = statusMessage;
+
+    const progress = job.progress || {};
+    if (job.stage === 'ocr' && progress.pages_total) {
+        message += ` (page ${progress.pages_done} of ${progress.pages_total})`;
+    }
+
+    for (let i = 0; i <= stepIndex; i++) {
+        document.getElementById(steps[i]).classList.add('active');
+    }
+    document.getElementById('analysisStatus').textContent = message;
+    document.getElementById('progressBar').style.width = ((stepIndex + 1) / steps.length * 100) + '%';
+}
+
 // Submit manual text
 async function submitText() {
     const text = document.getElementById('manualText').value.trim();
@@ -192,36 +267,39 @@ async function analyzeReport() {
             body: JSON.stringify({})
         });
 
-        const data = await response.json();
-
-        if (data.success) {
-            currentReportId = data.report_id;
-            
-            // Update current report display
-            document.getElementById('reportAge').textContent = data.age || 'N/A';
-            document.getElementById('reportSex').textContent = data.sex || 'N/A';
-            
-            // Show current report section
-            document.getElementById('currentReport').style.display = 'block';
-            
-            // Update summary stats
-            updateSummaryStats(data.results);
-            
-            // Show chat section
-            showChat();
-            
-            // Reload history
-            loadHistory();
-        } else {
-            alert('Error analyzing report: ' + (data.error || 'Unknown error'));
-            newChat();
-        }
+        handleAnalysisResult(await response.json());
     } catch (error) {
         alert('Error: ' + error.message);
         newChat();
     }
 }
 
+// Show an analysis returned by /analyze or a finished /jobs/<id>
+function handleAnalysisResult(data) {
+    if (data.success) {
+        currentReportId = data.report_id;
+        
+        // Update current report display
+        document.getElementById('reportAge').textContent = data.age || 'N/A';
+        document.getElementById('reportSex').textContent = data.sex || 'N/A';
+        
+        // Show current report section
+        document.getElementById('currentReport').style.display = 'block';
+        
+        // Update summary stats
+        updateSummaryStats(data.results);
+        
+        // Show chat section
+        showChat();
+        
+        // Reload history
+        loadHistory();
+    } else {
+        alert('Error analyzing report: ' + (data.error || 'Unknown error'));
+        newChat();
+    }
+}
+
 // Update summary stats
 function updateSummaryStats(results) {
     const summaryStats = document.getElementById('summaryStats');
@@ -274,12 +352,35 @@ async function sendMessage() {
     showTypingIndicator();
     
     try {
+        const body = JSON.stringify({ question: message });
+        
+        // Stream the answer when the browser can read a response body incrementally
+        if (window.ReadableStream && window.TextDecoder) {
+            const response = await fetch('/ask/stream', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: body
+            });
+            
+            if ((response.headers.get('Content-Type') || '').startsWith('text/event-stream')) {
+                await renderAnswerStream(response);
+                return;
+            }
+            
+            removeTypingIndicator();
+            const data = await response.json();
+            addMessage('Sorry, I encountered an error: ' + (data.error || 'Unknown error'), 'assistant');
+            return;
+        }
+        
         const response = await fetch('/ask', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({ question: message })
+            body: body
         });
         
         const data = await response.json();
@@ -300,6 +401,41 @@ async function sendMessage() {
     }
 }
 
+// Render a /ask/stream response as its Server-Sent Events arrive
+async function renderAnswerStream(response) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const messagesContainer = document.getElementById('chatMessages');
+    let textP = null;
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Events are separated by a blank line; keep any partial event for the next read
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const event of events) {
+            if (!event.startsWith('data: ')) continue;
+            const payload = JSON.parse(event.slice(6));
+            if (payload.delta === undefined) continue;
+            if (!textP) {
+                removeTypingIndicator();
+                textP = addMessage('', 'assistant');
+            }
+            textP.textContent += payload.delta;
+            messagesContainer.scrollTop = messagesContainer.scrollHeight;
+        }
+    }
+    
+    if (!textP) {
+        removeTypingIndicator();
+        addMessage('Sorry, I encountered an error: No response received', 'assistant');
+    }
+}
+
 // Ask predefined question
 function askQuestion(question) {
     document.getElementById('messageInput').value = question;
@@ -331,6 +467,8 @@ function addMessage(text, role) {
     
     // Scroll to bottom
     messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    
+    return textP;
 }
 
 // Show typing indicator
@@ -461,58 +599,9 @@ function closeModal() {
     document.getElementById('resultsModal').style.display = 'none';
 }
 
-// Show trends
-async function showTrends() {
-    try {
-        const response = await fetch('/trends');
-        const data = await response.json();
-        
-        const modal = document.getElementById('trendsModal');
-        const content = document.getElementById('trendsContent');
-        
-        if (data.message) {
-            content.innerHTML = `
-                <div class="no-trends">
-                    <i class="fas fa-chart-line"></i>
-                    <p>${data.message}</p>
-                </div>
-            `;
-        } else if (data.trends) {
-            let html = '';
-            
-            for (const [param, values] of Object.entries(data.trends)) {
-                if (values.length > 0) {
-                    html += `
-                        <div class="trend-chart">
-                            <h3>${param}</h3>
-                            <div style="margin-top: 16px;">
-                    `;
-                    
-                    values.forEach((item, index) => {
-                        const date = new Date(item.date).toLocaleDateString();
-                        html += `
-                            <div style="display: flex; justify-content: space-between; padding: 8px 0; border-bottom: 1px solid var(--border-color);">
-                                <span>${date}</span>
-                                <span><strong>${item.value.toFixed(2)}</strong></span>
-                                <span class="status-badge ${item.status.toLowerCase()}">${item.status}</span>
-                            </div>
-                        `;
-                    });
-                    
-                    html += `
-                            </div>
-                        </div>
-                    `;
-                }
-            }
-            
-            content.innerHTML = html || '<div class="no-trends"><p>No trend data available</p></div>';
-        }
-        
-        modal.style.display = 'flex';
-    } catch (error) {
-        alert('Error loading trends: ' + error.message);
-    }
+// Show trends for the key parameters
+function showTrends() {
+    loadTrendCharts(['HEMOGLOBIN', 'TOTAL LEUKOCYTE COUNT', 'PLATELET COUNT']);
 }
 
 // Close trends modal
@@ -979,60 +1068,138 @@ function displayCorrelations(correlations) {
     }
 }
 
-// Show all trends (fixed version)
-async function showAllTrends() {
+// Show all trends
+function showAllTrends() {
+    loadTrendCharts(null);
+}
+
+let trendCharts = [];
+
+// Full-history trends from /trends/series: the server downsamples each
+// parameter to a few dozen points and sends windowed aggregates alongside
+async function loadTrendCharts(parameters) {
     try {
-        const response = await fetch('/get_all_trends');
+        let url = '/trends/series?points=60&windows=12';
+        if (parameters) {
+            url += '&parameters=' + encodeURIComponent(parameters.join(','));
+        }
+        const response = await fetch(url);
         const data = await response.json();
         
         const modal = document.getElementById('trendsModal');
         const content = document.getElementById('trendsContent');
+        trendCharts.forEach(chart => chart.destroy());
+        trendCharts = [];
         
-        if (data.message) {
+        if (data.message || !data.trends || Object.keys(data.trends).length === 0) {
             content.innerHTML = `
                 <div class="no-trends">
                     <i class="fas fa-chart-line"></i>
-                    <p>${data.message}</p>
+                    <p>${data.message || 'No trend data available'}</p>
                 </div>
             `;
-        } else if (data.trends) {
-            let html = '';
-            
-            for (const [param, values] of Object.entries(data.trends)) {
-                if (values.length > 0) {
-                    html += `
-                        <div class="trend-chart">
-                            <h3>${param}</h3>
-                            <div style="margin-top: 16px;">
-                    `;
-                    
-                    values.forEach((item, index) => {
-                        const date = new Date(item.date).toLocaleDateString();
-                        html += `
-                            <div class="trend-item">
-                                <span class="trend-date">${date}</span>
-                                <span class="trend-value">${item.value.toFixed(2)} ${item.unit || ''}</span>
-                                <span class="status-badge ${item.status ? item.status.toLowerCase() : 'normal'}">${item.status || 'N/A'}</span>
-                            </div>
-                        `;
-                    });
-                    
-                    html += `
-                            </div>
-                        </div>
-                    `;
-                }
-            }
-            
-            content.innerHTML = html || '<div class="no-trends"><p>No trend data available</p></div>';
+            modal.style.display = 'flex';
+            return;
         }
         
+        const entries = Object.entries(data.trends);
+        content.innerHTML = entries.map(([param, trend], index) => `
+            <div class="trend-chart">
+                <h3>${param}</h3>
+                <p class="trend-summary">${trendSummary(trend)}</p>
+                <div style="position: relative; height: 220px; margin-top: 12px;">
+                    <canvas id="trendCanvas${index}"></canvas>
+                </div>
+            </div>
+        `).join('');
         modal.style.display = 'flex';
+        
+        entries.forEach(([param, trend], index) => {
+            const ctx = document.getElementById(`trendCanvas${index}`).getContext('2d');
+            trendCharts.push(new Chart(ctx, trendChartConfig(trend)));
+        });
     } catch (error) {
         alert('Error loading trends: ' + error.message);
     }
 }
 
+function trendSummary(trend) {
+    const points = trend.points;
+    const last = points.value.length - 1;
+    const windows = trend.windows;
+    const abnormal = windows.abnormal.reduce((a, b) => a + b, 0);
+    let summary = `${trend.count} readings · latest ${points.value[last].toFixed(2)} ${trend.unit || ''} (${points.status[last] || 'N/A'})`;
+    summary += ` · ${abnormal} outside range`;
+    const slope = windows.slope[windows.slope.length - 1];
+    if (slope !== null && slope !== undefined) {
+        const perMonth = slope * 30;
+        summary += ` · recent trend ${perMonth >= 0 ? '+' : ''}${perMonth.toPrecision(3)} ${trend.unit || ''}/month`;
+    }
+    return summary;
+}
+
+function trendChartConfig(trend) {
+    const points = trend.points;
+    const windows = trend.windows;
+    const readings = points.t.map((t, i) => ({ x: t * 1000, y: points.value[i] }));
+    const means = windows.start.map((start, i) => ({ x: (start + windows.end[i]) * 500, y: windows.mean[i] }));
+    const first = readings[0].x;
+    const last = readings[readings.length - 1].x;
+    const datasets = [
+        {
+            label: 'Readings',
+            data: readings,
+            borderColor: '#00788d',
+            pointBackgroundColor: points.status.map(status =>
+                status === 'Low' ? '#ffb74d' : status === 'High' ? '#e5534b' : '#3a9d4c'
+            ),
+            pointRadius: 3,
+            tension: 0.2
+        },
+        {
+            label: 'Window mean',
+            data: means,
+            borderColor: '#1c2b3a',
+            borderDash: [6, 4],
+            pointRadius: 0
+        }
+    ];
+    if (trend.low !== null && trend.high !== null) {
+        [['Low limit', trend.low], ['High limit', trend.high]].forEach(([label, value]) => {
+            datasets.push({
+                label: label,
+                data: [{ x: first, y: value }, { x: last, y: value }],
+                borderColor: '#9e9e9e',
+                borderWidth: 1,
+                borderDash: [2, 2],
+                pointRadius: 0
+            });
+        });
+    }
+    return {
+        type: 'line',
+        data: { datasets: datasets },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            parsing: false,
+            scales: {
+                x: {
+                    type: 'linear',
+                    ticks: { callback: value => new Date(value).toLocaleDateString() }
+                }
+            },
+            plugins: {
+                tooltip: {
+                    callbacks: {
+                        title: items => new Date(items[0].parsed.x).toLocaleDateString()
+                    }
+                }
+            }
+        }
+    };
+}
+
 // Clear history
 async function clearHistory() {
     if (confirm('Are you sure you want to clear all your history? This action cannot be undone.')) {
@@ -1085,6 +1252,12 @@ async function downloadReport() {
     }
 }
 
+// Download every report as one PDF. The server streams it page by page, so
+// let the browser save it directly instead of buffering it in a blob
+function downloadHistoryReport() {
+    window.location.href = '/download_history_report';
+}
+
 // Add to your chat.js
 function toggleHistory() {
     const historyContent = document.getElementById('historyContent');
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+
+from models.answer_cache import AnswerCache, assessment_fingerprint, normalize_question
+from models.cbc_parser import assess_cbc
+
+
+class AnswerCacheTest(unittest.TestCase):
+    def test_hit_until_expired(self):
+        cache = AnswerCache(ttl=60)
+        cache.put(('q', 'f'), 'answer')
+        self.assertEqual(cache.get(('q', 'f')), 'answer')
+
+        expired = AnswerCache(ttl=0)
+        expired.put(('q', 'f'), 'answer')
+        self.assertIsNone(expired.get(('q', 'f')))
+        self.assertEqual(len(expired), 0)
+
+    def test_evicts_least_recently_used(self):
+        cache = AnswerCache(max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+
+    def test_disabled(self):
+        cache = AnswerCache(max_entries=0)
+        cache.put('a', 1)
+        self.assertIsNone(cache.get('a'))
+
+    def test_fingerprint_follows_assessment_and_patient(self):
+        cbc_data = {'Parameters': {'HEMOGLOBIN': 10.0}, 'Age': 40, 'Sex': 'Female'}
+        assessment = assess_cbc(cbc_data['Parameters'], age=40, sex='Female')
+        fingerprint = assessment_fingerprint(assessment, cbc_data)
+        self.assertEqual(fingerprint, assessment_fingerprint(assess_cbc({'HEMOGLOBIN': 10.0}, age=40, sex='Female'),
+                                                             dict(cbc_data)))
+        self.assertNotEqual(fingerprint, assessment_fingerprint(assess_cbc({'HEMOGLOBIN': 15.0}, age=40, sex='Female'),
+                                                                cbc_data))
+        self.assertNotEqual(fingerprint, assessment_fingerprint(assessment, dict(cbc_data, Age=41)))
+        self.assertEqual(normalize_question('  What is my HB? '), 'what is my hb?')
+
+
+class UpdateParameterTest(unittest.TestCase):
+    """/update_parameter changes the fingerprint, so /ask stops serving the old answer"""
+
+    @classmethod
+    def setUpClass(cls):
+        # app.py creates its databases and folders in the working directory on import
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.cwd = os.getcwd()
+        os.chdir(cls.tmp.name)
+        cls.backend = os.environ.get('CBC_SESSION_BACKEND')
+        os.environ['CBC_SESSION_BACKEND'] = 'memory'
+        import app
+        cls.app = app
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.cwd)
+        if cls.backend is None:
+            os.environ.pop('CBC_SESSION_BACKEND', None)
+        else:
+            os.environ['CBC_SESSION_BACKEND'] = cls.backend
+        cls.app.db.close()
+        cls.tmp.cleanup()
+
+    def test_update_parameter_invalidates_answers(self):
+        client = self.app.app.test_client()
+        cbc_data = {'Parameters': {'HEMOGLOBIN': 10.0}, 'Raw_Parameters': {}, 'Ranges': {},
+                    'Age': 40, 'Sex': 'Female'}
+        with client.session_transaction() as session:
+            session['cbc_data'] = cbc_data
+            session['assessment'] = assess_cbc(cbc_data['Parameters'], age=40, sex='Female')
+            session['age'], session['sex'] = 40, 'Female'
+
+        question = {'question': 'What is my hemoglobin level?'}
+        before = client.post('/ask', json=question).get_json()['response']
+        self.assertEqual(client.post('/ask', json=question).get_json()['response'], before)
+        self.assertIn('10', before)
+
+        reply = client.post('/update_parameter', json={'parameter': 'HEMOGLOBIN', 'value': 15.5})
+        self.assertTrue(reply.get_json()['success'])
+        after = client.post('/ask', json=question).get_json()['response']
+        self.assertNotEqual(after, before)
+        self.assertIn('15.5', after)
+
+
+if __name__ == '__main__':
+    unittest.main()
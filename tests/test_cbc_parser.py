@@ -0,0 +1,69 @@
+import random
+import unittest
+
+from benchmarks.synthetic import generate_corpus
+from models.cbc_parser import collect_cbc_text, extract_cbc_clean
+
+PAGE_BREAK = "\n\n\n\n"
+TRAILER = "\n".join([
+    "Interpretation", "Results relate only to the sample as received.",
+    "Values should be correlated clinically.", "Sample quality: adequate",
+    "Method: automated cell counter", "Verified by: Dr. A. Rao, MD Pathology",
+    "This is a computer generated report.", "Page end",
+])
+
+
+def _pages(text, rng):
+    """A report split into pages at random lines, followed by a trailer page"""
+    lines = text.split("\n")
+    cuts = sorted(rng.sample(range(1, len(lines)), 2))
+    pages = ["\n".join(lines[a:b]) for a, b in zip([0] + cuts, cuts + [len(lines)])]
+    return pages + [TRAILER]
+
+
+class CollectCbcTextTest(unittest.TestCase):
+    def assertSameExtraction(self, pages):
+        collected, stopped_early = collect_cbc_text(pages, page_break=PAGE_BREAK)
+        self.assertEqual(extract_cbc_clean(collected), extract_cbc_clean(PAGE_BREAK.join(pages)))
+        return stopped_early
+
+    def test_matches_full_text(self):
+        rng = random.Random(0)
+        stops = 0
+        for text, _ in generate_corpus(400, seed=1):
+            stops += self.assertSameExtraction(_pages(text, rng))
+        self.assertGreater(stops, 0)
+
+    def test_later_age_gender_line_wins(self):
+        rng = random.Random(0)
+        for text, _ in generate_corpus(200, seed=2):
+            # "Age/Gender" beats separate Age and Sex lines earlier in the document
+            pages = _pages(text.replace("Age/Gender", "Age"), rng)
+            pages.insert(-1, "Age/Gender: 7/F")
+            self.assertSameExtraction(pages)
+
+    def test_stops_without_optional_parameters(self):
+        text = "\n".join([
+            "City Diagnostics", "Age/Gender: 34/F", "COMPLETE BLOOD COUNT",
+            "Hemoglobin 11.2 g/dL 12 - 16", "Total Leukocyte Count 7.2 10^3/uL 4 - 11",
+            "Total RBC Count 4.1 million/cumm 4.5 - 5.5", "Platelet Count 2.1 Lacs 1.5 - 4.5",
+            "PCV 36 % 40 - 50", "MCV 82 fL 83 - 101", "MCH 27.3 pg 27 - 32", "MCHC 31 g/dL 31.5 - 34.5",
+            "Neutrophils 60 % 40 - 80", "Lymphocytes 30 % 20 - 40", "Monocytes 6 % 2 - 10",
+            "Eosinophils 3 % 1 - 6", "Basophils 1 % 0 - 2", "", "*** End of Report ***",
+        ])
+        read = []
+
+        def pages():
+            for page in [text, TRAILER, TRAILER]:
+                read.append(page)
+                yield page
+
+        collected, stopped_early = collect_cbc_text(pages(), page_break=PAGE_BREAK)
+        self.assertTrue(stopped_early)
+        self.assertEqual(read, [text, TRAILER])
+        self.assertEqual(extract_cbc_clean(collected),
+                         extract_cbc_clean(PAGE_BREAK.join([text, TRAILER, TRAILER])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import random
+import unittest
+
+from models.cbc_parser import PARAM_PATTERNS, REFERENCE_RANGES
+from models.chat_intents import (IntentMatcher, PhraseAutomaton, CONCERN_PHRASES, HEALTH_CHECK_PHRASES,
+                                 RULE_INTENTS, PARAM_ALIASES)
+
+INTENTS = dict(concern=CONCERN_PHRASES, health_check=HEALTH_CHECK_PHRASES,
+               casual=["hi", "hello", "thanks", "ok", "fine", "no", "not really"], **RULE_INTENTS)
+NAMES = [name.lower() for name in {**PARAM_PATTERNS, **REFERENCE_RANGES}]
+
+
+def _questions():
+    """Every phrase on its own, in sentences and glued to its neighbours"""
+    rng = random.Random(0)
+    phrases = [p for group in INTENTS.values() for p in group] + list(PARAM_ALIASES) + NAMES
+    questions = list(phrases)
+    questions += [f"doctor, {p}?" for p in phrases]
+    questions += ["".join(rng.sample(phrases, 2)) for _ in range(300)]
+    questions += [" ".join(rng.sample(phrases, 3)) for _ in range(300)]
+    questions += ["what is my hb and wbc", "should i be worried about low platelets",
+                  "is my report okay or is this serious", "", "xyz", "mchc vs mch"]
+    return questions
+
+
+class IntentMatcherTest(unittest.TestCase):
+    """IntentMatcher agrees with the plain ``phrase in text`` checks it replaced"""
+
+    def setUp(self):
+        self.matcher = IntentMatcher(INTENTS, PARAM_ALIASES, names=NAMES)
+
+    def test_matches_substring_chain(self):
+        for text in _questions():
+            match = self.matcher.match(text)
+            for intent, phrases in INTENTS.items():
+                self.assertEqual(match.has(intent), any(p in text for p in phrases), (text, intent))
+                self.assertEqual(match.first(intent), next((p for p in phrases if p in text), None),
+                                 (text, intent))
+            self.assertEqual(match.aliases, [(k, v) for k, v in PARAM_ALIASES.items() if k in text], text)
+            for name in NAMES:
+                self.assertEqual(match.mentions(name), name in text, (text, name))
+
+    def test_automaton_finds_overlapping_phrases(self):
+        automaton = PhraseAutomaton(["he", "she", "his", "hers"])
+        found = {automaton.phrases[i] for i in automaton.scan("ushers")}
+        self.assertEqual(found, {"he", "she", "hers"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import socket
+import threading
+import time
+import unittest
+from concurrent.futures import Future
+
+from models.llm import LLMClient, LLMServer, LLMUnavailable
+
+
+class _StalledGenerator:
+    """Accepts prompts and never gets round to them"""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, prompt, max_new_tokens=None, on_text=None):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+class LLMClientTimeoutTest(unittest.TestCase):
+    def setUp(self):
+        self.generator = _StalledGenerator()
+        self.server = LLMServer(self.generator, address=("127.0.0.1", 0), request_timeout=60)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = LLMClient(self.server.server_address, timeout=0.2)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _wait_cancelled(self, future):
+        deadline = time.monotonic() + 5
+        while not future.cancelled() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return future.cancelled()
+
+    def test_slow_reply_does_not_mark_server_down(self):
+        for _ in range(2):
+            with self.assertRaises(LLMUnavailable):
+                self.client.generate("prompt")
+        # Both requests reached the server
+        self.assertEqual(len(self.generator.futures), 2)
+
+    def test_server_cancels_abandoned_prompts(self):
+        with self.assertRaises(LLMUnavailable):
+            self.client.generate("prompt")
+        with self.assertRaises(LLMUnavailable):
+            self.client.stream("prompt")
+        self.assertTrue(all(self._wait_cancelled(f) for f in self.generator.futures))
+
+    def test_refused_connection_marks_server_down(self):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            address = probe.getsockname()
+        client = LLMClient(address, timeout=0.2)
+        with self.assertRaises(LLMUnavailable):
+            client.generate("prompt")
+        with self.assertRaisesRegex(LLMUnavailable, "marked down"):
+            client.generate("prompt")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import json
+import os
+import tempfile
+import unittest
+
+from models.cbc_parser import assess_cbc, register_range_profile
+from models.database import CBCDatabase
+from reparse_reports import reparse
+
+RAW_TEXT = "Age/Gender: 40/F\nHemoglobin 11.5 g/dL 12 - 16"
+
+
+class ReparseProfileTest(unittest.TestCase):
+    def setUp(self):
+        register_range_profile('partner', {'HEMOGLOBIN': (11.0, 15.0)})
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = CBCDatabase(os.path.join(self.tmp.name, 'reports.db'))
+        self.user_id = self.db.create_user('patient')
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def _save(self, lab_profile):
+        parameters = {'HEMOGLOBIN': 11.5}
+        assessment = assess_cbc(parameters, age=40, sex='Female', profile=lab_profile)
+        return self.db.save_report(self.user_id, 40, 'Female', RAW_TEXT, parameters, assessment,
+                                   lab_profile=lab_profile)
+
+    def _hemoglobin(self, report_id):
+        row = self.db.connection().execute('SELECT assessment FROM reports WHERE report_id = ?',
+                                           (report_id,)).fetchone()
+        return json.loads(row[0])['assessed']['HEMOGLOBIN']
+
+    def test_reassesses_with_stored_profile(self):
+        report_id = self._save('partner')
+        self.assertEqual(reparse(self.db, workers=0), (1, 0))
+        self.assertEqual(self._hemoglobin(report_id)['status'], 'Normal')
+        self.assertEqual(self._hemoglobin(report_id)['range'], '11.0-15.0')
+
+    def test_skips_unknown_profile(self):
+        self._save('partner')
+        self.db.connection().execute("UPDATE reports SET lab_profile = 'retired'")
+        self.db.connection().commit()
+        self.assertEqual(reparse(self.db, workers=0), (0, 1))
+
+    def test_unknown_profile_with_custom_ranges(self):
+        with self.assertRaises(ValueError):
+            assess_cbc({}, custom_ranges={'HEMOGLOBIN': (10.0, 14.0)}, profile='retired')
+
+
+if __name__ == '__main__':
+    unittest.main()
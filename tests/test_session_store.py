@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from models.session_store import MemorySessionStore, SQLiteSessionStore
+
+
+class MemorySessionStoreTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        store = MemorySessionStore(max_entries=2)
+        store.save('a', {'n': 1}, 60)
+        store.save('b', {'n': 2}, 60)
+        # Reading 'a' makes 'b' the least recently used
+        self.assertEqual(store.load('a'), {'n': 1})
+        store.save('c', {'n': 3}, 60)
+        self.assertIsNone(store.load('b'))
+        self.assertEqual(store.load('a'), {'n': 1})
+        self.assertEqual(store.load('c'), {'n': 3})
+
+    def test_resave_refreshes_entry(self):
+        store = MemorySessionStore(max_entries=2)
+        store.save('a', {'n': 1}, 60)
+        store.save('b', {'n': 2}, 60)
+        store.save('a', {'n': 10}, 60)
+        store.save('c', {'n': 3}, 60)
+        self.assertIsNone(store.load('b'))
+        self.assertEqual(store.load('a'), {'n': 10})
+
+    def test_expired_entries_are_not_loaded(self):
+        store = MemorySessionStore()
+        store.save('a', {'n': 1}, 0)
+        self.assertIsNone(store.load('a'))
+
+    def test_load_returns_a_copy(self):
+        store = MemorySessionStore()
+        store.save('a', {'n': 1}, 60)
+        store.load('a')['n'] = 2
+        self.assertEqual(store.load('a'), {'n': 1})
+
+
+class SQLiteSessionStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SQLiteSessionStore(os.path.join(self.tmp.name, 'sessions.db'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_and_expiry(self):
+        self.store.save('a', {'report_id': 7, 'cbc_data': {'Age': 40}}, 60)
+        self.store.save('b', {'report_id': 8}, 0)
+        self.assertEqual(self.store.load('a'), {'report_id': 7, 'cbc_data': {'Age': 40}})
+        self.assertIsNone(self.store.load('b'))
+        self.store.delete('a')
+        self.assertIsNone(self.store.load('a'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+
+from models.database import CBCDatabase
+from models.trends import build_trends
+
+
+def _assessment(hemoglobin):
+    return {'assessed': {'HEMOGLOBIN': {
+        'value': hemoglobin, 'status': 'Normal', 'unit': 'g/dL', 'range': '12.0-16.0'
+    }}}
+
+
+class UnparseableDateTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = CBCDatabase(os.path.join(self.tmp.name, 'reports.db'))
+        # Written straight to the table, as rows stored before ingest validated dates were
+        user_id = self.db.create_user('patient')
+        for date, value in [('03/15/2024', 9.0), ('2024-01-01 09:00:00', 13.0),
+                            ('2024-01-01 18:00:00', 14.0), ('2024-02-01 09:00:00', 15.0)]:
+            report_id = self.db.save_report(user_id, 40, 'Female', '', {'HEMOGLOBIN': value},
+                                            _assessment(value))
+            self.db.connection().execute('UPDATE reports SET report_date = ? WHERE report_id = ?',
+                                         (date, report_id))
+        self.db.connection().commit()
+        self.user_id = user_id
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_columns_skip_unparseable_dates(self):
+        columns = self.db.get_parameter_columns(self.user_id)
+        self.assertEqual(columns['HEMOGLOBIN']['value'], [13.0, 14.0, 15.0])
+        self.assertNotIn(None, columns['HEMOGLOBIN']['day'])
+
+    def test_windows_skip_unparseable_dates(self):
+        windows = self.db.get_parameter_windows(self.user_id, 2)['HEMOGLOBIN']
+        self.assertEqual([w['count'] for w in windows], [2, 1])
+        self.assertAlmostEqual(windows[0]['slope'], 1 / 0.375, places=4)  # +1 g/dL over 9 hours
+        self.assertIsNone(windows[1]['slope'])
+
+    def test_build_trends(self):
+        trends = build_trends(self.db.get_parameter_columns(self.user_id),
+                              self.db.get_parameter_windows(self.user_id, 2), points=60)
+        self.assertEqual(trends['HEMOGLOBIN']['count'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()